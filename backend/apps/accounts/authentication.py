@@ -0,0 +1,191 @@
+"""
+JWT authentication shared by REST views and WebSocket connects.
+
+Both paths validate the access token locally and resolve its user through a
+bounded, short-lived cache of principals (user, student id, batch id), so
+repeated requests and reconnects from the same user skip the database.
+Entries are dropped when the user or their student profile is saved or
+deleted (see ``signals``).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import User
+
+
+class Principal:
+    """A resolved user plus the student profile ids needed by consumers."""
+
+    def __init__(self, user, student_id=None, batch_id=None):
+        self.user = user
+        self.student_id = student_id
+        self.batch_id = batch_id
+
+
+def _principal_queryset(user_id):
+    return (
+        User.objects
+        .filter(id=user_id)
+        .annotate(principal_student_id=F('student_profile__id'),
+                  principal_batch_id=F('student_profile__batch_id'))
+    )
+
+
+def _to_principal(user):
+    if user is None:
+        return None
+    student_id = user.__dict__.pop('principal_student_id', None)
+    batch_id = user.__dict__.pop('principal_batch_id', None)
+    return Principal(user, student_id, batch_id)
+
+
+class PrincipalCache:
+    """LRU cache of principals keyed by user id, with a per-entry TTL."""
+
+    def __init__(self, ttl=None, max_size=None):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'AUTH_PRINCIPAL_CACHE_TTL', 60)
+
+    @property
+    def max_size(self):
+        if self._max_size is not None:
+            return self._max_size
+        return getattr(settings, 'AUTH_PRINCIPAL_CACHE_SIZE', 2048)
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._entries.get(user_id)
+            if item is None:
+                return None
+            expires, principal = item
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def _put(self, user_id, principal, generation):
+        with self._lock:
+            # Skip if an invalidation ran while the principal was being loaded.
+            if principal is None or generation != self._generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def resolve(self, user_id):
+        """Return the principal for ``user_id`` (None if there is no such user)."""
+        principal = self.get(user_id)
+        if principal is not None:
+            return principal
+        generation = self._generation
+        principal = _to_principal(_principal_queryset(user_id).first())
+        self._put(user_id, principal, generation)
+        return principal
+
+    async def aresolve(self, user_id):
+        principal = self.get(user_id)
+        if principal is not None:
+            return principal
+        generation = self._generation
+        principal = _to_principal(await _principal_queryset(user_id).afirst())
+        self._put(user_id, principal, generation)
+        return principal
+
+
+principal_cache = PrincipalCache()
+
+
+def _check_token_user(validated_token, user):
+    if api_settings.CHECK_REVOKE_TOKEN:
+        if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            return False
+    return user.is_active
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that resolves users through ``principal_cache``."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        principal = principal_cache.resolve(user_id)
+        if principal is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        user = principal.user
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if not _check_token_user(validated_token, user):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        # Each request gets its own instance; the cached one is never mutated.
+        return copy.copy(user)
+
+
+async def principal_for_token(token_string):
+    """Validate an access token and return its active principal, or None."""
+    try:
+        token = AccessToken(token_string)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+    principal = await principal_cache.aresolve(user_id)
+    if principal is None or not _check_token_user(token, principal.user):
+        return None
+    return principal
+
+
+class JWTAuthMiddleware:
+    """
+    ASGI middleware for WebSocket routes: authenticates ``?token=<jwt>`` and
+    sets ``scope['user']`` and ``scope['principal']``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = (query.get('token') or [''])[-1]
+        principal = await principal_for_token(token) if token else None
+
+        scope = dict(scope)
+        scope['principal'] = principal
+        scope['user'] = copy.copy(principal.user) if principal else AnonymousUser()
+        return await self.app(scope, receive, send)
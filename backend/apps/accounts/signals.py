@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import principal_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Covers deactivation, password changes and deletes."""
+    principal_cache.invalidate(instance.id)
+
+
+@receiver(post_save, sender='students.Student')
+@receiver(post_delete, sender='students.Student')
+def student_profile_changed(sender, instance, **kwargs):
+    """The principal carries the student's id and batch."""
+    principal_cache.invalidate(instance.user_id)
@@ -0,0 +1,44 @@
+from django.test import TestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts.authentication import CachedJWTAuthentication, principal_cache
+from apps.accounts.models import User
+from apps.core.models import Batch, Semester
+from apps.students.models import Student
+
+
+class PrincipalCacheTests(TestCase):
+    def setUp(self):
+        principal_cache.invalidate()
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch_1 = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        self.batch_2 = Batch.objects.create(semester=semester, name="Batch 2", year=2)
+        self.user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        self.student = Student.objects.create(user=self.user, student_id="CS001", name="Student 1", batch=self.batch_1)
+        self.token = AccessToken.for_user(self.user)
+
+    def test_repeat_authentication_skips_the_database(self):
+        auth = CachedJWTAuthentication()
+        with self.assertNumQueries(1):
+            first = auth.get_user(self.token)
+        with self.assertNumQueries(0):
+            second = auth.get_user(self.token)
+
+        self.assertEqual(first, self.user)
+        self.assertIsNot(first, second)
+        principal = principal_cache.get(self.user.id)
+        self.assertEqual((principal.student_id, principal.batch_id), (self.student.id, self.batch_1.id))
+
+    def test_deactivation_and_batch_change_invalidate(self):
+        auth = CachedJWTAuthentication()
+        auth.get_user(self.token)
+
+        self.student.batch = self.batch_2
+        self.student.save()
+        self.assertEqual(principal_cache.resolve(self.user.id).batch_id, self.batch_2.id)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            auth.get_user(self.token)
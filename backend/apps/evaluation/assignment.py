@@ -0,0 +1,119 @@
+"""
+Exam question assignment.
+
+``assign_questions`` decides which questions each student gets: every
+student's set should look like the question bank as a whole (the same mix
+of difficulties, total marks close to the average), and questions are used
+about equally often, so neighbours rarely share a paper. It is seeded and
+only depends on its inputs, so the same exam always assigns the same way.
+
+``start_exam`` writes the assignment for a whole batch in a fixed number of
+queries: one bulk insert of missing ``StudentExam`` rows and one bulk insert
+into the ``assigned_questions`` through table.
+"""
+import itertools
+import random
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import StudentExam
+
+
+QUESTIONS_PER_STUDENT = 2
+
+# Question sets scored per student; larger banks are sampled down to this many
+MAX_CANDIDATES = 500
+
+
+def _candidates(questions, per_student, rng):
+    """Question sets to choose from, in seeded order."""
+    ids = [q.id for q in questions]
+    total = 1
+    for i in range(per_student):
+        total = total * (len(ids) - i) // (i + 1)
+    if total <= MAX_CANDIDATES:
+        sets = list(itertools.combinations(ids, per_student))
+        rng.shuffle(sets)
+        return sets
+    sets = set()
+    while len(sets) < MAX_CANDIDATES:
+        sets.add(tuple(sorted(rng.sample(ids, per_student))))
+    return sorted(sets, key=lambda s: rng.random())
+
+
+def assign_questions(questions, student_ids, seed, per_student=QUESTIONS_PER_STUDENT):
+    """
+    {student_id: [question ids]} for ``questions`` (ExamQuestion-like, with
+    ``id``, ``difficulty`` and ``marks``).
+
+    Each student in turn (seeded order) gets the set with the lowest cost:
+    how far its difficulty mix and total marks are from the bank's, plus one
+    for every use of its questions beyond the least-used question.
+    """
+    rng = random.Random(seed)
+    questions = sorted(questions, key=lambda q: q.id)
+    per_student = min(per_student, len(questions))
+    if not questions or not per_student:
+        return {student_id: [] for student_id in student_ids}
+
+    by_id = {q.id: q for q in questions}
+    mean_marks = sum(q.marks for q in questions) / len(questions) or 1
+    target_marks = mean_marks * per_student
+    bank_mix = Counter(q.difficulty for q in questions)
+    ideal_mix = {d: per_student * n / len(questions) for d, n in bank_mix.items()}
+
+    def imbalance(question_set):
+        mix = Counter(by_id[q].difficulty for q in question_set)
+        difficulty = sum(abs(mix[d] - ideal) for d, ideal in ideal_mix.items())
+        marks = abs(sum(by_id[q].marks for q in question_set) - target_marks) / mean_marks
+        return difficulty + marks
+
+    candidates = [(s, imbalance(s)) for s in _candidates(questions, per_student, rng)]
+    uses = dict.fromkeys(by_id, 0)
+    order = sorted(student_ids)
+    rng.shuffle(order)
+
+    assignment = {}
+    for student_id in order:
+        floor = min(uses.values()) * per_student
+        question_set, _ = min(candidates, key=lambda c: c[1] + sum(uses[q] for q in c[0]) - floor)
+        for q in question_set:
+            uses[q] += 1
+        assignment[student_id] = list(question_set)
+    return assignment
+
+
+def start_exam(session, questions, student_ids, seed):
+    """
+    Create missing StudentExam rows and assign questions to every student
+    that has none yet. Returns the number of students in the exam.
+    """
+    through = StudentExam.assigned_questions.through
+    with transaction.atomic():
+        existing = {
+            student_id: (exam_id, assigned)
+            for student_id, exam_id, assigned in StudentExam.objects
+            .filter(session=session)
+            .annotate(assigned=Count('assigned_questions'))
+            .values_list('student_id', 'id', 'assigned')
+        }
+        created = StudentExam.objects.bulk_create([
+            StudentExam(session=session, student_id=student_id)
+            for student_id in student_ids if student_id not in existing
+        ])
+        exam_ids = {student_id: exam_id for student_id, (exam_id, _) in existing.items()}
+        if created and not connection.features.can_return_rows_from_bulk_insert:
+            exam_ids = dict(StudentExam.objects.filter(session=session).values_list('student_id', 'id'))
+        else:
+            exam_ids.update((exam.student_id, exam.id) for exam in created)
+
+        unassigned = [s for s in student_ids if existing.get(s, (None, 0))[1] == 0]
+        assignment = assign_questions(questions, unassigned, seed)
+        through.objects.bulk_create([
+            through(studentexam_id=exam_ids[student_id], examquestion_id=question_id)
+            for student_id, question_ids in assignment.items()
+            for question_id in question_ids
+        ])
+    return len(student_ids)
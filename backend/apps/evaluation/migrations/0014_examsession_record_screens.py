@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0013_alter_examsession_subject_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsession',
+            name='record_screens',
+            field=models.BooleanField(default=False),
+        ),
+    ]
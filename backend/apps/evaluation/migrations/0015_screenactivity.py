@@ -0,0 +1,30 @@
+# Generated by Django 4.2.9 on 2026-10-18 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluation', '0014_examsession_record_screens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScreenActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('samples', models.BinaryField(blank=True, default=b'')),
+                ('changes', models.PositiveIntegerField(default=0)),
+                ('student_exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='screen_activity', to='evaluation.studentexam')),
+            ],
+            options={
+                'db_table': 'screen_activity',
+                'ordering': ['started_at'],
+                'indexes': [models.Index(fields=['student_exam', 'started_at'], name='screen_acti_student_f73dfc_idx')],
+            },
+        ),
+    ]
@@ -95,6 +95,8 @@ class ExamSession(models.Model):
     duration_minutes = models.IntegerField(default=120)
     subject_name = models.CharField(max_length=100, blank=True, null=True)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='scheduled')
+    # Students keep a rolling recording of their screen while the exam runs
+    record_screens = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -164,6 +166,25 @@ class StudentExam(models.Model):
     def __str__(self):
         return f"{self.student.name} — {self.session.title} ({self.status})"
 
+
+class ScreenActivity(models.Model):
+    """One screen activity report from a student app during an exam (see screen_activity.py)"""
+
+    student_exam = models.ForeignKey(StudentExam, on_delete=models.CASCADE, related_name='screen_activity')
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    # Packed samples: ms offset from started_at, 64-bit screen hash, bits moved
+    samples = models.BinaryField(blank=True, default=b'')
+    changes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'screen_activity'
+        ordering = ['started_at']
+        indexes = [models.Index(fields=['student_exam', 'started_at'])]
+
+    def __str__(self):
+        return f"{self.student_exam} activity {self.started_at:%H:%M:%S}-{self.ended_at:%H:%M:%S}"
+
 #
 class Task(models.Model):
     """Task/assignment distributed to batch"""
@@ -0,0 +1,331 @@
+"""
+Background rendering of PDF reports, cached by data version.
+
+A report job is named after what it renders and the data it renders from:
+``<kind>_<object id>_<version>``, where the version hashes the row counts and
+latest ``updated_at`` of every table the report reads (and the few values it
+shows from rows without one). Finished PDFs are kept under
+``REPORT_CACHE_DIR/<job id>/``, so asking again for a report whose data has
+not changed serves the file without rendering; any edit, insert or delete
+gives a new id, and storing a new version drops the old one.
+
+Renders run in a pool of ``REPORT_JOB_WORKERS`` processes (0 renders inline
+in the request), so a large batch report does not hold up the server.
+Progress and completion go to the requesting faculty's monitor sockets as
+``report_job`` events. Jobs in progress are known only to the process that
+queued them; finished ones are found in the cache from any process.
+"""
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+
+# Part of every version: bump when a report's layout changes
+REPORT_FORMAT = 1
+
+KINDS = ('student', 'batch')
+JOB_ID = re.compile(r'^(student|batch)_(\d+)_([0-9a-f]{16})$')
+
+# Seconds between progress events for one job
+PROGRESS_INTERVAL = 0.5
+
+# Finished and failed jobs are forgotten after this many seconds
+JOB_TTL = 3600
+
+# Set in pool workers (see _init_worker); progress is reported directly otherwise
+_progress_queue = None
+
+
+def cache_dir():
+    return getattr(settings, 'REPORT_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, 'report_cache'))
+
+
+def _sources(kind, object_id):
+    """Values and querysets a report's contents depend on, or None if its object is gone."""
+    from apps.core.models import Batch
+    from apps.lab_sessions.models import LabSession
+    from apps.students.models import Attendance, Student
+    from .models import Task, TaskSubmission, VivaRecord, VivaSession
+
+    if kind == 'student':
+        student = (
+            Student.objects.filter(id=object_id)
+            .values_list('student_id', 'name', 'batch__name', 'batch__semester__name')
+            .first()
+        )
+        if student is None:
+            return None
+        return [
+            student,
+            TaskSubmission.objects.filter(student_id=object_id),
+            Task.objects.filter(submissions__student_id=object_id),
+            VivaRecord.objects.filter(student_id=object_id),
+            VivaSession.objects.filter(records__student_id=object_id),
+            Attendance.objects.filter(student_id=object_id),
+            LabSession.objects.filter(attendance_records__student_id=object_id),
+        ]
+
+    batch = Batch.objects.filter(id=object_id).values_list('name', 'semester__name').first()
+    if batch is None:
+        return None
+    # Student rows are hashed by value: presence updates touch them constantly
+    # without changing anything the report shows.
+    return [
+        batch,
+        list(Student.objects.filter(batch_id=object_id).order_by('id').values_list('id', 'student_id', 'name')),
+        TaskSubmission.objects.filter(task__batch_id=object_id),
+        Attendance.objects.filter(session__batch_id=object_id),
+        VivaRecord.objects.filter(viva_session__batch_id=object_id),
+    ]
+
+
+def version_id(kind, object_id):
+    """Job id for the current data of a report, or None if its object does not exist."""
+    from django.db.models import Count, Max
+
+    sources = _sources(kind, object_id)
+    if sources is None:
+        return None
+    digest = hashlib.sha256(repr((REPORT_FORMAT, kind, object_id)).encode())
+    for source in sources:
+        if hasattr(source, 'aggregate'):
+            source = source.aggregate(rows=Count('id'), latest=Max('updated_at'))
+        digest.update(repr(source).encode())
+    return f'{kind}_{object_id}_{digest.hexdigest()[:16]}'
+
+
+def cached_file(job_id):
+    """Path of the finished PDF for ``job_id``, or None."""
+    if not JOB_ID.match(job_id):
+        return None
+    directory = os.path.join(cache_dir(), job_id)
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.pdf') and not name.startswith('.')]
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, names[0]) if names else None
+
+
+def store(job_id, filename, pdf):
+    """Write a rendered PDF to the cache and drop older versions of the same report."""
+    root = cache_dir()
+    directory = os.path.join(root, job_id)
+    os.makedirs(directory, exist_ok=True)
+    partial = os.path.join(directory, f'.{filename}.{os.getpid()}.tmp')
+    with open(partial, 'wb') as f:
+        f.write(pdf)
+    os.replace(partial, os.path.join(directory, filename))
+
+    prefix = job_id.rsplit('_', 1)[0] + '_'
+    for name in os.listdir(root):
+        if name != job_id and name.startswith(prefix) and JOB_ID.match(name):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return os.path.join(directory, filename)
+
+
+def render(job_id, kind, object_id):
+    """Render a report into the cache, reporting progress. Returns its filename."""
+    from . import views
+
+    last = {}
+
+    def progress(fraction, pages):
+        changes = {'status': 'running', 'progress': round(0.1 + 0.85 * fraction, 3), 'pages': pages}
+        if changes != last:
+            last.update(changes)
+            _report(job_id, changes)
+
+    _report(job_id, {'status': 'running', 'progress': 0.0})
+    build = views.render_student_report if kind == 'student' else views.render_batch_report
+    filename, pdf = build(object_id, progress=progress)
+    store(job_id, filename, pdf)
+    return filename
+
+
+def _report(job_id, changes):
+    if _progress_queue is not None:
+        _progress_queue.put((job_id, changes))
+    else:
+        report_queue.apply(job_id, changes)
+
+
+def _init_worker(queue):
+    global _progress_queue
+
+    import django
+    django.setup()
+    _progress_queue = queue
+
+
+class ReportQueue:
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._events = None
+
+    @property
+    def workers(self):
+        return getattr(settings, 'REPORT_JOB_WORKERS', 2)
+
+    def submit(self, kind, object_id, user_id):
+        """
+        Queue a render of the current version of a report, or join one already
+        queued. Returns the job's state, or None if the object does not exist.
+        """
+        job_id = version_id(kind, object_id)
+        if job_id is None:
+            return None
+
+        path = cached_file(job_id)
+        with self._lock:
+            self._forget_expired()
+            job = self._jobs.get(job_id)
+            if job is not None and job['status'] in ('queued', 'running'):
+                job['watchers'].add(user_id)
+                return self._public(job)
+            if path is not None:
+                return self._finished(job_id, path)
+            job = self._jobs[job_id] = {
+                'id': job_id,
+                'kind': kind,
+                'object_id': object_id,
+                'status': 'queued',
+                'progress': 0.0,
+                'pages': 0,
+                'cached': False,
+                'filename': None,
+                'error': None,
+                'watchers': {user_id},
+                'updated_at': time.monotonic(),
+                'sent_at': 0.0,
+            }
+            state = self._public(job)
+
+        if self.workers <= 0:
+            self._run(job_id, kind, object_id)
+            with self._lock:
+                return self._public(job)
+        self._start(job_id, kind, object_id)
+        return state
+
+    def status(self, job_id):
+        """State of a job queued here, or of any finished one in the cache; None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            # A finished job's file may since have been replaced by a newer version
+            if job is not None and job['status'] != 'done':
+                return self._public(job)
+        path = cached_file(job_id)
+        return self._finished(job_id, path) if path else None
+
+    def apply(self, job_id, changes):
+        """Record a job's progress or outcome and tell its watchers (throttled while running)."""
+        from apps.monitor.events import broadcast, faculty_group
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in ('done', 'failed'):
+                return
+            job.update(changes)
+            now = job['updated_at'] = time.monotonic()
+            if job['status'] == 'running' and changes.get('status') == 'running' and now - job['sent_at'] < PROGRESS_INTERVAL:
+                return
+            job['sent_at'] = now
+            event = {'type': 'report_job', **self._public(job)}
+            watchers = list(job['watchers'])
+
+        for user_id in watchers:
+            broadcast(faculty_group(user_id), event)
+
+    def _run(self, job_id, kind, object_id):
+        try:
+            filename = render(job_id, kind, object_id)
+        except Exception as e:
+            print(f"Report job {job_id} failed: {e}")
+            self.apply(job_id, {'status': 'failed', 'error': str(e)})
+        else:
+            self.apply(job_id, {'status': 'done', 'progress': 1.0, 'filename': filename})
+
+    def _start(self, job_id, kind, object_id):
+        for attempt in range(2):
+            try:
+                future = self._pool().submit(render, job_id, kind, object_id)
+                break
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool and try once more
+                self._executor = None
+                if attempt:
+                    raise
+
+        def finished(future):
+            try:
+                changes = {'status': 'done', 'progress': 1.0, 'filename': future.result()}
+            except Exception as e:
+                print(f"Report job {job_id} failed: {e}")
+                changes = {'status': 'failed', 'error': str(e)}
+            # Through the event queue, so outcomes are applied after the job's progress
+            self._events.put((job_id, changes))
+
+        future.add_done_callback(finished)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context('spawn')
+                if self._events is None:
+                    self._events = context.Queue()
+                    threading.Thread(target=self._pump, name='report-jobs', daemon=True).start()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context,
+                    initializer=_init_worker, initargs=(self._events,),
+                )
+            return self._executor
+
+    def _pump(self):
+        """Apply progress and outcomes from the pool (runs on its own thread)."""
+        while True:
+            try:
+                job_id, changes = self._events.get()
+            except (EOFError, OSError):
+                return  # queue closed at interpreter exit
+            try:
+                self.apply(job_id, changes)
+            except Exception as e:
+                print(f"Report job event failed: {e}")
+
+    def _forget_expired(self):
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job['status'] in ('done', 'failed') and now - job['updated_at'] > JOB_TTL:
+                del self._jobs[job_id]
+
+    @staticmethod
+    def _finished(job_id, path):
+        kind, object_id, _ = JOB_ID.match(job_id).groups()
+        return {
+            'id': job_id,
+            'kind': kind,
+            'object_id': int(object_id),
+            'status': 'done',
+            'progress': 1.0,
+            'pages': None,
+            'cached': True,
+            'filename': os.path.basename(path),
+            'error': None,
+        }
+
+    @staticmethod
+    def _public(job):
+        return {key: value for key, value in job.items() if key not in ('watchers', 'updated_at', 'sent_at')}
+
+
+report_queue = ReportQueue()
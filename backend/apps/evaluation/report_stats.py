@@ -0,0 +1,75 @@
+"""
+Per-student statistics for batch reports, from grouped aggregates.
+
+Each source (task submissions, attendance, completed vivas) is read with one
+``GROUP BY student`` query and the rows are joined by student id in memory,
+so a batch costs three queries however many students it has.
+"""
+from django.db.models import Avg, Count, Q
+
+from .models import TaskSubmission, VivaRecord
+
+
+def empty_stats():
+    return {
+        'tasks': 0,
+        'submitted': 0,
+        'evaluated': 0,
+        'task_avg': None,
+        'attendance_total': 0,
+        'attendance_present': 0,
+        'attendance_pct': 0,
+        'viva_count': 0,
+        'viva_avg': None,
+    }
+
+
+def batch_student_stats(batch_id):
+    """{student id: stats} for students with any task, attendance or viva record in the batch."""
+    from apps.students.models import Attendance
+
+    stats = {}
+
+    def row(student_id):
+        if student_id not in stats:
+            stats[student_id] = empty_stats()
+        return stats[student_id]
+
+    submissions = (
+        TaskSubmission.objects
+        .filter(task__batch_id=batch_id)
+        .values('student_id')
+        .annotate(
+            tasks=Count('id'),
+            submitted=Count('id', filter=Q(status__in=['submitted', 'evaluated']) | Q(submission_file__isnull=False)),
+            evaluated=Count('id', filter=Q(marks__isnull=False)),
+            task_avg=Avg('marks'),
+        )
+        .order_by()
+    )
+    for values in submissions:
+        row(values.pop('student_id')).update(values)
+
+    attendance = (
+        Attendance.objects
+        .filter(session__batch_id=batch_id)
+        .values('student_id')
+        .annotate(attendance_total=Count('id'), attendance_present=Count('id', filter=Q(status='present')))
+        .order_by()
+    )
+    for values in attendance:
+        entry = row(values.pop('student_id'))
+        entry.update(values)
+        entry['attendance_pct'] = entry['attendance_present'] / entry['attendance_total'] * 100
+
+    vivas = (
+        VivaRecord.objects
+        .filter(status='completed', viva_session__batch_id=batch_id)
+        .values('student_id')
+        .annotate(viva_count=Count('id'), viva_avg=Avg('marks'))
+        .order_by()
+    )
+    for values in vivas:
+        row(values.pop('student_id')).update(values)
+
+    return stats
@@ -0,0 +1,144 @@
+"""
+Screen activity timelines for exams.
+
+During an exam each student app hashes its screen once a second and sends
+only the samples whose hash moved, as a ``screen_activity`` message every
+30 seconds or so. Each message covers ``from``..``until`` even if nothing
+moved, so a gap between reports means the app was not reporting, not that
+the screen was idle. Every report is stored as one ``ScreenActivity`` row
+with its samples packed into 13 bytes each.
+
+Report times are anchored to when the server received them; only the
+offsets within a report come from the student's clock.
+"""
+import struct
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Sum
+from django.utils import timezone
+
+from .models import ScreenActivity, StudentExam
+
+
+# Milliseconds from the report start, screen hash, bits moved since the previous sample
+SAMPLE = struct.Struct('<IQB')
+
+# Longest report accepted, and most samples in one (one per second plus slack)
+MAX_REPORT_SECONDS = 600
+MAX_SAMPLES = 1200
+
+# Reports closer than this are one continuous stretch of coverage
+COVERAGE_GAP = timedelta(seconds=5)
+
+
+def change_bits():
+    return getattr(settings, 'SCREEN_ACTIVITY_CHANGE_BITS', 12)
+
+
+def pack_samples(start, samples):
+    """Pack [timestamp, hex hash, bits] samples relative to ``start`` (a timestamp)."""
+    packed = bytearray()
+    for at, value, bits in samples[:MAX_SAMPLES]:
+        offset = min(max(0, int((at - start) * 1000)), MAX_REPORT_SECONDS * 1000)
+        packed += SAMPLE.pack(offset, int(value, 16), min(max(0, int(bits)), 64))
+    return bytes(packed)
+
+
+def unpack_samples(activity):
+    """(datetime, hash, bits) for each sample of a ScreenActivity row."""
+    return [
+        (activity.started_at + timedelta(milliseconds=offset), value, bits)
+        for offset, value, bits in SAMPLE.iter_unpack(bytes(activity.samples))
+    ]
+
+
+async def record(student_id, data):
+    """Store a ``screen_activity`` report; False if it is malformed or not for an exam of this student."""
+    try:
+        start, until = float(data['from']), float(data['until'])
+        samples = pack_samples(start, data.get('samples') or [])
+    except (KeyError, TypeError, ValueError, struct.error):
+        return False
+    if not 0 <= until - start <= MAX_REPORT_SECONDS:
+        return False
+
+    student_exam_id = await (
+        StudentExam.objects
+        .filter(session_id=data.get('session_id'), student_id=student_id)
+        .values_list('id', flat=True)
+        .afirst()
+    )
+    if student_exam_id is None:
+        return False
+
+    ended_at = timezone.now()
+    threshold = change_bits()
+    await ScreenActivity.objects.acreate(
+        student_exam_id=student_exam_id,
+        started_at=ended_at - timedelta(seconds=until - start),
+        ended_at=ended_at,
+        samples=samples,
+        changes=sum(1 for _, _, bits in SAMPLE.iter_unpack(samples) if bits >= threshold),
+    )
+    return True
+
+
+def timeline(student_exam):
+    """Coverage spans, screen changes and per-minute activity of one student's exam."""
+    threshold = change_bits()
+    coverage = []
+    changes = []
+    minutes = {}
+    for activity in student_exam.screen_activity.all():
+        if coverage and activity.started_at - coverage[-1][1] <= COVERAGE_GAP:
+            coverage[-1][1] = max(coverage[-1][1], activity.ended_at)
+        else:
+            coverage.append([activity.started_at, activity.ended_at])
+
+        for at, value, bits in unpack_samples(activity):
+            minute = minutes.setdefault(at.replace(second=0, microsecond=0), {'samples': 0, 'max_bits': 0})
+            minute['samples'] += 1
+            minute['max_bits'] = max(minute['max_bits'], bits)
+            if bits >= threshold:
+                changes.append({'at': at, 'bits': bits, 'hash': f'{value:016x}'})
+
+    return {
+        'session_id': student_exam.session_id,
+        'student_id': student_exam.student_id,
+        'change_bits': threshold,
+        'covered_seconds': round(sum((end - start).total_seconds() for start, end in coverage)),
+        'coverage': [{'start': start, 'end': end} for start, end in coverage],
+        'changes': changes,
+        'minutes': [{'minute': minute, **counts} for minute, counts in sorted(minutes.items())],
+    }
+
+
+def session_summary(session_id):
+    """Per-student report counts, coverage and changes for a whole exam, in one query."""
+    rows = (
+        StudentExam.objects
+        .filter(session_id=session_id)
+        .annotate(
+            reports=Count('screen_activity'),
+            changes=Sum('screen_activity__changes'),
+            covered=Sum(ExpressionWrapper(
+                F('screen_activity__ended_at') - F('screen_activity__started_at'),
+                output_field=DurationField(),
+            )),
+            last_report=Max('screen_activity__ended_at'),
+        )
+        .values('student_id', 'student__name', 'reports', 'changes', 'covered', 'last_report')
+        .order_by('student__name')
+    )
+    return [
+        {
+            'student_id': row['student_id'],
+            'student_name': row['student__name'],
+            'reports': row['reports'],
+            'changes': row['changes'] or 0,
+            'covered_seconds': round(row['covered'].total_seconds()) if row['covered'] else 0,
+            'last_report': row['last_report'],
+        }
+        for row in rows
+    ]
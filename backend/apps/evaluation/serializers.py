@@ -69,7 +69,7 @@ class ExamSessionSerializer(serializers.ModelSerializer):
         model = ExamSession
         fields = [
             'id', 'title', 'subject_name', 'batch', 'batch_name', 'faculty', 'faculty_name',
-            'duration_minutes', 'status', 'question_count', 'submission_count', 'created_at',
+            'duration_minutes', 'status', 'record_screens', 'question_count', 'submission_count', 'created_at',
         ]
 
         read_only_fields = ['id', 'faculty', 'created_at']
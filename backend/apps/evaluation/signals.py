@@ -1,19 +1,24 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from apps.monitor.events import broadcast
 from .models import Task, ExamSession, VivaSession, VivaRecord, StudentExam
 
+
+def _cached(instance, name):
+    """Related object ``name`` if it is already loaded on ``instance``, else None (never queries)."""
+    field = instance._meta.get_field(name)
+    return field.get_cached_value(instance) if field.is_cached(instance) else None
+
 @receiver(post_save, sender=Task)
 def task_created(sender, instance, created, **kwargs):
     """
     Trigger WebSocket event when a new Task is created.
     """
     if created:
-        channel_layer = get_channel_layer()
-        batch_group_name = f'batch_{instance.batch.id}'
-        
-        async_to_sync(channel_layer.group_send)(
+        batch_group_name = f'batch_{instance.batch_id}'
+        faculty = _cached(instance, 'faculty')
+
+        broadcast(
             batch_group_name,
             {
                 'type': 'task_event',  # Will be handled by Consumer
@@ -24,9 +29,10 @@ def task_created(sender, instance, created, **kwargs):
                     'description': instance.description,
                     'subject_name': instance.subject_name,
                     'status': instance.status,
-                    'batch_id': instance.batch.id,
+                    'batch_id': instance.batch_id,
                     'created_at': instance.created_at.isoformat(),
-                    'faculty_name': instance.faculty.name,
+                    'faculty_id': instance.faculty_id,
+                    'faculty_name': faculty.name if faculty else None,
                     'deadline': instance.deadline.isoformat() if instance.deadline else None,
                 }
             }
@@ -39,26 +45,28 @@ def submission_event(sender, instance, created, **kwargs):
     - created: submission_received (to faculty)
     - evaluated: evaluation_done (to student)
     """
-    from apps.evaluation.models import TaskSubmission
-    
-    channel_layer = get_channel_layer()
-    
+    task = _cached(instance, 'task')
+
     if created and instance.status == 'submitted':
         # Broadcast to faculty monitoring this batch
-        batch_id = instance.task.batch.id
+        if task is not None:
+            batch_id = task.batch_id
+        else:
+            batch_id = Task.objects.filter(pk=instance.task_id).values_list('batch_id', flat=True).first()
+        student = _cached(instance, 'student')
         faculty_group = f'monitor_batch_{batch_id}'
         
-        async_to_sync(channel_layer.group_send)(
+        broadcast(
             faculty_group,
             {
                 'type': 'submission_event',
                 'event_type': 'submission_received',
                 'submission': {
                     'id': instance.id,
-                    'task_id': instance.task.id,
-                    'task_title': instance.task.title,
-                    'student_id': instance.student.id,
-                    'student_name': instance.student.name,
+                    'task_id': instance.task_id,
+                    'task_title': task.title if task else None,
+                    'student_id': instance.student_id,
+                    'student_name': student.name if student else None,
                     'file_path': instance.file_path,
                     'submitted_at': instance.submitted_at.isoformat(),
                     'status': instance.status,
@@ -68,17 +76,17 @@ def submission_event(sender, instance, created, **kwargs):
     
     elif instance.status == 'evaluated':
         # Broadcast to specific student
-        student_group = f'student_{instance.student.id}'
+        student_group = f'student_{instance.student_id}'
         
-        async_to_sync(channel_layer.group_send)(
+        broadcast(
             student_group,
             {
                 'type': 'submission_event',
                 'event_type': 'evaluation_done',
                 'submission': {
                     'id': instance.id,
-                    'task_id': instance.task.id,
-                    'task_title': instance.task.title,
+                    'task_id': instance.task_id,
+                    'task_title': task.title if task else None,
                     'marks': instance.marks,
                     'feedback': instance.feedback,
                     'status': instance.status,
@@ -89,8 +97,7 @@ def submission_event(sender, instance, created, **kwargs):
 @receiver(post_save, sender=ExamSession)
 def exam_session_update(sender, instance, created, **kwargs):
     """Trigger WebSocket event when Exam status changes."""
-    channel_layer = get_channel_layer()
-    batch_group_name = f'batch_{instance.batch.id}'
+    batch_group_name = f'batch_{instance.batch_id}'
     
     event_type = None
     if instance.status == 'active':
@@ -99,7 +106,7 @@ def exam_session_update(sender, instance, created, **kwargs):
         event_type = 'exam_ended'
         
     if event_type:
-        async_to_sync(channel_layer.group_send)(
+        broadcast(
             batch_group_name,
             {
                 'type': 'viva_event', # Handled by StudentDashboard.handle_viva_event
@@ -115,12 +122,11 @@ def exam_session_update(sender, instance, created, **kwargs):
 @receiver(post_save, sender=VivaSession)
 def viva_session_update(sender, instance, created, **kwargs):
     """Trigger WebSocket event when Viva session is published or status changes."""
-    channel_layer = get_channel_layer()
-    batch_group_name = f'batch_{instance.batch.id}'
+    batch_group_name = f'batch_{instance.batch_id}'
     
     if instance.status == 'live':
         event_type = 'viva_online_published' if instance.viva_type == 'online' else 'viva_active'
-        async_to_sync(channel_layer.group_send)(
+        broadcast(
             batch_group_name,
             {
                 'type': 'viva_event',
@@ -136,15 +142,16 @@ def viva_session_update(sender, instance, created, **kwargs):
 def viva_record_update(sender, instance, created, **kwargs):
     """Trigger WebSocket event when Viva is evaluated."""
     if instance.status == 'completed' and instance.is_published:
-        channel_layer = get_channel_layer()
-        student_group = f'student_{instance.student.id}'
-        
-        async_to_sync(channel_layer.group_send)(
+        student_group = f'student_{instance.student_id}'
+        viva_session = _cached(instance, 'viva_session')
+
+        broadcast(
             student_group,
             {
                 'type': 'viva_event',
                 'event': 'viva_evaluated',
-                'subject': instance.viva_session.subject if instance.viva_session else "Viva",
+                'viva_session_id': instance.viva_session_id,
+                'subject': viva_session.subject if viva_session else "Viva",
                 'marks': instance.marks,
             }
         )
@@ -153,16 +160,17 @@ def viva_record_update(sender, instance, created, **kwargs):
 def exam_evaluate_event(sender, instance, created, **kwargs):
     """Trigger WebSocket event when Exam is evaluated."""
     if instance.status == 'evaluated' and instance.is_published:
-        channel_layer = get_channel_layer()
-        student_group = f'student_{instance.student.id}'
-        
-        async_to_sync(channel_layer.group_send)(
+        student_group = f'student_{instance.student_id}'
+        session = _cached(instance, 'session')
+
+        broadcast(
             student_group,
             {
                 'type': 'viva_event',
                 'event': 'exam_evaluated',
-                'session_title': instance.session.title,
-                'subject_name': instance.session.subject_name,
+                'session_id': instance.session_id,
+                'session_title': session.title if session else None,
+                'subject_name': session.subject_name if session else None,
                 'marks': instance.marks,
             }
         )
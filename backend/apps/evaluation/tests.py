@@ -0,0 +1,187 @@
+import os
+import tempfile
+from collections import Counter
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.core.models import Batch, Semester
+from apps.evaluation.assignment import assign_questions
+from apps.evaluation.models import ExamQuestion, ExamSession, StudentExam
+from apps.students.models import Student
+
+
+class ExamAssignmentTests(TestCase):
+    def test_assignment_is_seeded_and_balanced(self):
+        questions = [
+            SimpleNamespace(id=i, difficulty=difficulty, marks=marks)
+            for i, (difficulty, marks) in enumerate(
+                [('easy', 5), ('easy', 5), ('medium', 10), ('medium', 10), ('hard', 15), ('hard', 15)], 1
+            )
+        ]
+        students = list(range(100, 160))
+
+        assignment = assign_questions(questions, students, seed=7)
+        self.assertEqual(assignment, assign_questions(questions, students, seed=7))
+        self.assertNotEqual(assignment, assign_questions(questions, students, seed=8))
+
+        # Every paper is worth the average (20 marks) and questions are used evenly
+        marks = {q.id: q.marks for q in questions}
+        self.assertEqual({sum(marks[q] for q in ids) for ids in assignment.values()}, {20})
+        uses = Counter(q for ids in assignment.values() for q in ids)
+        self.assertEqual(set(uses.values()), {20})
+
+
+class ExamStartTests(TestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        self.client = APIClient()
+        self.client.force_authenticate(self.faculty)
+        self.sessions = []
+        for size in (3, 40):
+            batch = Batch.objects.create(semester=semester, name=f"Batch {size}", year=2)
+            users = User.objects.bulk_create([
+                User(faculty_id=f"S{size}_{i}", email=f"s{size}_{i}@example.com", name=f"Student {i}")
+                for i in range(size)
+            ])
+            Student.objects.bulk_create([
+                Student(user=user, student_id=user.faculty_id, name=user.name, batch=batch) for user in users
+            ])
+            session = ExamSession.objects.create(batch=batch, faculty=self.faculty)
+            for i, difficulty in enumerate(('easy', 'medium', 'hard', 'medium')):
+                ExamQuestion.objects.create(session=session, title=f"Q{i}", description="-", difficulty=difficulty)
+            self.sessions.append(session)
+
+    def _start(self, session):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/exam-start/', {'session_id': session.id})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response, len(queries)
+
+    def test_start_takes_the_same_queries_for_any_batch_size(self):
+        small, small_queries = self._start(self.sessions[0])
+        large, large_queries = self._start(self.sessions[1])
+
+        self.assertEqual((small.data['students_assigned'], large.data['students_assigned']), (3, 40))
+        self.assertEqual(small_queries, large_queries)
+        counts = Counter(
+            StudentExam.assigned_questions.through.objects
+            .filter(studentexam__session=self.sessions[1])
+            .values_list('studentexam_id', flat=True)
+        )
+        self.assertEqual((len(counts), set(counts.values())), (40, {2}))
+
+
+class BatchReportTests(TestCase):
+    def setUp(self):
+        cache = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(REPORT_CACHE_DIR=cache, REPORT_JOB_WORKERS=0))
+
+    def test_grouped_stats_match_each_students_records(self):
+        from apps.evaluation.models import Task, TaskSubmission, VivaRecord, VivaSession
+        from apps.evaluation.report_stats import batch_student_stats
+        from apps.lab_sessions.models import LabSession
+        from apps.students.models import Attendance
+
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        students = []
+        for i in (1, 2, 3):
+            user = User.objects.create_user(f"CS00{i}", f"cs00{i}@example.com", "pw", name=f"Student {i}")
+            students.append(Student.objects.create(user=user, student_id=f"CS00{i}", name=f"Student {i}", batch=batch))
+        first, second, idle = students
+
+        tasks = [Task.objects.create(batch=batch, faculty=faculty, title=f"T{i}", description="-") for i in range(3)]
+        TaskSubmission.objects.create(task=tasks[0], student=first, status='evaluated', marks=8)
+        TaskSubmission.objects.create(task=tasks[1], student=first, status='evaluated', marks=6)
+        TaskSubmission.objects.create(task=tasks[2], student=first, status='pending')
+        TaskSubmission.objects.create(task=tasks[0], student=second, status='submitted')
+        sessions = [LabSession.objects.create(batch=batch, faculty=faculty) for _ in range(4)]
+        for session, status in zip(sessions, ['present', 'present', 'absent', 'present']):
+            Attendance.objects.create(student=first, session=session, status=status)
+        viva = VivaSession.objects.create(batch=batch, faculty=faculty, subject="DBMS")
+        VivaRecord.objects.create(student=second, viva_session=viva, faculty=faculty, status='completed', marks=70)
+
+        with self.assertNumQueries(3):
+            stats = batch_student_stats(batch.id)
+
+        self.assertEqual(
+            {k: stats[first.id][k] for k in ('tasks', 'evaluated', 'task_avg', 'attendance_pct', 'viva_count')},
+            {'tasks': 3, 'evaluated': 2, 'task_avg': 7.0, 'attendance_pct': 75.0, 'viva_count': 0},
+        )
+        self.assertEqual((stats[second.id]['submitted'], stats[second.id]['viva_avg']), (1, 70.0))
+        self.assertNotIn(idle.id, stats)
+
+        client = APIClient()
+        client.force_authenticate(faculty)
+        response = client.get(f'/api/reports/submissions/batch/{batch.id}/pdf/')
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/pdf'))
+
+    def test_report_jobs_are_cached_until_the_data_changes(self):
+        from apps.evaluation.models import Task, TaskSubmission
+        from apps.monitor.models import OutboxEvent
+
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        student = Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=batch)
+        task = Task.objects.create(batch=batch, faculty=faculty, title="T1", description="-")
+        client = APIClient()
+        client.force_authenticate(faculty)
+
+        first = client.post('/api/reports/jobs/', {'kind': 'batch', 'id': batch.id}, format='json')
+        self.assertEqual((first.status_code, first.data['status'], first.data['cached']), (200, 'done', False))
+        events = OutboxEvent.objects.filter(group=f'faculty_{faculty.id}').values_list('payload', flat=True)
+        self.assertEqual([e['status'] for e in events], ['running', 'done'])
+
+        again = client.post('/api/reports/jobs/', {'kind': 'batch', 'id': batch.id}, format='json')
+        self.assertEqual((again.data['id'], again.data['cached']), (first.data['id'], True))
+        pdf = client.get(f"/api/reports/jobs/{first.data['id']}/pdf/")
+        self.assertEqual((pdf.status_code, pdf['Content-Type']), (200, 'application/pdf'))
+
+        TaskSubmission.objects.create(task=task, student=student, status='evaluated', marks=9)
+        changed = client.post('/api/reports/jobs/', {'kind': 'batch', 'id': batch.id}, format='json')
+        self.assertNotEqual(changed.data['id'], first.data['id'])
+        self.assertFalse(changed.data['cached'])
+        self.assertEqual(client.get(f"/api/reports/jobs/{first.data['id']}/").status_code, 404)
+        self.assertEqual(os.listdir(settings.REPORT_CACHE_DIR), [changed.data['id']])
+
+        self.assertEqual(client.post('/api/reports/jobs/', {'kind': 'batch', 'id': 999}, format='json').status_code, 404)
+        self.assertEqual(client.post('/api/reports/jobs/', {'kind': 'exam', 'id': 1}, format='json').status_code, 400)
+
+
+class BroadcastSignalTests(TestCase):
+    def test_save_path_does_not_load_related_rows(self):
+        from apps.evaluation.models import Task, TaskSubmission
+        from apps.monitor.models import OutboxEvent
+
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        student = Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=batch)
+        task = Task.objects.create(batch=batch, faculty=faculty, title="T1", description="-")
+        submission = TaskSubmission.objects.create(task=task, student=student, status='pending')
+
+        submission = TaskSubmission.objects.get(pk=submission.pk)
+        submission.status = 'evaluated'
+        with CaptureQueriesContext(connection) as queries:
+            submission.save()
+        tables = (Task._meta.db_table, Student._meta.db_table)
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('SELECT') and any(t in q['sql'] for t in tables)])
+
+        # The evaluate endpoint loads the task with the submission, so the event keeps its title
+        client = APIClient()
+        client.force_authenticate(faculty)
+        response = client.post(f'/api/submissions/{submission.pk}/evaluate/', {'marks': 9}, format='json')
+        self.assertEqual(response.status_code, 200)
+        events = OutboxEvent.objects.filter(group=f'student_{student.id}').order_by('id').values_list('payload', flat=True)
+        self.assertEqual([e['submission']['task_title'] for e in events if 'submission' in e][-1], 'T1')
@@ -20,6 +20,7 @@ urlpatterns = [
     path('exam-end/', views.ExamEndView.as_view(), name='exam-end'),
     path('exam-submissions/', views.ExamSubmissionsView.as_view(), name='exam-submissions'),
     path('exam-evaluate/', views.ExamEvaluateView.as_view(), name='exam-evaluate'),
+    path('exam-activity/', views.ExamActivityView.as_view(), name='exam-activity'),
 
     # Student exam endpoints
     path('my-exam/', views.MyExamView.as_view(), name='my-exam'),
@@ -44,4 +45,7 @@ urlpatterns = [
         views.batch_submission_report_pdf,
         name='batch-submission-report-pdf'
     ),
+    path('reports/jobs/', views.ReportJobView.as_view(), name='report-jobs'),
+    path('reports/jobs/<str:job_id>/', views.ReportJobView.as_view(), name='report-job'),
+    path('reports/jobs/<str:job_id>/pdf/', views.report_job_pdf, name='report-job-pdf'),
 ]
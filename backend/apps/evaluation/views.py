@@ -4,10 +4,11 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
 from rest_framework.views import APIView
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from django.db.models import Avg, Q
 from io import BytesIO
+import os
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
@@ -65,12 +66,10 @@ class VivaSessionViewSet(viewsets.ModelViewSet):
                 )
         elif session.viva_type == 'online' and session.status == 'live':
             try:
-                from channels.layers import get_channel_layer
-                from asgiref.sync import async_to_sync
-                channel_layer = get_channel_layer()
+                from apps.monitor.events import broadcast
                 batch_group = f'batch_{session.batch.id}'
 
-                async_to_sync(channel_layer.group_send)(
+                broadcast(
                     batch_group,
                     {
                         'type': 'viva_event',
@@ -99,12 +98,10 @@ class VivaSessionViewSet(viewsets.ModelViewSet):
         session.save()
 
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            channel_layer = get_channel_layer()
+            from apps.monitor.events import broadcast
             batch_group = f'batch_{session.batch.id}'
 
-            async_to_sync(channel_layer.group_send)(
+            broadcast(
                 batch_group,
                 {
                     'type': 'viva_event',
@@ -134,16 +131,14 @@ class VivaSessionViewSet(viewsets.ModelViewSet):
         ).update(is_published=True)
 
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            channel_layer = get_channel_layer()
+            from apps.monitor.events import broadcast
             records = VivaRecord.objects.filter(
                 viva_session=session, is_published=True
             ).select_related('student', 'viva_session')
 
             for record in records:
                 student_group = f'student_{record.student.id}'
-                async_to_sync(channel_layer.group_send)(
+                broadcast(
                     student_group,
                     {
                         'type': 'viva_event',
@@ -192,13 +187,10 @@ class VivaRecordViewSet(viewsets.ModelViewSet):
 
         if record.status == 'completed':
             try:
-                from channels.layers import get_channel_layer
-                from asgiref.sync import async_to_sync
-
-                channel_layer = get_channel_layer()
+                from apps.monitor.events import broadcast
                 student_group = f'student_{record.student.id}'
 
-                async_to_sync(channel_layer.group_send)(
+                broadcast(
                     student_group,
                     {
                         'type': 'viva_event',
@@ -229,7 +221,7 @@ class VivaResultView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        record, created = VivaRecord.objects.get_or_create(
+        record, created = VivaRecord.objects.select_related('viva_session').get_or_create(
             viva_session_id=viva_session_id,
             student_id=student_id,
             defaults={'faculty': request.user}
@@ -241,11 +233,9 @@ class VivaResultView(APIView):
         record.save()
 
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            channel_layer = get_channel_layer()
+            from apps.monitor.events import broadcast
             student_group = f'student_{record.student.id}'
-            async_to_sync(channel_layer.group_send)(
+            broadcast(
                 student_group,
                 {
                     'type': 'viva_event',
@@ -314,11 +304,12 @@ class ExamQuestionViewSet(viewsets.ModelViewSet):
 
 
 class ExamStartView(APIView):
-    """Faculty: Start an exam session — randomly assigns questions to all students."""
+    """Faculty: Start an exam session — assigns each student a balanced, seeded set of questions."""
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        import random
+        from .assignment import start_exam
+
         session_id = request.data.get('session_id')
         if not session_id:
             return Response({'error': 'session_id required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -331,7 +322,7 @@ class ExamStartView(APIView):
         if session.status == 'active':
             return Response({'error': 'Exam already active'}, status=status.HTTP_400_BAD_REQUEST)
 
-        questions = list(session.questions.all())
+        questions = list(session.questions.only('id', 'difficulty', 'marks'))
         if not questions:
             return Response(
                 {'error': 'Add at least one question before starting'},
@@ -339,33 +330,24 @@ class ExamStartView(APIView):
             )
 
         from apps.students.models import Student
-        students = list(Student.objects.filter(batch=session.batch))
-        if not students:
+        student_ids = list(Student.objects.filter(batch_id=session.batch_id).values_list('id', flat=True))
+        if not student_ids:
             return Response({'error': 'No students found in batch'}, status=status.HTTP_400_BAD_REQUEST)
 
-        random.shuffle(questions)
-        assigned_count = 0
-        for i, student in enumerate(students):
-            exam_rec, created = StudentExam.objects.get_or_create(
-                session=session, student=student
-            )
-            if created or exam_rec.assigned_questions.count() == 0:
-                start = i % len(questions)
-                end = start + min(2, len(questions))
-                assigned = (questions + questions)[start:end]
-                exam_rec.assigned_questions.set(assigned)
-                exam_rec.save()
-            assigned_count += 1
+        # Same exam, same papers: the assignment is seeded by the session unless a seed is given
+        try:
+            seed = int(request.data.get('seed', session.id))
+        except (TypeError, ValueError):
+            return Response({'error': 'seed must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        assigned_count = start_exam(session, questions, student_ids, seed)
 
         session.status = 'active'
-        session.save()
+        session.save(update_fields=['status', 'updated_at'])
 
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            channel_layer = get_channel_layer()
-            batch_group = f'batch_{session.batch.id}'
-            async_to_sync(channel_layer.group_send)(
+            from apps.monitor.events import broadcast
+            batch_group = f'batch_{session.batch_id}'
+            broadcast(
                 batch_group,
                 {
                     'type': 'viva_event',
@@ -373,6 +355,7 @@ class ExamStartView(APIView):
                     'session_id': session.id,
                     'title': session.title,
                     'duration_minutes': session.duration_minutes,
+                    'record_screens': session.record_screens,
                 }
             )
         except Exception:
@@ -382,6 +365,7 @@ class ExamStartView(APIView):
             'status': 'active',
             'session_id': session.id,
             'students_assigned': assigned_count,
+            'seed': seed,
         }, status=status.HTTP_200_OK)
 
 
@@ -402,11 +386,9 @@ class ExamEndView(APIView):
         session.save()
 
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            channel_layer = get_channel_layer()
+            from apps.monitor.events import broadcast
             batch_group = f'batch_{session.batch.id}'
-            async_to_sync(channel_layer.group_send)(
+            broadcast(
                 batch_group,
                 {
                     'type': 'viva_event',
@@ -436,6 +418,23 @@ class ExamSubmissionsView(APIView):
         return Response(serializer.data)
 
 
+class ExamActivityView(APIView):
+    """Faculty: Screen activity of an exam — per-student summary, or one student's timeline."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .screen_activity import session_summary, timeline
+
+        session_id = request.query_params.get('session_id')
+        if not session_id:
+            return Response({'error': 'session_id required'}, status=status.HTTP_400_BAD_REQUEST)
+        student_id = request.query_params.get('student_id')
+        if not student_id:
+            return Response(session_summary(session_id))
+        student_exam = get_object_or_404(StudentExam, session_id=session_id, student_id=student_id)
+        return Response(timeline(student_exam))
+
+
 class ExamEvaluateView(APIView):
     """Faculty: Save marks and feedback for a student's exam submission."""
     permission_classes = [IsAuthenticated]
@@ -456,7 +455,7 @@ class ExamEvaluateView(APIView):
             return Response({'error': 'marks must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            exam_rec = StudentExam.objects.get(id=exam_id)
+            exam_rec = StudentExam.objects.select_related('session').get(id=exam_id)
         except StudentExam.DoesNotExist:
             return Response({'error': 'StudentExam not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -467,11 +466,9 @@ class ExamEvaluateView(APIView):
         exam_rec.save()
 
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            channel_layer = get_channel_layer()
-            student_group = f'student_{exam_rec.student.id}'
-            async_to_sync(channel_layer.group_send)(
+            from apps.monitor.events import broadcast
+            student_group = f'student_{exam_rec.student_id}'
+            broadcast(
                 student_group,
                 {
                     'type': 'viva_event',
@@ -601,7 +598,8 @@ class TaskViewSet(viewsets.ModelViewSet):
 
 class TaskSubmissionViewSet(viewsets.ModelViewSet):
     """ViewSet for Task Submission management"""
-    queryset = TaskSubmission.objects.all()
+    # The serializer and the post_save broadcast read task and student
+    queryset = TaskSubmission.objects.select_related('task', 'student')
     serializer_class = TaskSubmissionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -649,12 +647,9 @@ class TaskSubmissionViewSet(viewsets.ModelViewSet):
         submission.save()
 
         try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-
-            channel_layer = get_channel_layer()
-            student_group = f'student_{submission.student.id}'
-            async_to_sync(channel_layer.group_send)(
+            from apps.monitor.events import broadcast
+            student_group = f'student_{submission.student_id}'
+            broadcast(
                 student_group,
                 {
                     'type': 'submission_event',
@@ -734,7 +729,26 @@ def submission_report(request):
 # PDF HELPERS
 # =========================
 
-def _build_pdf_response(filename, story, pagesize=landscape(A4)):
+def _layout_progress(progress):
+    """ReportLab progress callback passing (fraction of the story laid out, pages drawn) to ``progress``."""
+    state = {'total': 1, 'done': 0.0, 'pages': 0}
+
+    def callback(kind, value):
+        if kind == 'SIZE_EST':
+            state['total'] = max(value, 1)
+        elif kind == 'PROGRESS':
+            # Split tables put their remainder back in the story, so this can step back
+            state['done'] = max(state['done'], min(value / state['total'], 1.0))
+        elif kind == 'PAGE':
+            state['pages'] = value
+        else:
+            return
+        progress(state['done'], state['pages'])
+
+    return callback
+
+
+def _build_pdf(story, pagesize=landscape(A4), progress=None):
     buffer = BytesIO()
     doc = SimpleDocTemplate(
         buffer,
@@ -744,10 +758,16 @@ def _build_pdf_response(filename, story, pagesize=landscape(A4)):
         topMargin=24,
         bottomMargin=24,
     )
+    if progress is not None:
+        doc.setProgressCallBack(_layout_progress(progress))
     doc.build(story)
     pdf = buffer.getvalue()
     buffer.close()
+    return pdf
+
 
+def _build_pdf_response(filename, story, pagesize=landscape(A4)):
+    pdf = _build_pdf(story, pagesize)
     response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = f'inline; filename="{filename}"'
     return response
@@ -829,9 +849,8 @@ def _styled_table(table_data, col_widths, align_center_from_col=None):
     return table
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def student_submission_report_pdf(request, student_id):
+def render_student_report(student_id, progress=None):
+    """(filename, PDF bytes) of a student's performance report."""
     from apps.students.models import Student, Attendance
 
     student = get_object_or_404(
@@ -1042,21 +1061,22 @@ def student_submission_report_pdf(request, student_id):
     ))
 
     filename = f"student_performance_report_{student.student_id}.pdf"
-    return _build_pdf_response(filename, story)
+    return filename, _build_pdf(story, progress=progress)
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def batch_submission_report_pdf(request, batch_id):
+def render_batch_report(batch_id, progress=None):
+    """(filename, PDF bytes) of a batch's performance report."""
     from apps.core.models import Batch
-    from apps.students.models import Student, Attendance
+    from apps.students.models import Student
+    from .report_stats import batch_student_stats, empty_stats
 
     batch = get_object_or_404(
         Batch.objects.select_related('semester'),
         id=batch_id
     )
 
-    students = Student.objects.filter(batch_id=batch_id).order_by('name')
+    students = list(Student.objects.filter(batch_id=batch_id).order_by('name').values('id', 'student_id', 'name'))
+    stats = batch_student_stats(batch_id)
 
     styles = _make_styles()
     story = []
@@ -1064,7 +1084,7 @@ def batch_submission_report_pdf(request, batch_id):
     story.append(Paragraph("Full Batch Performance Report", styles["title"]))
     story.append(Spacer(1, 12))
     story.append(Paragraph(f"<b>Batch:</b> {_safe(batch)}", styles["normal"]))
-    story.append(Paragraph(f"<b>Total Students:</b> {students.count()}", styles["normal"]))
+    story.append(Paragraph(f"<b>Total Students:</b> {len(students)}", styles["normal"]))
     story.append(Spacer(1, 14))
 
     table_data = [[
@@ -1079,60 +1099,23 @@ def batch_submission_report_pdf(request, batch_id):
         Paragraph("Avg Viva", styles["header"]),
     ]]
 
-    if students.exists():
+    if students:
+        # Text cells wrap in a Paragraph; the numeric columns are short plain strings
         for student in students:
-            student_subs = TaskSubmission.objects.filter(
-                student=student,
-                task__batch_id=batch_id
-            )
-
-            total_tasks = student_subs.count()
-            submitted_count = student_subs.filter(
-                Q(status__in=['submitted', 'evaluated']) | Q(submission_file__isnull=False)
-            ).count()
-            evaluated_qs = student_subs.filter(marks__isnull=False)
-            evaluated_count = evaluated_qs.count()
-            avg_task_marks = evaluated_qs.aggregate(avg=Avg('marks'))['avg']
-
-            student_attendance = Attendance.objects.filter(
-                student=student,
-                session__batch_id=batch_id
-            )
-            total_attendance = student_attendance.count()
-            present_count = student_attendance.filter(status='present').count()
-            attendance_pct = (present_count / total_attendance * 100) if total_attendance > 0 else 0
-
-            student_vivas = VivaRecord.objects.filter(
-                student=student,
-                status='completed',
-                viva_session__batch_id=batch_id
-            )
-            viva_count = student_vivas.count()
-            viva_avg = student_vivas.aggregate(avg=Avg('marks'))['avg']
-
+            row = stats.get(student['id']) or empty_stats()
             table_data.append([
-                Paragraph(_safe(student.student_id), styles["cell"]),
-                Paragraph(_safe(student.name), styles["cell"]),
-                Paragraph(str(total_tasks), styles["cell"]),
-                Paragraph(str(submitted_count), styles["cell"]),
-                Paragraph(str(evaluated_count), styles["cell"]),
-                Paragraph(f"{avg_task_marks:.1f}" if avg_task_marks is not None else "N/A", styles["cell"]),
-                Paragraph(f"{attendance_pct:.1f}%", styles["cell"]),
-                Paragraph(str(viva_count), styles["cell"]),
-                Paragraph(f"{viva_avg:.1f}" if viva_avg is not None else "N/A", styles["cell"]),
+                Paragraph(_safe(student['student_id']), styles["cell"]),
+                Paragraph(_safe(student['name']), styles["cell"]),
+                str(row['tasks']),
+                str(row['submitted']),
+                str(row['evaluated']),
+                f"{row['task_avg']:.1f}" if row['task_avg'] is not None else "N/A",
+                f"{row['attendance_pct']:.1f}%",
+                str(row['viva_count']),
+                f"{row['viva_avg']:.1f}" if row['viva_avg'] is not None else "N/A",
             ])
     else:
-        table_data.append([
-            Paragraph("No students", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-            Paragraph("-", styles["cell"]),
-        ])
+        table_data.append(["No students"] + ["-"] * 8)
 
     batch_table = _styled_table(
         table_data,
@@ -1153,4 +1136,75 @@ def batch_submission_report_pdf(request, batch_id):
     story.append(batch_table)
 
     filename = f"batch_performance_report_{batch_id}.pdf"
-    return _build_pdf_response(filename, story)
\ No newline at end of file
+    return filename, _build_pdf(story, progress=progress)
+
+
+def _cached_pdf_response(kind, object_id):
+    """The report's PDF from the cache, rendering it first if its data changed."""
+    from .report_jobs import cached_file, render, version_id
+
+    job_id = version_id(kind, object_id)
+    if job_id is None:
+        raise Http404
+    path = cached_file(job_id)
+    if path is None:
+        render(job_id, kind, object_id)
+        path = cached_file(job_id)
+    return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=os.path.basename(path))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def student_submission_report_pdf(request, student_id):
+    return _cached_pdf_response('student', student_id)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def batch_submission_report_pdf(request, batch_id):
+    return _cached_pdf_response('batch', batch_id)
+
+
+class ReportJobView(APIView):
+    """
+    Faculty: Queue a PDF report render (POST {"kind": "student"|"batch", "id": <id>})
+    or get a job's state. Progress and completion also arrive as ``report_job``
+    events on the faculty's monitor socket.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        from .report_jobs import KINDS, report_queue
+
+        kind = request.data.get('kind')
+        try:
+            object_id = int(request.data.get('id'))
+        except (TypeError, ValueError):
+            object_id = None
+        if kind not in KINDS or object_id is None:
+            return Response({'error': 'kind (student or batch) and id required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = report_queue.submit(kind, object_id, request.user.id)
+        if job is None:
+            return Response({'error': f'{kind} not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job, status=status.HTTP_200_OK if job['status'] == 'done' else status.HTTP_202_ACCEPTED)
+
+    def get(self, request, job_id):
+        from .report_jobs import report_queue
+
+        job = report_queue.status(job_id)
+        if job is None:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_pdf(request, job_id):
+    """Download a finished report job's PDF."""
+    from .report_jobs import cached_file
+
+    path = cached_file(job_id)
+    if path is None:
+        return Response({'error': 'Report not ready'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=os.path.basename(path))
@@ -1,7 +1,6 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from apps.monitor.events import broadcast
 from .models import LabSession
 
 @receiver(post_save, sender=LabSession)
@@ -9,8 +8,7 @@ def session_status_update(sender, instance, created, **kwargs):
     """
     Trigger WebSocket event when LabSession status changes.
     """
-    channel_layer = get_channel_layer()
-    batch_group_name = f'batch_{instance.batch.id}'
+    batch_group_name = f'batch_{instance.batch_id}'
     
     event_type = None
     if created and instance.status == 'active':
@@ -25,7 +23,7 @@ def session_status_update(sender, instance, created, **kwargs):
             event_type = 'session_paused'
             
     if event_type:
-        async_to_sync(channel_layer.group_send)(
+        broadcast(
             batch_group_name,
             {
                 'type': 'session_status',  # Matches consumer method
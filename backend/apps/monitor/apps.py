@@ -3,4 +3,6 @@ from django.apps import AppConfig
 class MonitorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.monitor'
-#
\ No newline at end of file
+
+    def ready(self):
+        import apps.monitor.signals
@@ -0,0 +1,63 @@
+"""
+Wire encoding for the monitor/student WebSockets.
+
+Clients that offer the ``smartlab.msgpack`` subprotocol get binary msgpack
+frames in both directions; everything else (old clients, ``smartlab.json``)
+keeps using JSON text frames. Message schemas are the same in both encodings.
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is pinned in requirements
+    msgpack = None
+
+
+MSGPACK_SUBPROTOCOL = 'smartlab.msgpack'
+JSON_SUBPROTOCOL = 'smartlab.json'
+
+
+def negotiate(offered):
+    """Pick the subprotocol to accept from the client's offer (None = legacy JSON)."""
+    offered = offered or []
+    if MSGPACK_SUBPROTOCOL in offered and msgpack is not None:
+        return MSGPACK_SUBPROTOCOL
+    if JSON_SUBPROTOCOL in offered:
+        return JSON_SUBPROTOCOL
+    return None
+
+
+def encode(payload, subprotocol=None):
+    """Return ``(text_data, bytes_data)`` for a payload under the negotiated subprotocol."""
+    if subprotocol == MSGPACK_SUBPROTOCOL:
+        return None, msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload), None
+
+
+def decode(text_data=None, bytes_data=None):
+    if bytes_data is not None:
+        if msgpack is None:
+            raise ValueError('Binary frame received but msgpack is not installed')
+        return msgpack.unpackb(bytes_data, raw=False)
+    return json.loads(text_data)
+
+
+class CodecConsumerMixin:
+    """
+    Subprotocol negotiation and framing for AsyncWebsocketConsumer subclasses.
+    Use ``accept_negotiated`` instead of ``accept`` and ``send_message``
+    instead of ``send(text_data=json.dumps(...))``.
+    """
+
+    subprotocol = None
+
+    async def accept_negotiated(self):
+        self.subprotocol = negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=self.subprotocol)
+
+    async def send_message(self, payload):
+        text_data, bytes_data = encode(payload, self.subprotocol)
+        await self.send(text_data=text_data, bytes_data=bytes_data)
+
+    def decode_message(self, text_data=None, bytes_data=None):
+        return decode(text_data, bytes_data)
@@ -1,95 +1,182 @@
-import json
+import asyncio
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from rest_framework_simplejwt.tokens import AccessToken
-from django.contrib.auth import get_user_model
+from django.db.models import F
 from aiortc import RTCPeerConnection, RTCSessionDescription
 
+from apps.evaluation.screen_activity import record as record_screen_activity
 
-User = get_user_model()
+from .codec import MSGPACK_SUBPROTOCOL, CodecConsumerMixin
+from .events import event_log, faculty_group
+from .fanout import status_fanout
+from .media_relay import media_relay
+from .outbox import OutboxConsumerMixin
+from .presence import presence_store
+from .sendqueue import CRITICAL, LATEST, SendQueueMixin
+from .snapshots import batch_snapshots
+from .thumbnails import encode_for, thumbnail_bytes, thumbnail_wall
+from .viewers import live_viewers
 
 
-class MonitorConsumer(AsyncWebsocketConsumer):
+def query_param(scope, name, default=None):
+    values = parse_qs(scope.get('query_string', b'').decode()).get(name)
+    return values[-1] if values else default
+
+
+async def load_student_presence(student_id):
+    """Identity and presence columns used to seed the presence store, in one query."""
+    from apps.students.models import Student
+
+    return await (
+        Student.objects
+        .filter(id=student_id)
+        .values('id', 'batch_id', 'name', 'status', 'current_mode', 'last_seen',
+                pc_id=F('pc_mapping__pc_id'))
+        .afirst()
+    )
+
+
+class MonitorConsumer(SendQueueMixin, OutboxConsumerMixin, CodecConsumerMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time student status monitoring.
     Handles live updates for student online/offline status and mode changes.
     """
 
+    # Signaling, control acks and snapshots are never dropped; everything else
+    # drops oldest-first if the faculty client falls behind.
+    send_priorities = {
+        'monitor_answer': CRITICAL,
+        'monitor_ice': CRITICAL,
+        'control_ack': CRITICAL,
+        'initial_load': CRITICAL,
+        'batch_delta': CRITICAL,
+        'thumbnail': LATEST,
+        'report_job': CRITICAL,
+    }
+
     async def connect(self):
         """Handle WebSocket connection"""
-        self.batch_id = self.scope['url_route']['kwargs']['batch_id']
-        self.batch_group_name = f'monitor_batch_{self.batch_id}'
-
-        token = self.scope['query_string'].decode().split('token=')[-1]
-        user = await self.authenticate_token(token)
-
-        if not user:
+        # Authenticated by JWTAuthMiddleware from ?token=<jwt>
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
             await self.close()
             return
 
-        self.scope['user'] = user
-        self.broadcast_group_name = f'batch_{self.batch_id}'
-
-        # Join the monitor group (faculty-specific events)
-        await self.channel_layer.group_add(
-            self.batch_group_name,
-            self.channel_name
-        )
-
-        # Join the broadcast group (session/task events)
-        await self.channel_layer.group_add(
-            self.broadcast_group_name,
-            self.channel_name
-        )
-
-        await self.accept()
-
-
-        students = await self.get_batch_students(self.batch_id)
-        await self.send(text_data=json.dumps({
+        self.batch_ids = set()
+        self.relay_offers = {}
+        await self.accept_negotiated()
+        self.start_send_queue(f'monitor:{self.channel_name}')
+        await self.channel_layer.group_add(faculty_group(user.id), self.channel_name)
+        await self.subscribe(self.scope['url_route']['kwargs']['batch_id'], query_param(self.scope, 'since'))
+
+    async def subscribe(self, batch_id, since=None):
+        """Join a batch's monitor (faculty) and broadcast (session/task) groups and send its snapshot."""
+        batch_id = int(batch_id)
+        if batch_id not in self.batch_ids:
+            self.batch_ids.add(batch_id)
+            await self.channel_layer.group_add(f'monitor_batch_{batch_id}', self.channel_name)
+            await self.channel_layer.group_add(f'batch_{batch_id}', self.channel_name)
+        await self.send_snapshot(batch_id, since)
+
+    async def unsubscribe(self, batch_id):
+        batch_id = int(batch_id)
+        if batch_id in self.batch_ids:
+            self.batch_ids.discard(batch_id)
+            await self.channel_layer.group_discard(f'monitor_batch_{batch_id}', self.channel_name)
+            await self.channel_layer.group_discard(f'batch_{batch_id}', self.channel_name)
+
+    async def send_snapshot(self, batch_id, since=None):
+        """
+        Send only the rows changed since the client's last known version, or
+        the full batch snapshot when there is no usable delta.
+        """
+        if since is not None:
+            try:
+                delta = batch_snapshots.delta(batch_id, int(since))
+            except ValueError:
+                delta = None
+            if delta is not None:
+                version, students = delta
+                self.queue_message({
+                    'type': 'batch_delta',
+                    'batch_id': batch_id,
+                    'since': int(since),
+                    'version': version,
+                    'students': students
+                })
+                return
+
+        version, students = await batch_snapshots.aload(batch_id)
+        self.queue_message({
             'type': 'initial_load',
+            'batch_id': batch_id,
+            'version': version,
             'students': students
-        }))
+        })
+
+    def forward(self, event):
+        """Queue a group event unless it is tagged with a batch this socket left."""
+        batch_id = event.get('batch_id')
+        if batch_id is not None and int(batch_id) not in self.batch_ids:
+            return
+        self.queue_message(event)
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
-        if hasattr(self, 'batch_group_name'):
-            await self.channel_layer.group_discard(
-                self.batch_group_name,
-                self.channel_name
-            )
-        
-        if hasattr(self, 'broadcast_group_name'):
-            await self.channel_layer.group_discard(
-                self.broadcast_group_name,
-                self.channel_name
-            )
+        self.stop_send_queue()
+        for batch_id in list(getattr(self, 'batch_ids', ())):
+            await self.unsubscribe(batch_id)
+        user = self.scope.get('user')
+        if user and user.is_authenticated:
+            await self.channel_layer.group_discard(faculty_group(user.id), self.channel_name)
+        live_viewers.drop_viewer(self.channel_name)
+        if media_relay.enabled:
+            await self.cancel_relay_offers()
+            await media_relay.drop_viewer(self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = self.decode_message(text_data, bytes_data)
+        except ValueError:
+            return
 
+        if self.acknowledge(data):
+            return
+        print("Backend MonitorConsumer received:", data)
+        await self.handle_message(data)
 
-    async def receive(self, text_data):
+    async def handle_message(self, data):
         try:
-            data = json.loads(text_data)
             message_type = data.get('type')
 
-            print("Backend MonitorConsumer received:", data)
-
             if message_type == 'status_update':
                 student_id = data.get('student_id')
                 status = data.get('status')
                 mode = data.get('mode')
 
-                student_data = await self.update_student_status(student_id, status, mode)
+                entry = await self.update_student_status(student_id, status, mode)
+                if entry:
+                    await status_fanout.submit(entry, batch_snapshots.apply_presence(entry))
 
-                await self.channel_layer.group_send(
-                    self.batch_group_name,
-                    {
-                        'type': 'status_broadcast',
-                        'student_data': student_data
-                    }
+            elif message_type == "monitor_offer" and media_relay.enabled:
+                # Answered by the server relay; the student sees one peer however many watch.
+                # Pre-warm offers go unanswered there: the upstream is shared and only
+                # opened for a real view, and the client falls back to a full offer.
+                if data.get("prewarm"):
+                    return
+                student_id = data.get("student_id")
+                await self.cancel_relay_offers(student_id)
+                self.relay_offers[student_id] = asyncio.ensure_future(
+                    self.relay_offer(student_id, data.get("offer"), data.get("profile"))
                 )
 
             elif message_type == "monitor_offer":
                 student_id = data.get("student_id")
+                if not data.get("prewarm"):
+                    live_viewers.start(student_id, self.channel_name)
+                elif not live_viewers.allows(student_id, self.channel_name):
+                    # Would replace the connection another faculty is watching
+                    return
 
                 # Forward offer to the specific student
                 await self.channel_layer.group_send(
@@ -97,11 +184,17 @@ class MonitorConsumer(AsyncWebsocketConsumer):
                     {
                         "type": "monitor_offer",
                         "offer": data.get("offer"),
+                        "profile": data.get("profile"),
+                        "prewarm": data.get("prewarm", False),
                         "faculty_channel": self.channel_name,
                         "student_id": student_id
                     }
                 )
 
+            elif message_type == "monitor_ice" and media_relay.enabled:
+                # Relay downstream answers carry all their candidates
+                pass
+
             elif message_type == "monitor_ice":
                 student_id = data.get("student_id")
 
@@ -112,12 +205,43 @@ class MonitorConsumer(AsyncWebsocketConsumer):
                     {
                         "type": "monitor_ice",
                         "candidate": data.get("candidate"),
+                        "candidates": data.get("candidates"),
                         "student_id": student_id
                     }
                 )
 
+            elif message_type in ("monitor_resume", "monitor_pause") and media_relay.enabled:
+                # Relay viewers are never pre-warmed; a pause closes the downstream
+                # (and the upstream with its last viewer).
+                if message_type == "monitor_pause":
+                    await self.cancel_relay_offers(data.get("student_id"))
+                    await media_relay.unsubscribe(self.channel_name, data.get("student_id"))
+
+            elif message_type in ("monitor_resume", "monitor_pause"):
+                # Start/stop frames on a pre-warmed connection
+                student_id = data.get("student_id")
+                if not live_viewers.allows(student_id, self.channel_name):
+                    return
+                if message_type == "monitor_resume":
+                    live_viewers.start(student_id, self.channel_name)
+                else:
+                    live_viewers.stop(student_id, self.channel_name)
+                await self.channel_layer.group_send(
+                    f"student_{student_id}",
+                    {
+                        "type": message_type
+                    }
+                )
+
+            elif message_type == "monitor_stop" and media_relay.enabled:
+                await self.cancel_relay_offers(data.get("student_id"))
+                await media_relay.unsubscribe(self.channel_name, data.get("student_id"))
+
             elif message_type == "monitor_stop":
                 student_id = data.get("student_id")
+                if not live_viewers.allows(student_id, self.channel_name):
+                    return
+                live_viewers.stop(student_id, self.channel_name)
 
                 await self.channel_layer.group_send(
                     f"student_{student_id}",
@@ -126,127 +250,201 @@ class MonitorConsumer(AsyncWebsocketConsumer):
                     }
                 )
 
-        except json.JSONDecodeError:
+            elif message_type in ("thumbnails_start", "thumbnails_stop"):
+                await self.set_thumbnails(data.get("batch_id"), message_type == "thumbnails_start")
+
+        except ValueError:
             pass
 
+    async def relay_offer(self, student_id, offer, profile=None):
+        """Answer a viewer offer from the media relay (see media_relay.py)."""
+        try:
+            answer = await media_relay.subscribe(self.channel_name, int(student_id), offer, profile)
+        except Exception as e:
+            print(f"Media relay: offer for student {student_id} failed: {e}")
+            return
+        finally:
+            if self.relay_offers.get(student_id) is asyncio.current_task():
+                del self.relay_offers[student_id]
+        if answer is not None:
+            self.queue_message({
+                "type": "monitor_answer",
+                "answer": answer,
+                "student_id": int(student_id),
+                "relay": True
+            })
+
+    async def cancel_relay_offers(self, student_id=None):
+        """
+        Cancel relay offers still waiting for a student (one student's, or all
+        of them) and wait until the relay has dropped them, so a viewer that
+        stopped or left is never added as a downstream afterwards.
+        """
+        offers = getattr(self, 'relay_offers', {})
+        keys = list(offers) if student_id is None else [student_id]
+        tasks = [task for task in (offers.pop(key, None) for key in keys) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def set_thumbnails(self, batch_id, enabled):
+        """
+        Ask a subscribed batch's students to send (or stop sending) thumbnails.
+        Clients repeat thumbnails_start while the wall is open to renew the lease.
+        """
+        if batch_id is None and len(self.batch_ids) == 1:
+            batch_id = next(iter(self.batch_ids))
+        try:
+            batch_id = int(batch_id)
+        except (TypeError, ValueError):
+            return
+        if batch_id in self.batch_ids:
+            await self.channel_layer.group_send(f'batch_{batch_id}', thumbnail_wall.control(enabled, batch_id))
+
     async def monitor_answer(self, event):
         """Receive answer from student group, forward to faculty WebSocket"""
         print("Faculty received answer event:", event)
-        await self.send(text_data=json.dumps({
+        self.forward({
             "type": "monitor_answer",
+            "batch_id": event.get("batch_id"),
             "answer": event["answer"],
             "student_id": event["student_id"]
-        }))
+        })
 
     async def monitor_ice(self, event):
         """Receive ICE candidate from student, forward to faculty WebSocket"""
-        await self.send(text_data=json.dumps({
+        self.forward({
             "type": "monitor_ice",
-            "candidate": event["candidate"],
+            "batch_id": event.get("batch_id"),
+            "candidate": event.get("candidate"),
+            "candidates": event.get("candidates"),
             "student_id": event["student_id"]
-        }))
-
-    async def status_broadcast(self, event):
-        student_data = event['student_data']
-        await self.send(text_data=json.dumps({
-            'type': 'status_broadcast',
-            **student_data
-        }))
+        })
 
-    async def student_status(self, event):
-        await self.send(text_data=json.dumps(event))
+    async def status_batch(self, event):
+        """Coalesced status changes for the batch (see fanout.StatusAggregator)"""
+        self.forward(event)
 
     async def submission_event(self, event):
-        await self.send(text_data=json.dumps(event))
+        self.forward(event)
 
     async def session_status(self, event):
         """Forward session status events (start/end) to faculty"""
-        await self.send(text_data=json.dumps(event))
+        self.forward(event)
 
     async def viva_event(self, event):
         """
         Receive viva event (viva_evaluated, viva_online_published).
         Called by channel_layer.group_send with type='viva_event'.
         """
-        await self.send(text_data=json.dumps(event))
+        self.forward(event)
     
     async def control_ack(self, event):
         """Receive control acknowledgment and forward to faculty"""
-        await self.send(text_data=json.dumps(event))
+        self.forward(event)
+
+    async def control_command(self, event):
+        """Student-bound command on the shared batch group; nothing to forward."""
+
+    async def task_event(self, event):
+        """Student-bound task event on the shared batch group; nothing to forward."""
+
+    async def thumbnail_control(self, event):
+        """Student-bound thumbnail request on the shared batch group; nothing to forward."""
+
+    async def thumbnail(self, event):
+        """Latest screen thumbnail of a student (see thumbnails.py)"""
+        self.forward(encode_for(event, self.subprotocol == MSGPACK_SUBPROTOCOL))
+
+    async def report_job(self, event):
+        """Progress or completion of a PDF report this faculty asked for (see evaluation/report_jobs.py)"""
+        self.queue_message(event)
     
 
-    @database_sync_to_async
-    def authenticate_token(self, token_string):
-        try:
-            access_token = AccessToken(token_string)
-            user_id = access_token['user_id']
-            user = User.objects.get(id=user_id)
-            return user
-        except Exception:
+    async def update_student_status(self, student_id, status, mode):
+        if not student_id:
             return None
 
-    @database_sync_to_async
-    def get_batch_students(self, batch_id):
-        from apps.students.models import Student
-        from apps.students.serializers import StudentSerializer
+        if presence_store.get(student_id) is None:
+            identity = await load_student_presence(student_id)
+            if identity is None:
+                return None
+            presence_store.seed(student_id, **identity)
 
-        students = Student.objects.filter(batch_id=batch_id)
-        serializer = StudentSerializer(students, many=True)
-        return serializer.data
+        return presence_store.update(student_id, status=status, mode=mode)
 
-    @database_sync_to_async
-    def update_student_status(self, student_id, status, mode):
-        from apps.students.models import Student
-        from django.utils import timezone
 
-        try:
-            student = Student.objects.get(id=student_id)
-
-            if status:
-                student.status = status
-                student.last_seen = timezone.now()
+class MultiplexMonitorConsumer(MonitorConsumer):
+    """
+    One faculty socket for several batches (``ws/monitor/``). The client sends
+    ``{"type": "subscribe", "batch_id": <id>, "since": <version>}`` and
+    ``{"type": "unsubscribe", "batch_id": <id>}``; snapshots and events carry
+    ``batch_id``.
+    """
 
-            if mode:
-                student.current_mode = mode
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
 
-            student.save()
+        self.batch_ids = set()
+        self.relay_offers = {}
+        await self.accept_negotiated()
+        self.start_send_queue(f'monitor:{self.channel_name}')
+        await self.channel_layer.group_add(faculty_group(user.id), self.channel_name)
+
+    async def handle_message(self, data):
+        message_type = data.get('type')
+        if message_type in ('subscribe', 'unsubscribe'):
+            try:
+                batch_id = int(data.get('batch_id'))
+            except (TypeError, ValueError):
+                return
+            if message_type == 'subscribe':
+                await self.subscribe(batch_id, data.get('since'))
+            else:
+                await self.unsubscribe(batch_id)
+            return
 
-            return {
-                'student_id': student.id,
-                'student_name': student.name,
-                'pc_id': student.pc_id,
-                'status': student.status,
-                'mode': student.current_mode,
-                'last_seen': student.last_seen.isoformat() if student.last_seen else None
-            }
-        except Student.DoesNotExist:
-            return None
+        await super().handle_message(data)
 
 
-class StudentConsumer(AsyncWebsocketConsumer):
+class StudentConsumer(SendQueueMixin, OutboxConsumerMixin, CodecConsumerMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer for Students.
     Receives live updates for Lab Sessions, Tasks, Viva, Exams.
     """
 
+    # Signaling jumps the queue. Sequence-numbered events (including control
+    # commands) stay in order; if they back up, the backlog is replaced by a
+    # resync_required notice so the client reloads state over REST.
+    send_priorities = {
+        'monitor_offer': CRITICAL,
+        'monitor_ice': CRITICAL,
+        'monitor_stop': CRITICAL,
+        'monitor_resume': CRITICAL,
+        'monitor_pause': CRITICAL,
+    }
+
     async def connect(self):
         """Handle WebSocket connection"""
-        token = self.scope['query_string'].decode().split('token=')[-1]
-        user = await self.authenticate_token(token)
-
-        if not user:
-            await self.close()
-            return
-
-        self.scope['user'] = user
-
-        student_data = await self.get_student_profile(user)
-        if not student_data:
+        # Authenticated by JWTAuthMiddleware; the principal carries the student's ids
+        principal = self.scope.get('principal')
+        if principal is None or principal.student_id is None:
             await self.close()
             return
 
-        self.student_id = student_data['id']
-        self.batch_id = student_data['batch_id']
+        self.student_id = principal.student_id
+        self.batch_id = principal.batch_id
+        if presence_store.get(self.student_id) is None:
+            student_data = await load_student_presence(self.student_id)
+            if not student_data:
+                await self.close()
+                return
+            presence_store.seed(self.student_id, **student_data)
+        # Log position before joining groups; anything after it is replayed or delivered live
+        joined_seq = event_log.last_seq
         # Fixed typo: changed monitor_batch__ to batch_
         self.batch_group_name = f'batch_{self.batch_id}'
 
@@ -264,14 +462,61 @@ class StudentConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
-        await self.accept()
+        await self.accept_negotiated()
+        self.start_send_queue(f'student:{self.student_id}:{self.channel_name}')
         self.pc = None
         self.faculty_channel = None
+        self.relay_channel = None
+        self.last_seq = 0
 
         await self.broadcast_status('online')
+        await self.resume(query_param(self.scope, 'since'), joined_seq)
+
+    async def resume(self, since, joined_seq):
+        """
+        Replay batch/student events the client missed while disconnected, then
+        tell it which sequence number it is caught up to. Live copies of
+        replayed events are dropped by send_event.
+        """
+        try:
+            since = int(since) if since is not None else joined_seq
+        except ValueError:
+            since = 0
+
+        events = event_log.replay([self.batch_group_name, self.student_group_name], since)
+        if events is None:
+            self.last_seq = joined_seq
+            self.queue_message({
+                'type': 'resync_required',
+                'seq': self.last_seq,
+            })
+            return
+
+        self.last_seq = since
+        for event in events:
+            await self.dispatch(event)
+
+        self.queue_message({
+            'type': 'resumed',
+            'seq': self.last_seq,
+            'replayed': len(events),
+        })
+
+    def send_queue_overflow(self):
+        return {'type': 'resync_required', 'seq': self.last_seq}
+
+    async def send_event(self, event):
+        """Send a sequence-numbered event once, skipping ones already delivered."""
+        seq = event.get('seq')
+        if seq is not None:
+            if seq <= self.last_seq:
+                return
+            self.last_seq = seq
+        self.queue_message(event)
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
+        self.stop_send_queue()
         if hasattr(self, 'batch_group_name'):
             await self.channel_layer.group_discard(
                 self.batch_group_name,
@@ -288,58 +533,96 @@ class StudentConsumer(AsyncWebsocketConsumer):
             await self.broadcast_status('offline')
 
     async def session_status(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send_event(event)
 
     async def task_event(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send_event(event)
 
     async def submission_event(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self.send_event(event)
 
     async def viva_event(self, event):
         """Forward viva/exam events to student WebSocket"""
-        await self.send(text_data=json.dumps(event))
+        await self.send_event(event)
 
     async def control_command(self, event):
         """Receive control command and forward to student app"""
-        await self.send(text_data=json.dumps(event))
+        await self.send_event(event)
 
     async def monitor_offer(self, event):
         """Forward offer down to the student's WebSocket client"""
-        await self.send(text_data=json.dumps({
+        # Offers from the media relay want the answer and ICE back on its channel
+        self.relay_channel = event.get("relay_channel")
+        self.queue_message({
             "type": "monitor_offer",
             "offer": event["offer"],
+            "profile": event.get("profile"),
+            "prewarm": event.get("prewarm", False),
             "student_id": event["student_id"]
-        }))
+        })
 
     
     async def monitor_ice(self, event):
         """Forward ICE candidate down to the student's WebSocket client"""
-        await self.send(text_data=json.dumps({
+        self.queue_message({
             "type": "monitor_ice",
-            "candidate": event["candidate"],
+            "candidate": event.get("candidate"),
+            "candidates": event.get("candidates"),
             "student_id": event["student_id"]
-        }))
+        })
 
     async def monitor_stop(self, event):
         """Forward stop signal to student's WebSocket client"""
-        await self.send(text_data=json.dumps({
+        self.queue_message({
             "type": "monitor_stop"
-        }))
+        })
+
+    async def monitor_resume(self, event):
+        """Faculty opened a pre-warmed view: start sending frames"""
+        self.queue_message({"type": "monitor_resume"})
+
+    async def monitor_pause(self, event):
+        """Faculty closed the view but keeps the connection warm: stop sending frames"""
+        self.queue_message({"type": "monitor_pause"})
+
+    async def thumbnail_control(self, event):
+        """Start/stop (or renew) thumbnail sending for this student app"""
+        self.queue_message(event)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         try:
-            data = json.loads(text_data)
+            data = self.decode_message(text_data, bytes_data)
             message_type = data.get("type")
 
+            if self.acknowledge(data):
+                return
+
+            if message_type == "thumbnail":
+                await self.relay_thumbnail(data)
+                return
+
+            if message_type == "screen_activity":
+                await record_screen_activity(self.student_id, data)
+                return
+
             print("StudentConsumer received:", data)
 
-            if message_type == "monitor_answer":
+            if message_type in ("monitor_answer", "monitor_ice") and self.relay_channel:
+                await self.channel_layer.send(self.relay_channel, {
+                    "type": "relay.answer" if message_type == "monitor_answer" else "relay.ice",
+                    "student_id": self.student_id,
+                    "answer": data.get("answer"),
+                    "candidate": data.get("candidate"),
+                    "candidates": data.get("candidates"),
+                })
+
+            elif message_type == "monitor_answer":
                 # Forward answer back to faculty monitor group
                 await self.channel_layer.group_send(
                     f"monitor_batch_{self.batch_id}",
                     {
                         "type": "monitor_answer",
+                        "batch_id": self.batch_id,
                         "answer": data.get("answer"),
                         "student_id": data.get("student_id"),
                     }
@@ -351,7 +634,9 @@ class StudentConsumer(AsyncWebsocketConsumer):
                     f"monitor_batch_{self.batch_id}",
                     {
                         "type": "monitor_ice",
+                        "batch_id": self.batch_id,
                         "candidate": data.get("candidate"),
+                        "candidates": data.get("candidates"),
                         "student_id": data.get("student_id"),
                     }
                 )
@@ -359,50 +644,35 @@ class StudentConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             print("StudentConsumer receive error:", e)
 
-    @database_sync_to_async
-    def authenticate_token(self, token_string):
-        try:
-            access_token = AccessToken(token_string)
-            user_id = access_token['user_id']
-            user = User.objects.get(id=user_id)
-            return user
-        except Exception:
-            return None
+    async def relay_thumbnail(self, data):
+        """Pass a thumbnail on to the batch's monitors if the batch budget allows."""
+        image = thumbnail_bytes(data.get("data"))
+        if not image:
+            return
 
-    @database_sync_to_async
-    def get_student_profile(self, user):
-        try:
-            student = user.student_profile
-            return {'id': student.id, 'batch_id': student.batch.id}
-        except Exception:
-            return None
+        slow_down = thumbnail_wall.admit(self.batch_id, self.student_id, len(image))
+        if slow_down is not None:
+            self.queue_message(thumbnail_wall.throttle(slow_down))
+            return
 
-    @database_sync_to_async
-    def update_student_status(self, student_id, status):
-        from apps.students.models import Student
-        from django.utils import timezone
-        try:
-            student = Student.objects.get(id=student_id)
-            student.status = status
-            student.last_seen = timezone.now()
-            student.save(update_fields=['status', 'last_seen'])
-            return student
-        except Student.DoesNotExist:
-            return None
+        await self.channel_layer.group_send(
+            f"monitor_batch_{self.batch_id}",
+            {
+                "type": "thumbnail",
+                "batch_id": self.batch_id,
+                "student_id": self.student_id,
+                "data": image,
+                "width": data.get("width"),
+                "height": data.get("height"),
+                "taken_at": data.get("taken_at"),
+            }
+        )
 
     async def broadcast_status(self, status):
         if not hasattr(self, 'batch_id'):
             return
 
-        student = await self.update_student_status(self.student_id, status)
-        if student:
-            await self.channel_layer.group_send(
-                f'monitor_batch_{self.batch_id}',
-                {
-                    'type': 'student_status',
-                    'student_id': student.id,
-                    'status': status,
-                    'name': student.name,
-                    'last_seen': student.last_seen.isoformat() if student.last_seen else None
-                }
-            )
\ No newline at end of file
+        # Live view only; the students row is written by the next presence flush
+        # and faculty monitors get the change in the next status_batch frame.
+        entry = presence_store.update(self.student_id, status=status)
+        await status_fanout.submit(entry, batch_snapshots.apply_presence(entry))
@@ -0,0 +1,106 @@
+"""
+Replayable event log for batch/student group broadcasts.
+
+Every event published through ``broadcast``/``abroadcast`` gets a sequence
+number and is kept in a bounded ring buffer per group before it is sent
+through the channel layer (for ``broadcast``, after the transaction commits;
+see ``outbox``). A reconnecting StudentConsumer passes the last
+sequence number it saw and gets the missed events replayed in order, or a
+``resync_required`` notice when they are no longer in the buffer.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+
+BATCH_GROUP = re.compile(r'^(?:monitor_)?batch_(\d+)$')
+
+
+def group_batch_id(group):
+    """Batch id of a ``batch_{id}``/``monitor_batch_{id}`` group, else None."""
+    match = BATCH_GROUP.match(group)
+    return int(match.group(1)) if match else None
+
+
+def faculty_group(user_id):
+    """Group of one faculty user's monitor sockets, for events meant only for them."""
+    return f'faculty_{user_id}'
+
+
+class EventLog:
+    def __init__(self, capacity=None):
+        self._capacity = capacity
+        self._buffers = {}
+        self._floors = {}
+        self._lock = threading.Lock()
+        # Seeded from the clock so numbers keep growing across restarts; a
+        # client resuming from before this process started has to resync.
+        self.started_at = self._seq = int(time.time() * 1000)
+
+    @property
+    def capacity(self):
+        if self._capacity is not None:
+            return self._capacity
+        return getattr(settings, 'EVENT_LOG_CAPACITY', 200)
+
+    def append(self, group, event):
+        """
+        Stamp ``event`` with the next sequence number (and its batch, for batch
+        groups) and record it for ``group``.
+        """
+        batch_id = group_batch_id(group) if 'batch_id' not in event else None
+        with self._lock:
+            self._seq = max(self._seq + 1, int(time.time() * 1000))
+            event = {**event, 'seq': self._seq}
+            if batch_id is not None:
+                event['batch_id'] = batch_id
+            buffer = self._buffers.get(group)
+            if buffer is None:
+                buffer = self._buffers[group] = deque(maxlen=self.capacity)
+            if len(buffer) == buffer.maxlen:
+                self._floors[group] = buffer[0]['seq']
+            buffer.append(event)
+            return event
+
+    def replay(self, groups, since):
+        """
+        Return events with ``seq > since`` across ``groups`` in sequence order,
+        or None if some of them have already been evicted.
+        """
+        with self._lock:
+            if since < self.started_at:
+                return None
+            events = []
+            for group in groups:
+                if since < self._floors.get(group, 0):
+                    return None
+                events.extend(e for e in self._buffers.get(group, ()) if e['seq'] > since)
+        return sorted(events, key=lambda e: e['seq'])
+
+    @property
+    def last_seq(self):
+        with self._lock:
+            return self._seq
+
+
+event_log = EventLog()
+
+
+def broadcast(group, event):
+    """
+    Publish a group event from sync code (views, signal receivers). The event
+    goes through the outbox and is sent after the current transaction commits.
+    """
+    from .outbox import enqueue
+
+    enqueue(group, event)
+
+
+async def abroadcast(group, event):
+    event = event_log.append(group, event)
+    await get_channel_layer().group_send(group, event)
+    return event
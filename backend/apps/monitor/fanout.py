@@ -0,0 +1,89 @@
+"""
+Coalesced student status fan-out to faculty monitors.
+
+Status changes are collected per batch for ``MONITOR_STATUS_BATCH_WINDOW``
+seconds and sent to ``monitor_batch_{id}`` as a single ``status_batch`` frame
+holding only the latest state of each student that changed, so a whole lab
+logging in at once costs a handful of frames instead of one per student.
+"""
+import asyncio
+import threading
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+
+def status_entry(entry):
+    """Build the per-student ``status_batch`` payload from a presence entry."""
+    last_seen = entry.get('last_seen')
+    return {
+        'student_id': entry['id'],
+        'name': entry.get('name'),
+        'pc_id': entry.get('pc_id'),
+        'status': entry.get('status'),
+        'mode': entry.get('current_mode'),
+        'last_seen': last_seen.isoformat() if last_seen else None,
+    }
+
+
+class StatusAggregator:
+    def __init__(self, window=None):
+        self._window = window
+        self._pending = {}
+        self._versions = {}
+        self._handles = {}
+        self._lock = threading.Lock()
+
+    @property
+    def window(self):
+        if self._window is not None:
+            return self._window
+        return getattr(settings, 'MONITOR_STATUS_BATCH_WINDOW', 0.1)
+
+    async def submit(self, entry, version=None):
+        """
+        Queue a student's latest presence state for its batch. Later changes
+        for the same student within the window replace earlier ones.
+        """
+        batch_id = entry.get('batch_id')
+        if batch_id is None:
+            return
+
+        with self._lock:
+            self._pending.setdefault(batch_id, {})[entry['id']] = status_entry(entry)
+            if version is not None:
+                self._versions[batch_id] = max(version, self._versions.get(batch_id, 0))
+            scheduled = batch_id in self._handles
+            if not scheduled and self.window > 0:
+                loop = asyncio.get_running_loop()
+                self._handles[batch_id] = loop.call_later(self.window, self._start_flush, batch_id)
+
+        if not scheduled and self.window <= 0:
+            await self.flush(batch_id)
+
+    def _start_flush(self, batch_id):
+        asyncio.ensure_future(self.flush(batch_id))
+
+    async def flush(self, batch_id):
+        """Send the pending changes for a batch as one ``status_batch`` event."""
+        with self._lock:
+            self._handles.pop(batch_id, None)
+            students = self._pending.pop(batch_id, None)
+            version = self._versions.pop(batch_id, None)
+
+        if not students:
+            return 0
+
+        await get_channel_layer().group_send(
+            f'monitor_batch_{batch_id}',
+            {
+                'type': 'status_batch',
+                'batch_id': batch_id,
+                'version': version,
+                'students': list(students.values()),
+            }
+        )
+        return len(students)
+
+
+status_fanout = StatusAggregator()
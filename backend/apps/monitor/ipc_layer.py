@@ -0,0 +1,406 @@
+"""
+Channel layer for processes on one host, without Redis.
+
+Processes talk to a small broker over a Unix domain socket, or over a
+loopback TCP port where there are none (Windows, or when ``port`` is set).
+The broker keeps
+group membership and does the fan-out itself: a ``group_send`` is one write
+from the sending process and one write per process that has members, whatever
+the group size. Messages are packed once by the sender and relayed as bytes.
+
+The broker runs in a background thread of whichever process first takes the
+lock file next to the socket (or as ``manage.py channel_broker``). If that
+process exits, the others reconnect, one of them takes over, and each
+re-registers its group memberships. Delivery is at-most-once, like the Redis
+layers: messages in flight while the broker restarts are lost. Writes wait
+for the socket buffer to drain, so a process that reads slowly slows down
+its senders instead of growing the broker's buffers.
+
+This connects one ASGI worker with management commands and other local
+processes. It does not make several ASGI workers safe: the replay log,
+snapshots, presence, thumbnail budgets, the media relay and report jobs are
+all kept per process (see technical.md, "Channel layer backends").
+
+Settings::
+
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "apps.monitor.ipc_layer.IPCChannelLayer",
+            "CONFIG": {"path": "/run/smartlab/channels.sock"},
+        },
+    }
+
+``path`` also names the broker's lock file (``<path>.lock``), on Windows too;
+``"port": <n>`` selects TCP on 127.0.0.1.
+"""
+import asyncio
+import os
+import random
+import string
+import threading
+import time
+
+import tempfile
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), 'smartlab-channels.sock')
+
+# Loopback port used where Unix domain sockets are not available
+DEFAULT_PORT = 47231
+
+
+def transport_port(port=None):
+    """TCP port to use, or None for the Unix domain socket."""
+    if port is not None:
+        return int(port)
+    return None if hasattr(asyncio, 'open_unix_connection') and os.name != 'nt' else DEFAULT_PORT
+
+
+def _lock(lock_file, block):
+    """Exclusive lock on an open file; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+            return True
+        lock_file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not block:
+                    raise BlockingIOError
+                time.sleep(0.5)
+    except BlockingIOError:
+        return False
+
+
+def _pack(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def _frame(obj):
+    body = _pack(obj)
+    return len(body).to_bytes(4, 'big') + body
+
+
+async def _read_frame(reader):
+    size = int.from_bytes(await reader.readexactly(4), 'big')
+    return msgpack.unpackb(await reader.readexactly(size), raw=False)
+
+
+def _owner(channel):
+    """Client id embedded in a process-specific channel name, else None."""
+    if '!' not in channel:
+        return None
+    return channel[:channel.index('!')].rsplit('.', 1)[-1]
+
+
+class ChannelBroker:
+    """Group membership and fan-out for every worker connected to ``path``."""
+
+    def __init__(self, path=DEFAULT_PATH, port=None):
+        self.path = path
+        self.port = transport_port(port)
+        self.clients = {}
+        self.groups = {}
+        self._lock_file = None
+        self._server = None
+
+    def acquire(self, block=False):
+        """Take the broker lock; False if another process is the broker."""
+        lock_file = open(f'{self.path}.lock', 'a')
+        if not _lock(lock_file, block):
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    @property
+    def address(self):
+        return self.path if self.port is None else f'127.0.0.1:{self.port}'
+
+    async def serve(self):
+        if self.port is not None:
+            self._server = await asyncio.start_server(self._handle, '127.0.0.1', self.port)
+        else:
+            # The lock is held, so a leftover socket file is from a dead broker.
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        async with self._server:
+            await self._server.serve_forever()
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    def start_thread(self):
+        thread = threading.Thread(target=self.run, name='channel-broker', daemon=True)
+        thread.start()
+        return thread
+
+    async def _handle(self, reader, writer):
+        client_id = None
+        try:
+            while True:
+                op = await _read_frame(reader)
+                kind = op[0]
+                if kind == 'group':
+                    await self._drain(self._fan_out(op[1], op[2]))
+                elif kind == 'send':
+                    await self._drain(self._deliver(_owner(op[1]), [op[1]], op[2]))
+                elif kind == 'join':
+                    self.groups.setdefault(op[1], set()).add(op[2])
+                elif kind == 'leave':
+                    members = self.groups.get(op[1])
+                    if members is not None:
+                        members.discard(op[2])
+                        if not members:
+                            del self.groups[op[1]]
+                elif kind == 'hello':
+                    client_id = op[1]
+                    self.clients[client_id] = writer
+                elif kind == 'flush':
+                    self.groups.clear()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if client_id is not None and self.clients.get(client_id) is writer:
+                del self.clients[client_id]
+                self._forget(client_id)
+            writer.close()
+
+    def _fan_out(self, group, message):
+        by_owner = {}
+        for channel in self.groups.get(group, ()):
+            by_owner.setdefault(_owner(channel), []).append(channel)
+        writers = []
+        for owner, channels in by_owner.items():
+            writers += self._deliver(owner, channels, message)
+        return writers
+
+    def _deliver(self, owner, channels, message):
+        """Queue a delivery to ``owner``; returns the writers written to."""
+        writer = self.clients.get(owner)
+        if writer is None or writer.is_closing():
+            return []
+        writer.write(_frame(['deliver', channels, message]))
+        return [writer]
+
+    @staticmethod
+    async def _drain(writers):
+        """Stop reading from the sender until every receiver's buffer is below its limit."""
+        for writer in writers:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass  # that client's handler forgets it
+
+    def _forget(self, client_id):
+        for group in list(self.groups):
+            members = self.groups[group]
+            members.difference_update([c for c in members if _owner(c) == client_id])
+            if not members:
+                del self.groups[group]
+
+
+class _Connection:
+    """One event loop's link to the broker, and the queues of its channels."""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.client_id = ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(12))
+        self.queues = {}
+        self.memberships = set()
+        self._writer = None
+        self._ready = asyncio.Event()
+        self._task = None
+
+    async def start(self):
+        await self._connect()
+        self._task = asyncio.ensure_future(self._read_loop())
+
+    async def _connect(self):
+        path, port = self.layer.path, self.layer.port
+        delay = 0.01
+        while True:
+            try:
+                if port is None:
+                    reader, writer = await asyncio.open_unix_connection(path)
+                else:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                host_broker(path, port)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+        writer.write(_frame(['hello', self.client_id]))
+        for group, channel in self.memberships:
+            writer.write(_frame(['join', group, channel]))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass  # the read loop notices and reconnects
+        self._reader, self._writer = reader, writer
+        self._ready.set()
+
+    async def _read_loop(self):
+        while True:
+            try:
+                op = await _read_frame(self._reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # Broker went away: reconnect (possibly hosting it) and rejoin groups.
+                self._ready.clear()
+                self._writer.close()
+                await self._connect()
+                continue
+            if op[0] == 'deliver':
+                for channel in op[1]:
+                    self.put(channel, op[2], raise_full=False)
+
+    async def write(self, op):
+        if not self._ready.is_set():
+            await self._ready.wait()
+        writer = self._writer
+        writer.write(_frame(op))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass  # broker gone: at-most-once, the read loop reconnects
+
+    def put(self, channel, packed, raise_full=True):
+        queue = self.queues.get(channel)
+        if queue is None:
+            queue = self.queues[channel] = asyncio.Queue(maxsize=self.layer.get_capacity(channel))
+        try:
+            queue.put_nowait((time.time() + self.layer.expiry, packed))
+        except asyncio.QueueFull:
+            if raise_full:
+                raise ChannelFull(channel)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def host_broker(path, port=None):
+    """Start a broker thread for ``path`` unless some process already runs one."""
+    with _brokers_lock:
+        if path in _brokers:
+            return
+        broker = ChannelBroker(path, port)
+        if broker.acquire():
+            _brokers[path] = broker
+            broker.start_thread()
+
+
+class IPCChannelLayer(BaseChannelLayer):
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path=DEFAULT_PATH, port=None, expiry=60, capacity=100, channel_capacity=None, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.path = path
+        self.port = transport_port(port)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self._connections = {}
+
+    async def _connection(self):
+        loop = asyncio.get_running_loop()
+        connection = self._connections.get(loop)
+        if connection is None:
+            for other in [l for l in self._connections if l.is_closed()]:
+                del self._connections[other]
+            connection = self._connections[loop] = _Connection(self)
+            await connection.start()
+        return connection
+
+    def _connection_for(self, channel):
+        owner = _owner(channel)
+        for connection in self._connections.values():
+            if connection.client_id == owner:
+                return connection
+        return None
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        connection = await self._connection()
+        local = self._connection_for(channel) if '!' in channel else connection
+        if local is connection:
+            connection.put(channel, _pack(message))
+        else:
+            await connection.write(['send', channel, _pack(message)])
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        connection = self._connection_for(channel) if '!' in channel else None
+        if connection is None:
+            connection = await self._connection()
+
+        queue = connection.queues.get(channel)
+        if queue is None:
+            queue = connection.queues[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        while True:
+            try:
+                expires, packed = await queue.get()
+            finally:
+                if queue.empty():
+                    connection.queues.pop(channel, None)
+            if expires >= time.time():
+                return msgpack.unpackb(packed, raw=False)
+
+    async def new_channel(self, prefix='specific.'):
+        connection = await self._connection()
+        suffix = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        return f'{prefix}.{connection.client_id}!{suffix}'
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        connection = await self._connection()
+        # Kept by the loop that owns the channel, which rejoins after a broker restart
+        (self._connection_for(channel) or connection).memberships.add((group, channel))
+        await connection.write(['join', group, channel])
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        connection = await self._connection()
+        # Kept by the loop that owns the channel, which rejoins after a broker restart
+        (self._connection_for(channel) or connection).memberships.discard((group, channel))
+        await connection.write(['leave', group, channel])
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        connection = await self._connection()
+        await connection.write(['group', group, _pack(message)])
+
+    async def flush(self):
+        connection = await self._connection()
+        connection.queues.clear()
+        connection.memberships.clear()
+        await connection.write(['flush'])
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
@@ -0,0 +1,21 @@
+"""
+Run the IPC channel layer broker in the foreground.
+Run with: python manage.py channel_broker
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.monitor.ipc_layer import DEFAULT_PATH, ChannelBroker
+
+
+class Command(BaseCommand):
+    help = 'Run the broker for apps.monitor.ipc_layer.IPCChannelLayer'
+
+    def handle(self, *args, **options):
+        config = settings.CHANNEL_LAYERS.get('default', {}).get('CONFIG', {})
+        broker = ChannelBroker(config.get('path', DEFAULT_PATH), config.get('port'))
+
+        self.stdout.write(f'Waiting for the broker lock on {broker.path}.lock')
+        broker.acquire(block=True)
+        self.stdout.write(self.style.SUCCESS(f'Channel broker listening on {broker.address}'))
+        broker.run()
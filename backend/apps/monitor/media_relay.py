@@ -0,0 +1,207 @@
+"""
+Optional server-side relay for live screen viewing (``MONITOR_MEDIA_RELAY``).
+
+Without the relay every faculty viewer negotiates its own peer connection
+with the student, so each extra viewer costs the student another encode and
+another upload. With it, the backend is the only peer the student sees: the
+first ``monitor_offer`` for a student opens one upstream connection to the
+student, and every viewer gets a downstream connection fed from that track
+through aiortc's ``MediaRelay``. The upstream is closed (and the student told
+to stop) when its last viewer leaves.
+
+The student's answer and ICE candidates come back on the relay's own channel
+(``relay_channel`` in the offer), so the process that opened the upstream gets
+them even when the student socket lives on another worker. Each worker keeps
+its own relay, so viewers of one student on different workers still open one
+upstream per worker.
+
+Downstreams are encoded on the server, one encoder per viewer; the student's
+cost stays one capture and one encode whatever the viewer count.
+"""
+import asyncio
+
+from aiortc import RTCIceCandidate, RTCPeerConnection, RTCSessionDescription
+from aiortc.contrib.media import MediaRelay
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+
+class _Upstream:
+    def __init__(self, student_id):
+        self.student_id = student_id
+        self.pc = RTCPeerConnection()
+        self.track = asyncio.get_running_loop().create_future()
+        self.viewers = {}
+        # Viewers waiting for the student's track
+        self.waiting = 0
+
+
+class MonitorMediaRelay:
+    def __init__(self, track_timeout=None):
+        self._track_timeout = track_timeout
+        self._loop = None
+        self._channel = None
+        self._reader = None
+        self._relay = None
+        self._upstreams = {}
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'MONITOR_MEDIA_RELAY', False)
+
+    @property
+    def track_timeout(self):
+        if self._track_timeout is not None:
+            return self._track_timeout
+        return getattr(settings, 'MONITOR_RELAY_TRACK_TIMEOUT', 15)
+
+    async def _bind(self):
+        """Relay channel and reader task on the running loop (a new loop starts over)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._upstreams = {}
+            self._relay = MediaRelay()
+            layer = get_channel_layer()
+            self._channel = await layer.new_channel('media_relay.')
+            self._reader = asyncio.ensure_future(self._read(layer, self._channel))
+        return self._channel
+
+    async def _read(self, layer, channel):
+        while True:
+            message = await layer.receive(channel)
+            try:
+                await self.handle(message)
+            except Exception as e:
+                print(f"Media relay: failed to handle {message.get('type')}: {e}")
+
+    async def handle(self, message):
+        """Answer and ICE candidates from a student, sent to the relay channel."""
+        upstream = self._upstreams.get(message.get('student_id'))
+        if upstream is None:
+            return
+
+        if message['type'] == 'relay.answer':
+            answer = message['answer']
+            if upstream.pc.signalingState == 'have-local-offer':
+                await upstream.pc.setRemoteDescription(
+                    RTCSessionDescription(sdp=answer['sdp'], type=answer['type'])
+                )
+
+        elif message['type'] == 'relay.ice':
+            for candidate in message.get('candidates') or [message.get('candidate')]:
+                if not candidate or not candidate.get('candidate'):
+                    continue
+                await upstream.pc.addIceCandidate(RTCIceCandidate(
+                    sdpMid=candidate['sdpMid'],
+                    sdpMLineIndex=candidate['sdpMLineIndex'],
+                    candidate=candidate['candidate'],
+                ))
+
+    async def _open_upstream(self, student_id, profile=None):
+        channel = await self._bind()
+        upstream = self._upstreams.get(student_id)
+        if upstream is not None and upstream.pc.connectionState not in ('failed', 'closed'):
+            return upstream
+
+        upstream = self._upstreams[student_id] = _Upstream(student_id)
+        pc = upstream.pc
+        pc.addTransceiver('video', direction='recvonly')
+
+        @pc.on('track')
+        def on_track(track):
+            if track.kind == 'video' and not upstream.track.done():
+                upstream.track.set_result(track)
+
+        @pc.on('connectionstatechange')
+        async def on_connectionstatechange():
+            if pc.connectionState == 'failed':
+                await self._close_upstream(upstream)
+
+        offer = await pc.createOffer()
+        await pc.setLocalDescription(offer)
+        await get_channel_layer().group_send(f'student_{student_id}', {
+            'type': 'monitor_offer',
+            'student_id': student_id,
+            'relay_channel': channel,
+            'profile': profile,
+            'offer': {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type},
+        })
+        return upstream
+
+    async def subscribe(self, viewer, student_id, offer, profile=None):
+        """
+        Answer a viewer's offer with a downstream fed from the student's single
+        upstream (opened with the first viewer's encoder ``profile``). Returns
+        the answer, or None if the student's track did not arrive within
+        ``track_timeout``.
+
+        Cancelling a subscribe (the viewer stopped or disconnected while the
+        student was connecting) removes the viewer, and closes the upstream if
+        nobody else is watching or waiting.
+        """
+        try:
+            upstream = await self._open_upstream(student_id, profile)
+            upstream.waiting += 1
+            try:
+                track = await asyncio.wait_for(asyncio.shield(upstream.track), self.track_timeout)
+            except asyncio.TimeoutError:
+                track = None
+            finally:
+                upstream.waiting -= 1
+            if track is None:
+                print(f"Media relay: no video from student {student_id}")
+                await self._close_if_unused(upstream)
+                return None
+
+            old = upstream.viewers.pop(viewer, None)
+            if old is not None:
+                await old.close()
+
+            pc = RTCPeerConnection()
+            upstream.viewers[viewer] = pc
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=offer['sdp'], type=offer['type']))
+            pc.addTrack(self._relay.subscribe(track, buffered=False))
+            answer = await pc.createAnswer()
+            await pc.setLocalDescription(answer)
+            return {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type}
+        except asyncio.CancelledError:
+            await self.unsubscribe(viewer, student_id)
+            raise
+
+    async def unsubscribe(self, viewer, student_id):
+        upstream = self._upstreams.get(student_id)
+        if upstream is None:
+            return
+        pc = upstream.viewers.pop(viewer, None)
+        if pc is not None:
+            await pc.close()
+        await self._close_if_unused(upstream)
+
+    async def _close_if_unused(self, upstream):
+        if not upstream.viewers and not upstream.waiting:
+            await self._close_upstream(upstream)
+
+    async def drop_viewer(self, viewer):
+        """Close every downstream of a faculty socket that went away."""
+        for student_id in [s for s, upstream in self._upstreams.items() if viewer in upstream.viewers]:
+            await self.unsubscribe(viewer, student_id)
+
+    async def _close_upstream(self, upstream):
+        if self._upstreams.get(upstream.student_id) is not upstream:
+            return
+        del self._upstreams[upstream.student_id]
+        for pc in upstream.viewers.values():
+            await pc.close()
+        upstream.viewers.clear()
+        await upstream.pc.close()
+        await get_channel_layer().group_send(f'student_{upstream.student_id}', {'type': 'monitor_stop'})
+
+    def stats(self):
+        return {
+            student_id: {'state': upstream.pc.connectionState, 'viewers': len(upstream.viewers)}
+            for student_id, upstream in self._upstreams.items()
+        }
+
+
+media_relay = MonitorMediaRelay()
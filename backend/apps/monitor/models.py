@@ -40,3 +40,17 @@ class ControlState(models.Model):
 
     class Meta:
         db_table = 'control_states'
+
+
+class OutboxEvent(models.Model):
+    """Group event written with the originating transaction and sent after commit."""
+    group = models.CharField(max_length=100)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Process sending the row (see outbox.OutboxDispatcher._claim); empty while pending
+    claimed_by = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_events'
+        ordering = ['id']
@@ -0,0 +1,198 @@
+"""
+Transactional outbox for group events raised from sync code.
+
+``enqueue`` writes an ``OutboxEvent`` row in the caller's transaction, so a
+rolled-back write never emits anything and the request thread never touches
+the channel layer. After commit, ``OutboxDispatcher`` drains the table on the
+server's event loop, stamps each event through the replay log and sends one
+channel-layer message per group per drain.
+
+Rows are claimed before they are sent, so a drain in another process (a
+management command delivering inline, say) never sends the same row twice.
+A claim older than ``CLAIM_TIMEOUT`` is from a process that died mid-drain
+and may be taken over.
+
+A failed drain (database or channel layer down) is retried after
+``RETRY_DELAY`` seconds, doubling up to ``RETRY_MAX_DELAY`` until one
+succeeds. Binding to a new loop drains once, for rows left by an earlier run.
+"""
+import asyncio
+import contextvars
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.consumer import get_handler_name
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .events import event_log
+
+
+def enqueue(group, event):
+    """Record ``event`` for ``group``; it is sent once the current transaction commits."""
+    from .models import OutboxEvent
+
+    row = OutboxEvent.objects.create(group=group, payload=event)
+    transaction.on_commit(outbox_dispatcher.wake)
+    return row
+
+
+# Seconds after which a claimed but undeleted row is considered abandoned
+CLAIM_TIMEOUT = 60
+
+# Seconds before retrying a failed drain; doubled after each failure
+RETRY_DELAY = 1
+RETRY_MAX_DELAY = 60
+
+
+class OutboxDispatcher:
+    def __init__(self, batch_size=None):
+        self._batch_size = batch_size
+        self.claim_token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._loop = None
+        self._task = None
+        self._again = False
+        self._retry = None
+        self._retry_delay = RETRY_DELAY
+
+    @property
+    def batch_size(self):
+        if self._batch_size is not None:
+            return self._batch_size
+        return getattr(settings, 'OUTBOX_BATCH_SIZE', 500)
+
+    def bind(self, loop=None):
+        """Remember the server's event loop; drains are scheduled on it."""
+        loop = loop or asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._task = self._retry = None
+        self._retry_delay = RETRY_DELAY
+        loop.call_soon(self._kick, context=contextvars.Context())
+
+    def wake(self):
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            # Fresh context: the committing thread's asgiref context must not
+            # leak into the drain task, or its DB calls would wait on that thread.
+            loop.call_soon_threadsafe(self._kick, context=contextvars.Context())
+            return
+        # No ASGI loop (management commands, tests): deliver inline.
+        async_to_sync(self.drain)()
+
+    def _kick(self):
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        if self._task is not None and not self._task.done():
+            self._again = True
+            return
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            self._again = False
+            try:
+                await self.drain()
+            except Exception as e:
+                delay = self._retry_delay
+                self._retry_delay = min(delay * 2, RETRY_MAX_DELAY)
+                print(f"Outbox drain failed, retrying in {delay}s: {e}")
+                self._retry = asyncio.get_running_loop().call_later(delay, self._kick)
+                return
+            self._retry_delay = RETRY_DELAY
+            if not self._again:
+                return
+
+    async def drain(self):
+        """Send all pending outbox events. Returns the number delivered."""
+        delivered = 0
+        while True:
+            rows = await self._claim()
+            if not rows:
+                return delivered
+
+            groups = {}
+            for row_id, group, payload in rows:
+                ids, events = groups.setdefault(group, ([], []))
+                ids.append(row_id)
+                events.append(payload)
+
+            sent = []
+            layer = get_channel_layer()
+            try:
+                for group, (ids, events) in groups.items():
+                    events = [event_log.append(group, event) for event in events]
+                    if len(events) == 1:
+                        await layer.group_send(group, events[0])
+                    else:
+                        await layer.group_send(group, {'type': 'outbox_batch', 'events': events})
+                    sent.extend(ids)
+            except BaseException:
+                # Groups already sent are done; only the rest are retried
+                done = set(sent)
+                await self._delete(sent)
+                await self._release([row[0] for row in rows if row[0] not in done])
+                raise
+
+            await self._delete(sent)
+            delivered += len(rows)
+
+    async def _claim(self):
+        """Claim up to ``batch_size`` pending (or abandoned) rows for this process and return them."""
+        from .models import OutboxEvent
+
+        now = timezone.now()
+        free = Q(claimed_by='') | Q(claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT))
+        pending = OutboxEvent.objects.filter(free).order_by('id').values_list('id', flat=True)[:self.batch_size]
+        ids = [row_id async for row_id in pending]
+        if not ids:
+            return []
+        # Conditional update: rows another process claimed in the meantime are skipped
+        await OutboxEvent.objects.filter(free, id__in=ids).aupdate(claimed_by=self.claim_token, claimed_at=now)
+        rows = (
+            OutboxEvent.objects.filter(id__in=ids, claimed_by=self.claim_token)
+            .order_by('id').values_list('id', 'group', 'payload')
+        )
+        return [row async for row in rows]
+
+    async def _release(self, ids):
+        from .models import OutboxEvent
+
+        await OutboxEvent.objects.filter(id__in=ids, claimed_by=self.claim_token).aupdate(claimed_by='', claimed_at=None)
+
+    async def _delete(self, ids):
+        from .models import OutboxEvent
+
+        await OutboxEvent.objects.filter(id__in=ids).adelete()
+
+
+outbox_dispatcher = OutboxDispatcher()
+
+
+class OutboxConsumerMixin:
+    """Unpack ``outbox_batch`` messages into the consumer's normal handlers."""
+
+    async def outbox_batch(self, message):
+        for event in message['events']:
+            handler = getattr(self, get_handler_name(event), None)
+            if handler is not None:
+                await handler(event)
+
+
+class OutboxDispatcherMiddleware:
+    """ASGI middleware that binds the dispatcher to the server's event loop."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        outbox_dispatcher.bind()
+        return await self.app(scope, receive, send)
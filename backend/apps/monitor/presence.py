@@ -0,0 +1,154 @@
+"""
+Write-behind presence store for live student status.
+
+Consumers record online/offline and mode changes here instead of writing the
+``students`` row on every connect/disconnect. Dirty entries are flushed to the
+database in one bulk update per flush window, and readers (MonitorConsumer,
+StudentSerializer) overlay the live entries on top of database rows.
+"""
+import asyncio
+import logging
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+
+PRESENCE_FIELDS = ['status', 'current_mode', 'last_seen']
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceStore:
+    """In-process live view of student status with coalesced DB flushes."""
+
+    def __init__(self, flush_interval=None):
+        self._flush_interval = flush_interval
+        self._entries = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flush_handle = None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'PRESENCE_FLUSH_INTERVAL', 1.0)
+
+    def get(self, student_id):
+        """Return a copy of the live entry for a student, or None."""
+        with self._lock:
+            entry = self._entries.get(student_id)
+            return dict(entry) if entry else None
+
+    def seed(self, student_id, **fields):
+        """Register identity/current values for a student without marking it dirty."""
+        with self._lock:
+            entry = self._entries.setdefault(student_id, {'id': student_id})
+            for key, value in fields.items():
+                entry.setdefault(key, value)
+
+    def update(self, student_id, status=None, mode=None):
+        """
+        Record a status and/or mode change. Constant time; the database
+        write happens on the next flush.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(student_id, {'id': student_id})
+            if status:
+                entry['status'] = status
+                entry['last_seen'] = timezone.now()
+            if mode:
+                entry['current_mode'] = mode
+            self._dirty.add(student_id)
+            snapshot = dict(entry)
+
+        self._schedule_flush()
+        return snapshot
+
+    def statuses(self):
+        """Live status per student id."""
+        with self._lock:
+            return {i: entry['status'] for i, entry in self._entries.items() if 'status' in entry}
+
+    def sync(self, student, fields=PRESENCE_FIELDS):
+        """Replace live values with ``fields`` just saved through the ORM."""
+        with self._lock:
+            entry = self._entries.get(student.id)
+            if entry is None:
+                return
+            for field in fields:
+                entry[field] = getattr(student, field)
+            if set(PRESENCE_FIELDS) <= set(fields):
+                self._dirty.discard(student.id)
+
+    def forget(self, student_id):
+        with self._lock:
+            self._entries.pop(student_id, None)
+            self._dirty.discard(student_id)
+
+    def pending(self):
+        with self._lock:
+            return len(self._dirty)
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sync callers (shell, management commands) flush explicitly.
+            return
+        self._flush_handle = loop.call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        asyncio.ensure_future(self.aflush())
+
+    def _take_dirty(self):
+        from apps.students.models import Student
+
+        with self._lock:
+            dirty = [dict(self._entries[i]) for i in self._dirty if i in self._entries]
+            self._dirty.clear()
+
+        return [
+            Student(id=entry['id'], **{f: entry.get(f) for f in PRESENCE_FIELDS})
+            for entry in dirty
+            if all(f in entry for f in PRESENCE_FIELDS)
+        ]
+
+    def _flush_failed(self, rows, error):
+        logger.warning("Presence flush failed, retrying next window: %s", error)
+        with self._lock:
+            self._dirty.update(row.id for row in rows)
+
+    def flush(self):
+        """Write all dirty entries in a single bulk update. Returns rows written."""
+        from apps.students.models import Student
+
+        rows = self._take_dirty()
+        if not rows:
+            return 0
+        try:
+            Student.objects.bulk_update(rows, PRESENCE_FIELDS)
+        except Exception as e:
+            self._flush_failed(rows, e)
+            return 0
+        return len(rows)
+
+    async def aflush(self):
+        from apps.students.models import Student
+
+        rows = self._take_dirty()
+        if not rows:
+            return 0
+        try:
+            await Student.objects.abulk_update(rows, PRESENCE_FIELDS)
+        except Exception as e:
+            self._flush_failed(rows, e)
+            return 0
+        return len(rows)
+
+
+presence_store = PresenceStore()
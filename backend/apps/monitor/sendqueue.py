@@ -0,0 +1,345 @@
+"""
+Per-connection outbound queues for the monitor/student consumers.
+
+Channel-layer handlers only enqueue; a writer task per connection sends to
+the socket. A slow client therefore backs up its own queue instead of its
+channel-layer inbox (where overflow silently drops group messages for that
+channel, critical ones included). Messages are split into classes:
+
+- ``CRITICAL``: signaling, control and snapshots. Never dropped, sent first.
+  A client that falls ``WS_SEND_CRITICAL_CAPACITY`` of these behind is
+  closed instead; it reconnects and resyncs.
+- ``EVENT``: everything else, in order. Bounded by ``WS_SEND_QUEUE_CAPACITY``;
+  on overflow the consumer's policy decides what to do (drop oldest, or
+  replace the backlog with a resync notice).
+- ``STATUS``: student status. Collapsed to the latest state per student and
+  sent as one ``status_batch`` frame per batch when nothing more urgent is
+  waiting.
+- ``LATEST``: replaceable frames (thumbnails). Only the newest per type and
+  student is kept; sent last.
+
+A payload that fails to send (cannot be encoded, socket already closed) is
+logged and counted as dropped; the writer carries on with the next one.
+
+The server's ``send()`` returns once a frame is handed to the protocol (Daphne
+buffers it in Twisted's transport), so it never blocks on a slow socket and
+queue depth alone would only show event-loop lag. Clients therefore report
+how many messages they have handled with ``{"type": "ack", "received": n}``;
+once a connection has acked, the writer stops with ``WS_SEND_WINDOW``
+messages unacknowledged and the queue policies above take over. A client
+that never acks is only bounded by the transport buffer.
+"""
+import asyncio
+import threading
+import weakref
+from collections import deque
+
+from django.conf import settings
+
+
+CRITICAL, EVENT, STATUS, LATEST = 'critical', 'event', 'status', 'latest'
+
+STATUS_TYPES = {'status_batch'}
+
+
+class SendQueueStats:
+    """Process-wide counters, exposed at /api/control/ws-stats/."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = weakref.WeakSet()
+        self.sent = 0
+        self.dropped = 0
+        self.collapsed = 0
+        self.high_water = 0
+
+    def register(self, queue):
+        with self._lock:
+            self._queues.add(queue)
+
+    def count(self, sent=0, dropped=0, collapsed=0, depth=0):
+        with self._lock:
+            self.sent += sent
+            self.dropped += dropped
+            self.collapsed += collapsed
+            self.high_water = max(self.high_water, depth)
+
+    def snapshot(self):
+        with self._lock:
+            queues = list(self._queues)
+            totals = {
+                'sent': self.sent,
+                'dropped': self.dropped,
+                'collapsed': self.collapsed,
+                'high_water': self.high_water,
+            }
+        return {
+            **totals,
+            'connections': len(queues),
+            'depth': sum(q.depth for q in queues),
+            'queues': [q.stats() for q in queues],
+        }
+
+
+send_queue_stats = SendQueueStats()
+
+
+class SendQueue:
+    def __init__(self, send, name='', priorities=None, on_overflow=None, capacity=None,
+                 on_stuck=None, critical_capacity=None, window=None):
+        self._send = send
+        self.name = name
+        self._priorities = priorities or {}
+        self._on_overflow = on_overflow
+        self._capacity = capacity
+        self._on_stuck = on_stuck
+        self._critical_capacity = critical_capacity
+        self._window = window
+        self.acked = None
+        self._acked = asyncio.Event()
+        self.stuck = False
+        self._critical = deque()
+        self._events = deque()
+        self._status = {}
+        self._status_versions = {}
+        self._latest = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.sent = self.dropped = self.collapsed = self.high_water = 0
+        send_queue_stats.register(self)
+
+    @property
+    def capacity(self):
+        if self._capacity is not None:
+            return self._capacity
+        return getattr(settings, 'WS_SEND_QUEUE_CAPACITY', 256)
+
+    @property
+    def critical_capacity(self):
+        if self._critical_capacity is not None:
+            return self._critical_capacity
+        return getattr(settings, 'WS_SEND_CRITICAL_CAPACITY', 1024)
+
+    @property
+    def window(self):
+        if self._window is not None:
+            return self._window
+        return getattr(settings, 'WS_SEND_WINDOW', 64)
+
+    @property
+    def in_flight(self):
+        """Messages sent but not yet acknowledged (0 until the client's first ack)."""
+        if self.acked is None:
+            return 0
+        return max(self.sent - self.acked, 0)
+
+    @property
+    def depth(self):
+        return len(self._critical) + len(self._events) + self._status_depth + len(self._latest)
+
+    @property
+    def _status_depth(self):
+        return sum(len(students) for students in self._status.values())
+
+    def classify(self, payload):
+        kind = payload.get('type')
+        if kind in self._priorities:
+            return self._priorities[kind]
+        return STATUS if kind in STATUS_TYPES else EVENT
+
+    def put(self, payload):
+        if self.stuck:
+            return
+        priority = self.classify(payload)
+        if priority == CRITICAL:
+            if len(self._critical) >= self.critical_capacity:
+                self._give_up()
+                return
+            self._critical.append(payload)
+        elif priority == STATUS:
+            self._put_status(payload)
+        elif priority == LATEST:
+            self._put_latest(payload)
+        else:
+            if len(self._events) >= self.capacity:
+                self._overflow()
+            self._events.append(payload)
+
+        depth = self.depth
+        if depth > self.high_water:
+            self.high_water = depth
+            send_queue_stats.count(depth=depth)
+        self._wakeup.set()
+
+    def ack(self, received):
+        """The client has handled ``received`` messages; this enables the send window."""
+        try:
+            received = int(received)
+        except (TypeError, ValueError):
+            return
+        if self.acked is None or received > self.acked:
+            self.acked = received
+            self._acked.set()
+
+    def _put_status(self, payload):
+        entries = payload.get('students', [])
+        # Keyed by batch so a multiplexed monitor socket gets one tagged
+        # status_batch per batch.
+        batch_id = payload.get('batch_id')
+        pending = self._status.setdefault(batch_id, {})
+        collapsed = 0
+        for entry in entries:
+            key = entry.get('student_id')
+            if key in pending:
+                collapsed += 1
+                del pending[key]  # re-insert at the end
+            pending[key] = entry
+        if payload.get('version') is not None:
+            self._status_versions[batch_id] = max(payload['version'], self._status_versions.get(batch_id) or 0)
+
+        if collapsed:
+            self.collapsed += collapsed
+            send_queue_stats.count(collapsed=collapsed)
+
+    def _put_latest(self, payload):
+        key = (payload.get('type'), payload.get('batch_id'), payload.get('student_id'))
+        if self._latest.pop(key, None) is not None:
+            self.collapsed += 1
+            send_queue_stats.count(collapsed=1)
+        self._latest[key] = payload
+
+    def _overflow(self):
+        replacement = self._on_overflow() if self._on_overflow else None
+        if replacement is None:
+            self._events.popleft()
+            dropped = 1
+        else:
+            dropped = len(self._events)
+            self._events.clear()
+            self._events.append(replacement)
+        self.dropped += dropped
+        send_queue_stats.count(dropped=dropped)
+        print(f"Send queue {self.name} overflowed, dropped {dropped} message(s)")
+
+    def _give_up(self):
+        """Drop everything queued and close the client (``on_stuck``); later puts are ignored."""
+        dropped = self.depth
+        self._critical.clear()
+        self._events.clear()
+        self._status.clear()
+        self._status_versions.clear()
+        self._latest.clear()
+        self.stuck = True
+        self.dropped += dropped
+        send_queue_stats.count(dropped=dropped)
+        print(f"Send queue {self.name} is {dropped} message(s) behind, closing the connection")
+        if self._on_stuck is not None:
+            asyncio.ensure_future(self._on_stuck())
+
+    def _next(self):
+        if self._critical:
+            return self._critical.popleft()
+        if self._events:
+            return self._events.popleft()
+        if self._status:
+            batch_id = next(iter(self._status))
+            payload = {'type': 'status_batch'}
+            if batch_id is not None:
+                payload['batch_id'] = batch_id
+            payload['version'] = self._status_versions.pop(batch_id, None)
+            payload['students'] = list(self._status.pop(batch_id).values())
+            return payload
+        if self._latest:
+            return self._latest.pop(next(iter(self._latest)))
+        return None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.drain()
+
+    async def drain(self):
+        """Send everything currently queued, most urgent first, within the send window."""
+        while True:
+            # Wait before taking the next payload, so what is still queued
+            # keeps collapsing and overflowing while the client catches up
+            while self.in_flight >= self.window:
+                self._acked.clear()
+                await self._acked.wait()
+            payload = self._next()
+            if payload is None:
+                return
+            try:
+                await self._send(payload)
+            except Exception as e:
+                print(f"Send queue {self.name} dropped a {payload.get('type')} message: {e}")
+                self.dropped += 1
+                send_queue_stats.count(dropped=1)
+            else:
+                self.sent += 1
+                send_queue_stats.count(sent=1)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'depth': self.depth,
+            'critical': len(self._critical),
+            'events': len(self._events),
+            'status': self._status_depth,
+            'latest': len(self._latest),
+            'in_flight': self.in_flight,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'collapsed': self.collapsed,
+            'high_water': self.high_water,
+        }
+
+
+class SendQueueMixin:
+    """
+    Route outbound messages through a ``SendQueue``. Subclasses set
+    ``send_priorities`` and may override ``send_queue_overflow``.
+    """
+
+    send_priorities = {}
+    send_queue = None
+
+    def start_send_queue(self, name):
+        self.send_queue = SendQueue(
+            self.send_message,
+            name=name,
+            priorities=self.send_priorities,
+            on_overflow=self.send_queue_overflow,
+            on_stuck=self.close,
+        )
+        self.send_queue.start()
+
+    def send_queue_overflow(self):
+        """Message replacing an overflowing EVENT backlog, or None to drop the oldest event."""
+        return None
+
+    def acknowledge(self, data):
+        """Apply a client ``ack`` message; returns whether ``data`` was one."""
+        if data.get('type') != 'ack':
+            return False
+        if self.send_queue is not None:
+            self.send_queue.ack(data.get('received'))
+        return True
+
+    def queue_message(self, payload):
+        if self.send_queue is None:
+            return
+        self.send_queue.put(payload)
+
+    def stop_send_queue(self):
+        if self.send_queue is not None:
+            self.send_queue.stop()
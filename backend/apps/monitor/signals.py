@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .presence import PRESENCE_FIELDS, presence_store
+from .snapshots import batch_snapshots
+
+
+@receiver(post_save, sender='students.Student')
+@receiver(post_delete, sender='students.Student')
+def student_changed(sender, instance, **kwargs):
+    """
+    Drop cached batch snapshots that may hold this student. Also covers a
+    student moving between batches, since every snapshot containing the
+    student is invalidated along with the new batch.
+    """
+    batch_snapshots.invalidate(batch_id=instance.batch_id, student_id=instance.id)
+
+    live = presence_store.get(instance.id)
+    if live and (kwargs.get('signal') is post_delete or live.get('batch_id') != instance.batch_id):
+        presence_store.forget(instance.id)
+        return
+
+    # Presence saved through the ORM (mark_online, set_mode, ...) replaces the live values
+    saved = [f for f in PRESENCE_FIELDS if f in (kwargs.get('update_fields') or ())]
+    if saved:
+        presence_store.sync(instance, saved)
+
+
+@receiver(post_save, sender='core.PCMapping')
+@receiver(post_delete, sender='core.PCMapping')
+def pc_mapping_changed(sender, instance, **kwargs):
+    """PC assignments are part of the snapshot rows (pc_id)."""
+    batch_snapshots.invalidate(batch_id=instance.batch_id, student_id=instance.student_id)
@@ -0,0 +1,177 @@
+"""
+Versioned per-batch student snapshots for MonitorConsumer.
+
+Each batch keeps its serialized student rows and a version number that grows
+on every change. A reconnecting faculty client sends the last version it saw
+and receives only the rows changed since then, or the full snapshot when it
+is too far behind (history trimmed, snapshot rebuilt, server restarted).
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .presence import presence_store
+
+
+class BatchSnapshot:
+    def __init__(self, batch_id, history):
+        self.batch_id = batch_id
+        self.version = 0
+        self.floor = 0
+        self.rows = None
+        self.changes = deque(maxlen=history)
+        self.trimmed = 0
+
+    def bump(self):
+        # Seeding from the clock keeps versions monotonic across restarts, so a
+        # client holding a version from a previous process always falls below
+        # the new floor and gets a full snapshot.
+        self.version = max(self.version + 1, int(time.time() * 1000))
+        return self.version
+
+    def record(self, version, student_id):
+        if len(self.changes) == self.changes.maxlen:
+            self.trimmed = self.changes[0][0]
+        self.changes.append((version, student_id))
+
+    def reset(self):
+        self.changes.clear()
+        self.trimmed = 0
+
+
+class SnapshotRegistry:
+    def __init__(self, history=None):
+        self._history = history
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    @property
+    def history(self):
+        if self._history is not None:
+            return self._history
+        return getattr(settings, 'MONITOR_SNAPSHOT_HISTORY', 256)
+
+    def _snapshot(self, batch_id):
+        batch_id = int(batch_id)
+        snapshot = self._snapshots.get(batch_id)
+        if snapshot is None:
+            snapshot = self._snapshots[batch_id] = BatchSnapshot(batch_id, self.history)
+        return snapshot
+
+    def cached(self, batch_id):
+        with self._lock:
+            snapshot = self._snapshot(batch_id)
+            if snapshot.rows is not None:
+                return snapshot.version, list(snapshot.rows.values())
+        return None
+
+    def load(self, batch_id):
+        """
+        Return ``(version, rows)`` for a batch, building the snapshot from the
+        database in a single query if needed.
+        """
+        return self.cached(batch_id) or self._install(batch_id, build_batch_rows(batch_id))
+
+    async def aload(self, batch_id):
+        return self.cached(batch_id) or self._install(batch_id, await abuild_batch_rows(batch_id))
+
+    def _install(self, batch_id, rows):
+        with self._lock:
+            snapshot = self._snapshot(batch_id)
+            if snapshot.rows is None:
+                # Presence may have moved on while the query ran.
+                snapshot.rows = {row['id']: _with_presence(row) for row in rows}
+                snapshot.floor = snapshot.bump()
+                snapshot.reset()
+            return snapshot.version, list(snapshot.rows.values())
+
+    def delta(self, batch_id, since):
+        """
+        Return ``(version, changed_rows)`` since ``since``, or None when the
+        client must take a full snapshot instead.
+        """
+        with self._lock:
+            snapshot = self._snapshot(batch_id)
+            if snapshot.rows is None or since > snapshot.version:
+                return None
+            if since < snapshot.floor or since < snapshot.trimmed:
+                return None
+
+            changed = {student_id for version, student_id in snapshot.changes if version > since}
+            rows = [snapshot.rows[i] for i in changed if i in snapshot.rows]
+            return snapshot.version, rows
+
+    def apply_presence(self, entry):
+        """Patch a student's row from a presence entry. Returns the new version."""
+        batch_id = entry.get('batch_id')
+        if batch_id is None:
+            return None
+
+        with self._lock:
+            snapshot = self._snapshot(batch_id)
+            version = snapshot.bump()
+            if snapshot.rows is not None and entry['id'] in snapshot.rows:
+                snapshot.rows[entry['id']] = _patch_row(snapshot.rows[entry['id']], entry)
+                snapshot.record(version, entry['id'])
+            return version
+
+    def invalidate(self, batch_id=None, student_id=None):
+        """
+        Drop cached rows so the next load rebuilds them. Clients resuming from
+        an older version then get a full snapshot.
+        """
+        with self._lock:
+            for snapshot in list(self._snapshots.values()):
+                hit = batch_id is not None and snapshot.batch_id == int(batch_id)
+                if not hit and student_id is not None and snapshot.rows:
+                    hit = student_id in snapshot.rows
+                if hit:
+                    snapshot.rows = None
+                    snapshot.reset()
+                    snapshot.bump()
+
+
+def _batch_students(batch_id):
+    from apps.students.models import Student
+
+    return (
+        Student.objects
+        .filter(batch_id=batch_id)
+        .select_related('batch__semester', 'pc_mapping')
+    )
+
+
+def _serialize_rows(students):
+    from apps.students.serializers import StudentSerializer
+
+    return [dict(row) for row in StudentSerializer(students, many=True).data]
+
+
+def build_batch_rows(batch_id):
+    return _serialize_rows(_batch_students(batch_id))
+
+
+async def abuild_batch_rows(batch_id):
+    # Serialization touches no further queries (everything is select_related).
+    return _serialize_rows([student async for student in _batch_students(batch_id)])
+
+
+def _patch_row(row, entry):
+    from rest_framework.fields import DateTimeField
+
+    row = dict(row)
+    row['status'] = entry.get('status', row['status'])
+    row['current_mode'] = entry.get('current_mode', row['current_mode'])
+    if entry.get('last_seen'):
+        row['last_seen'] = DateTimeField().to_representation(entry['last_seen'])
+    return row
+
+
+def _with_presence(row):
+    entry = presence_store.get(row['id'])
+    return _patch_row(row, entry) if entry else row
+
+
+batch_snapshots = SnapshotRegistry()
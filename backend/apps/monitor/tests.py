@@ -0,0 +1,863 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+import msgpack
+
+from channels.testing import WebsocketCommunicator
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts.models import User
+from apps.core.models import Batch, Semester
+from apps.monitor.codec import JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL
+from apps.monitor.events import EventLog, abroadcast, broadcast
+from apps.monitor.fanout import StatusAggregator
+from apps.monitor.ipc_layer import IPCChannelLayer
+from apps.monitor.media_relay import media_relay
+from apps.monitor.models import OutboxEvent
+from apps.monitor.presence import PresenceStore
+from apps.monitor.sendqueue import CRITICAL, SendQueue
+from apps.monitor.snapshots import SnapshotRegistry
+from apps.monitor.thumbnails import thumbnail_wall
+from apps.students.models import Student
+from apps.students.serializers import StudentSerializer
+
+
+class PresenceStoreTests(TestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        self.students = []
+        for i in range(5):
+            user = User.objects.create_user(f"CS00{i}", f"cs00{i}@example.com", "pw", name=f"Student {i}")
+            self.students.append(
+                Student.objects.create(user=user, student_id=f"CS00{i}", name=f"Student {i}", batch=self.batch)
+            )
+        self.store = PresenceStore(flush_interval=60)
+
+    def _seed(self, student):
+        self.store.seed(
+            student.id,
+            batch_id=student.batch_id,
+            name=student.name,
+            status=student.status,
+            current_mode=student.current_mode,
+            last_seen=student.last_seen,
+        )
+
+    def test_updates_are_coalesced_into_one_bulk_write(self):
+        for student in self.students:
+            self._seed(student)
+            self.store.update(student.id, status='online')
+            self.store.update(student.id, status='offline')
+            self.store.update(student.id, status='online')
+
+        self.assertEqual(Student.objects.filter(status='online').count(), 0)
+
+        with self.assertNumQueries(1):
+            written = self.store.flush()
+
+        self.assertEqual(written, 5)
+        self.assertEqual(Student.objects.filter(status='online').count(), 5)
+        self.assertEqual(self.store.pending(), 0)
+
+    def test_serializer_reads_live_view_before_flush(self):
+        student = self.students[0]
+        self._seed(student)
+        self.store.update(student.id, status='online', mode='exam')
+
+        with patch('apps.monitor.presence.presence_store', self.store):
+            data = StudentSerializer(student).data
+
+        self.assertEqual(data['status'], 'online')
+        self.assertEqual(data['current_mode'], 'exam')
+        self.assertIsNotNone(data['last_seen'])
+
+
+    def test_status_filter_uses_live_view_without_flushing(self):
+        from rest_framework.test import APIClient
+
+        for student in self.students:
+            self._seed(student)
+        online, gone = self.students[0], self.students[1]
+        Student.objects.filter(id=gone.id).update(status='online')
+        self.store.update(online.id, status='online')
+        self.store.update(gone.id, status='offline')
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty"))
+        with patch('apps.monitor.presence.presence_store', self.store):
+            response = client.get(f'/api/students/?batch={self.batch.id}&status=online')
+
+        self.assertEqual([row['id'] for row in response.data['results']], [online.id])
+        self.assertEqual(self.store.pending(), 2)
+
+    def test_presence_saved_through_the_orm_replaces_the_live_view(self):
+        student = self.students[0]
+        self._seed(student)
+        self.store.update(student.id, status='online', mode='exam')
+
+        with patch('apps.monitor.signals.presence_store', self.store):
+            student.mark_offline()
+
+        self.assertEqual(self.store.get(student.id)['status'], 'offline')
+        self.assertEqual(self.store.get(student.id)['current_mode'], 'exam')
+        self.assertEqual(self.store.pending(), 1)
+
+class BatchSnapshotTests(TestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        self.students = []
+        for i in range(3):
+            user = User.objects.create_user(f"CS00{i}", f"cs00{i}@example.com", "pw", name=f"Student {i}")
+            self.students.append(
+                Student.objects.create(user=user, student_id=f"CS00{i}", name=f"Student {i}", batch=self.batch)
+            )
+        self.registry = SnapshotRegistry(history=4)
+
+    def _entry(self, student, status):
+        return {'id': student.id, 'batch_id': self.batch.id, 'status': status}
+
+    def test_snapshot_is_built_in_one_query(self):
+        with self.assertNumQueries(1):
+            version, rows = self.registry.load(self.batch.id)
+        self.assertEqual(len(rows), 3)
+        self.assertGreater(version, 0)
+
+    def test_delta_returns_only_changed_rows(self):
+        version, _ = self.registry.load(self.batch.id)
+        self.registry.apply_presence(self._entry(self.students[1], 'online'))
+
+        new_version, rows = self.registry.delta(self.batch.id, version)
+
+        self.assertGreater(new_version, version)
+        self.assertEqual([row['id'] for row in rows], [self.students[1].id])
+        self.assertEqual(rows[0]['status'], 'online')
+        self.assertEqual(self.registry.delta(self.batch.id, new_version), (new_version, []))
+
+    def test_client_too_far_behind_gets_full_snapshot(self):
+        version, _ = self.registry.load(self.batch.id)
+        for _ in range(3):
+            for student in self.students:
+                self.registry.apply_presence(self._entry(student, 'online'))
+
+        self.assertIsNone(self.registry.delta(self.batch.id, version))
+
+    def test_student_save_invalidates_snapshot(self):
+        from apps.monitor.snapshots import batch_snapshots
+
+        version, _ = batch_snapshots.load(self.batch.id)
+        self.students[0].name = "Renamed"
+        self.students[0].save()
+
+        self.assertIsNone(batch_snapshots.delta(self.batch.id, version))
+        _, rows = batch_snapshots.load(self.batch.id)
+        self.assertIn("Renamed", [row['name'] for row in rows])
+
+
+class EventLogTests(TestCase):
+    def test_replay_returns_missed_events_in_order_across_groups(self):
+        log = EventLog(capacity=10)
+        first = log.append('batch_1', {'type': 'session_status', 'status': 'session_started'})
+        log.append('student_7', {'type': 'control_command', 'command_type': 'lock_pc'})
+        log.append('batch_2', {'type': 'session_status', 'status': 'session_started'})
+        log.append('batch_1', {'type': 'viva_event', 'event': 'exam_started'})
+
+        events = log.replay(['batch_1', 'student_7'], first['seq'])
+
+        self.assertEqual([e['type'] for e in events], ['control_command', 'viva_event'])
+        self.assertLess(events[0]['seq'], events[1]['seq'])
+
+    def test_evicted_events_require_resync(self):
+        log = EventLog(capacity=2)
+        first = log.append('batch_1', {'type': 'task_event'})
+        for _ in range(3):
+            log.append('batch_1', {'type': 'task_event'})
+
+        self.assertIsNone(log.replay(['batch_1'], first['seq']))
+        self.assertIsNone(log.replay(['batch_1'], log.started_at - 1))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class StatusAggregatorTests(TestCase):
+    async def test_changes_within_window_are_sent_as_one_frame(self):
+        from channels.layers import get_channel_layer
+
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add('monitor_batch_1', channel)
+
+        fanout = StatusAggregator(window=0.05)
+        await fanout.submit({'id': 1, 'batch_id': 1, 'name': 'A', 'status': 'online'}, version=10)
+        await fanout.submit({'id': 2, 'batch_id': 1, 'name': 'B', 'status': 'online'}, version=11)
+        await fanout.submit({'id': 1, 'batch_id': 1, 'name': 'A', 'status': 'offline'}, version=12)
+
+        message = await layer.receive(channel)
+        self.assertEqual(message['type'], 'status_batch')
+        self.assertEqual(message['version'], 12)
+        self.assertEqual(
+            {s['student_id']: s['status'] for s in message['students']},
+            {1: 'offline', 2: 'online'},
+        )
+
+
+class SendQueueTests(TestCase):
+    def _queue(self, **kwargs):
+        self.sent = []
+
+        async def send(payload):
+            self.sent.append(payload)
+
+        return SendQueue(send, priorities={'monitor_answer': CRITICAL}, capacity=2, **kwargs)
+
+    async def test_critical_first_and_status_collapsed_per_student(self):
+        queue = self._queue()
+        queue.put({'type': 'status_batch', 'version': 1, 'students': [{'student_id': 1, 'status': 'online'}]})
+        queue.put({'type': 'session_status', 'status': 'session_started'})
+        queue.put({'type': 'status_batch', 'version': 2, 'students': [{'student_id': 1, 'status': 'offline'},
+                                                                      {'student_id': 2, 'status': 'online'}]})
+        queue.put({'type': 'monitor_answer', 'answer': {}})
+        await queue.drain()
+
+        self.assertEqual([p['type'] for p in self.sent], ['monitor_answer', 'session_status', 'status_batch'])
+        self.assertEqual(self.sent[2]['version'], 2)
+        self.assertEqual(self.sent[2]['students'], [{'student_id': 1, 'status': 'offline'},
+                                                    {'student_id': 2, 'status': 'online'}])
+        self.assertEqual(queue.collapsed, 1)
+
+    async def test_overflow_drops_events_but_never_critical(self):
+        queue = self._queue()
+        for i in range(4):
+            queue.put({'type': 'task_event', 'n': i})
+            queue.put({'type': 'monitor_answer', 'n': i})
+        await queue.drain()
+
+        self.assertEqual([p['n'] for p in self.sent if p['type'] == 'monitor_answer'], [0, 1, 2, 3])
+        self.assertEqual([p['n'] for p in self.sent if p['type'] == 'task_event'], [2, 3])
+        self.assertEqual(queue.dropped, 2)
+
+    async def test_overflow_policy_can_replace_backlog(self):
+        queue = self._queue(on_overflow=lambda: {'type': 'resync_required'})
+        for i in range(3):
+            queue.put({'type': 'task_event', 'n': i})
+        await queue.drain()
+
+        self.assertEqual([p['type'] for p in self.sent], ['resync_required', 'task_event'])
+
+    async def test_failed_send_is_dropped_and_the_writer_carries_on(self):
+        self.sent = []
+
+        async def send(payload):
+            if payload.get('n') == 0:
+                raise TypeError('not serializable')
+            self.sent.append(payload)
+
+        queue = SendQueue(send)
+        for i in range(3):
+            queue.put({'type': 'task_event', 'n': i})
+        await queue.drain()
+
+        self.assertEqual([p['n'] for p in self.sent], [1, 2])
+        self.assertEqual((queue.sent, queue.dropped), (2, 1))
+
+    async def test_client_too_far_behind_on_critical_messages_is_closed(self):
+        import asyncio
+
+        closed = asyncio.Event()
+
+        async def close():
+            closed.set()
+
+        queue = self._queue(on_stuck=close, critical_capacity=3)
+        queue.put({'type': 'task_event'})
+        for i in range(4):
+            queue.put({'type': 'monitor_answer', 'n': i})
+        queue.put({'type': 'monitor_answer', 'n': 4})
+        await asyncio.wait_for(closed.wait(), 1)
+        await queue.drain()
+
+        self.assertTrue(queue.stuck)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(queue.dropped, 4)
+
+
+class WsStatsTests(TestCase):
+    def test_faculty_only(self):
+        from rest_framework.test import APIClient
+
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=batch)
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+
+        client = APIClient()
+        client.force_authenticate(user)
+        self.assertEqual(client.get('/api/control/ws-stats/').status_code, 403)
+        client.force_authenticate(faculty)
+        response = client.get('/api/control/ws-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queues', response.data)
+
+
+class IPCChannelLayerTests(TestCase):
+    async def test_group_send_reaches_members_on_every_worker(self):
+        path = os.path.join(tempfile.mkdtemp(), 'channels.sock')
+        # Two layers stand in for two worker processes sharing the broker.
+        workers = [IPCChannelLayer(path=path), IPCChannelLayer(path=path)]
+        channels = [await layer.new_channel() for layer in workers for _ in range(2)]
+        for channel in channels:
+            await workers[0].group_add('batch_1', channel)
+        await workers[0].group_discard('batch_1', channels[3])
+
+        await workers[1].group_send('batch_1', {'type': 'session_status', 'status': 'session_started'})
+        for layer, channel in zip([workers[0], workers[0], workers[1]], channels):
+            message = await layer.receive(channel)
+            self.assertEqual(message['status'], 'session_started')
+        # The discarded channel's copy would have come in the same delivery frame.
+        self.assertEqual(workers[1]._connection_for(channels[3]).queues, {})
+
+        for layer in workers:
+            layer.close()
+
+    async def test_loopback_tcp_transport(self):
+        import socket
+
+        # What Windows uses; selected anywhere by giving a port
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        path = os.path.join(tempfile.mkdtemp(), 'channels.sock')
+        workers = [IPCChannelLayer(path=path, port=port), IPCChannelLayer(path=path, port=port)]
+        channel = await workers[0].new_channel()
+        await workers[0].group_add('batch_1', channel)
+        await workers[1].group_send('batch_1', {'type': 'session_status', 'status': 'session_started'})
+        self.assertEqual((await workers[0].receive(channel))['status'], 'session_started')
+        self.assertFalse(os.path.exists(path))
+
+        for layer in workers:
+            layer.close()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class OutboxTests(TestCase):
+    def setUp(self):
+        from channels.layers import get_channel_layer
+
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)('batch_1', self.channel)
+
+    def test_rolled_back_transaction_emits_nothing(self):
+        with patch.object(self.layer, 'group_send') as group_send:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        broadcast('batch_1', {'type': 'session_status', 'status': 'session_started'})
+                        raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(OutboxEvent.objects.exists())
+        group_send.assert_not_called()
+
+    def test_committed_events_are_sent_as_one_batch_per_group(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            broadcast('batch_1', {'type': 'session_status', 'status': 'session_started'})
+            broadcast('batch_1', {'type': 'task_event', 'event_type': 'task_created'})
+
+        message = async_to_sync(self.layer.receive)(self.channel)
+        self.assertEqual(message['type'], 'outbox_batch')
+        self.assertEqual([e['type'] for e in message['events']], ['session_status', 'task_event'])
+        self.assertLess(message['events'][0]['seq'], message['events'][1]['seq'])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_rows_claimed_by_another_process_are_not_sent_until_abandoned(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from apps.monitor.outbox import CLAIM_TIMEOUT, OutboxDispatcher
+
+        row = OutboxEvent.objects.create(
+            group='batch_1', payload={'type': 'session_status'},
+            claimed_by='other-host:1:abc', claimed_at=timezone.now(),
+        )
+        dispatcher = OutboxDispatcher()
+        self.assertEqual(async_to_sync(dispatcher.drain)(), 0)
+
+        OutboxEvent.objects.filter(id=row.id).update(claimed_at=timezone.now() - timedelta(seconds=CLAIM_TIMEOUT + 1))
+        self.assertEqual(async_to_sync(dispatcher.drain)(), 1)
+        self.assertEqual(async_to_sync(self.layer.receive)(self.channel)['type'], 'session_status')
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_drain_only_returns_unsent_groups(self):
+        from apps.monitor.outbox import OutboxDispatcher
+
+        OutboxEvent.objects.create(group='batch_1', payload={'type': 'session_status'})
+        unsent = OutboxEvent.objects.create(group='batch_2', payload={'type': 'session_status'})
+        group_send = self.layer.group_send
+
+        async def failing_group_send(group, message):
+            if group == 'batch_2':
+                raise ConnectionError('channel layer down')
+            await group_send(group, message)
+
+        with patch.object(self.layer, 'group_send', failing_group_send):
+            with self.assertRaises(ConnectionError):
+                async_to_sync(OutboxDispatcher().drain)()
+
+        self.assertEqual(async_to_sync(self.layer.receive)(self.channel)['type'], 'session_status')
+        self.assertEqual(list(OutboxEvent.objects.values_list('id', 'claimed_by')), [(unsent.id, '')])
+
+    def test_binding_drains_and_a_failed_drain_is_retried(self):
+        import asyncio
+
+        from apps.monitor import outbox
+
+        OutboxEvent.objects.create(group='batch_1', payload={'type': 'session_status'})
+        group_send = self.layer.group_send
+        attempts = []
+
+        async def flaky_group_send(group, message):
+            attempts.append(group)
+            if len(attempts) == 1:
+                raise ConnectionError('channel layer down')
+            await group_send(group, message)
+
+        async def bind_and_receive():
+            outbox_dispatcher.bind()
+            message = await asyncio.wait_for(self.layer.receive(self.channel), 5)
+            await outbox_dispatcher._task
+            return message
+
+        with patch.object(outbox, 'RETRY_DELAY', 0.05):
+            outbox_dispatcher = outbox.OutboxDispatcher()
+            with patch.object(self.layer, 'group_send', flaky_group_send):
+                message = async_to_sync(bind_and_receive)()
+
+        self.assertEqual(message['type'], 'session_status')
+        self.assertEqual(len(attempts), 2)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class StudentResumeTests(TransactionTestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        self.student = Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=self.batch)
+        self.token = str(AccessToken.for_user(user))
+
+    async def _connect(self, since=None):
+        from config.asgi import application
+
+        url = f'/ws/student/?token={self.token}'
+        if since is not None:
+            url += f'&since={since}'
+        communicator = WebsocketCommunicator(application, url)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_reconnect_replays_missed_events(self):
+        communicator = await self._connect()
+        resumed = await communicator.receive_json_from()
+        self.assertEqual(resumed['type'], 'resumed')
+        await communicator.disconnect()
+
+        await abroadcast(f'batch_{self.batch.id}', {'type': 'session_status', 'status': 'session_started'})
+        await abroadcast(f'student_{self.student.id}', {'type': 'control_command', 'command_type': 'lock_pc'})
+
+        communicator = await self._connect(since=resumed['seq'])
+        first = await communicator.receive_json_from()
+        second = await communicator.receive_json_from()
+        resumed = await communicator.receive_json_from()
+
+        self.assertEqual(first['status'], 'session_started')
+        self.assertEqual(second['command_type'], 'lock_pc')
+        self.assertEqual(resumed, {'type': 'resumed', 'seq': second['seq'], 'replayed': 2})
+        await communicator.disconnect()
+
+    async def test_msgpack_subprotocol_sends_binary_frames(self):
+        from config.asgi import application
+
+        communicator = WebsocketCommunicator(
+            application, f'/ws/student/?token={self.token}',
+            subprotocols=[MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL],
+        )
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, MSGPACK_SUBPROTOCOL)
+
+        resumed = msgpack.unpackb(await communicator.receive_from(), raw=False)
+        self.assertEqual(resumed['type'], 'resumed')
+        await communicator.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class MultiplexMonitorTests(TransactionTestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batches = [Batch.objects.create(semester=semester, name=f"Batch {i}", year=2) for i in (1, 2)]
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        self.token = str(AccessToken.for_user(faculty))
+
+    async def test_one_socket_follows_several_batches(self):
+        from config.asgi import application
+
+        communicator = WebsocketCommunicator(application, f'/ws/monitor/?token={self.token}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        for batch in self.batches:
+            await communicator.send_json_to({'type': 'subscribe', 'batch_id': batch.id})
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual((snapshot['type'], snapshot['batch_id']), ('initial_load', batch.id))
+
+        first, second = self.batches
+        await abroadcast(f'batch_{second.id}', {'type': 'session_status', 'status': 'session_started'})
+        event = await communicator.receive_json_from()
+        self.assertEqual((event['type'], event['batch_id']), ('session_status', second.id))
+
+        await communicator.send_json_to({'type': 'unsubscribe', 'batch_id': second.id})
+        await abroadcast(f'batch_{second.id}', {'type': 'session_status', 'status': 'session_ended'})
+        await abroadcast(f'batch_{first.id}', {'type': 'session_status', 'status': 'session_started'})
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['batch_id'], first.id)
+        await communicator.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   WS_SEND_WINDOW=4, WS_SEND_QUEUE_CAPACITY=3)
+class SendWindowTests(TransactionTestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        self.token = str(AccessToken.for_user(faculty))
+
+    async def test_slow_client_holds_back_the_writer_until_it_acks(self):
+        from config.asgi import application
+
+        communicator = WebsocketCommunicator(application, f'/ws/monitor/{self.batch.id}/?token={self.token}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'initial_load')
+        await communicator.send_json_to({'type': 'ack', 'received': 1})
+
+        # The client stops reading: only a window's worth goes out, the
+        # rest waits in the queue and overflows there
+        for n in range(10):
+            await abroadcast(f'batch_{self.batch.id}', {'type': 'session_status', 'status': 'session_started', 'n': n})
+        received = [(await communicator.receive_json_from())['n'] for _ in range(4)]
+        self.assertTrue(await communicator.receive_nothing(0.2))
+        self.assertEqual(received, [0, 1, 2, 3])
+
+        await communicator.send_json_to({'type': 'ack', 'received': 5})
+        received = [(await communicator.receive_json_from())['n'] for _ in range(3)]
+        self.assertEqual(received, [7, 8, 9])
+        await communicator.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   THUMBNAIL_BATCH_BYTES_PER_SEC=1500, THUMBNAIL_INTERVAL=0.5)
+class ThumbnailWallTests(TransactionTestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=self.batch)
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        self.student_token = str(AccessToken.for_user(user))
+        self.faculty_token = str(AccessToken.for_user(faculty))
+
+    async def _receive(self, communicator, kind):
+        while True:
+            message = msgpack.unpackb(await communicator.receive_from(), raw=False)
+            if message['type'] == kind:
+                return message
+
+    async def test_thumbnails_are_relayed_within_the_batch_budget(self):
+        from config.asgi import application
+
+        monitor = WebsocketCommunicator(application, f'/ws/monitor/{self.batch.id}/?token={self.faculty_token}',
+                                        subprotocols=[MSGPACK_SUBPROTOCOL])
+        student = WebsocketCommunicator(application, f'/ws/student/?token={self.student_token}',
+                                        subprotocols=[MSGPACK_SUBPROTOCOL])
+        self.assertTrue((await monitor.connect())[0])
+        self.assertTrue((await student.connect())[0])
+
+        await monitor.send_to(bytes_data=msgpack.packb({'type': 'thumbnails_start'}))
+        control = await self._receive(student, 'thumbnail_control')
+        self.assertTrue(control['enabled'])
+
+        jpeg = b'\xff\xd8' + bytes(998)
+        await student.send_to(bytes_data=msgpack.packb({'type': 'thumbnail', 'data': jpeg, 'width': 320}))
+        thumbnail = await self._receive(monitor, 'thumbnail')
+        self.assertEqual((thumbnail['data'], thumbnail['batch_id']), (jpeg, self.batch.id))
+
+        # Over the 1500 B/s budget: dropped, and the student is slowed to its fair
+        # share (1000 B / 1500 B/s) without its lease being renewed
+        await student.send_to(bytes_data=msgpack.packb({'type': 'thumbnail', 'data': jpeg}))
+        throttle = await self._receive(student, 'thumbnail_throttle')
+        self.assertEqual(throttle, {'type': 'thumbnail_throttle', 'interval': 1000 / 1500})
+        self.assertEqual(thumbnail_wall.stats()[self.batch.id]['dropped'], 1)
+
+        # The wall's keepalive keeps the slowed interval
+        await monitor.send_to(bytes_data=msgpack.packb({'type': 'thumbnails_start'}))
+        control = await self._receive(student, 'thumbnail_control')
+        self.assertEqual(control['interval'], 1000 / 1500)
+
+        await student.disconnect()
+        await monitor.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   MONITOR_MEDIA_RELAY=True)
+class MediaRelayTests(TransactionTestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        self.student = Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=self.batch)
+        self.student_token = str(AccessToken.for_user(user))
+        self.faculty_tokens = [
+            str(AccessToken.for_user(User.objects.create_user(f"F00{i}", f"f00{i}@example.com", "pw", name="Faculty")))
+            for i in (1, 2)
+        ]
+
+    async def _receive(self, communicator, kind):
+        while True:
+            message = await communicator.receive_json_from(timeout=10)
+            if message['type'] == kind:
+                return message
+
+    async def test_viewers_share_one_student_stream(self):
+        from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+        from config.asgi import application
+
+        student = WebsocketCommunicator(application, f'/ws/student/?token={self.student_token}')
+        self.assertTrue((await student.connect())[0])
+        monitors, viewers = [], []
+        for token in self.faculty_tokens:
+            monitor = WebsocketCommunicator(application, f'/ws/monitor/{self.batch.id}/?token={token}')
+            self.assertTrue((await monitor.connect())[0])
+            pc = RTCPeerConnection()
+            pc.addTransceiver('video', direction='recvonly')
+            await pc.setLocalDescription(await pc.createOffer())
+            await monitor.send_json_to({
+                'type': 'monitor_offer', 'student_id': self.student.id,
+                'offer': {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type},
+            })
+            monitors.append(monitor)
+            viewers.append(pc)
+
+        # One offer reaches the student, from the relay, whatever the viewer count
+        offer = await self._receive(student, 'monitor_offer')
+        upstream = RTCPeerConnection()
+        await upstream.setRemoteDescription(RTCSessionDescription(**offer['offer']))
+        upstream.addTrack(VideoStreamTrack())
+        await upstream.setLocalDescription(await upstream.createAnswer())
+        await student.send_json_to({
+            'type': 'monitor_answer', 'student_id': self.student.id,
+            'answer': {'sdp': upstream.localDescription.sdp, 'type': upstream.localDescription.type},
+        })
+
+        for monitor, pc in zip(monitors, viewers):
+            answer = await self._receive(monitor, 'monitor_answer')
+            self.assertTrue(answer['relay'])
+            await pc.setRemoteDescription(RTCSessionDescription(**answer['answer']))
+        self.assertTrue(await student.receive_nothing(0.2))
+        self.assertEqual(media_relay.stats()[self.student.id]['viewers'], 2)
+
+        # A pause leaves the relay; the last viewer leaving closes the upstream and stops the student
+        await monitors[0].send_json_to({'type': 'monitor_pause', 'student_id': self.student.id})
+        await monitors[1].send_json_to({'type': 'monitor_stop', 'student_id': self.student.id})
+        await self._receive(student, 'monitor_stop')
+        self.assertEqual(media_relay.stats(), {})
+
+        for pc in viewers + [upstream]:
+            await pc.close()
+        for monitor in monitors:
+            await monitor.disconnect()
+        await student.disconnect()
+
+    async def test_viewer_leaving_before_the_student_answers_is_not_subscribed(self):
+        from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+        from config.asgi import application
+
+        student = WebsocketCommunicator(application, f'/ws/student/?token={self.student_token}')
+        self.assertTrue((await student.connect())[0])
+        monitors, viewers = [], []
+        for token in self.faculty_tokens:
+            monitor = WebsocketCommunicator(application, f'/ws/monitor/{self.batch.id}/?token={token}')
+            self.assertTrue((await monitor.connect())[0])
+            pc = RTCPeerConnection()
+            pc.addTransceiver('video', direction='recvonly')
+            await pc.setLocalDescription(await pc.createOffer())
+            await monitor.send_json_to({
+                'type': 'monitor_offer', 'student_id': self.student.id,
+                'offer': {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type},
+            })
+            monitors.append(monitor)
+            viewers.append(pc)
+        watching, leaving = monitors
+        offer = await self._receive(student, 'monitor_offer')
+
+        # One viewer stops before the student answers: the other is still waiting
+        await leaving.send_json_to({'type': 'monitor_stop', 'student_id': self.student.id})
+        self.assertTrue(await student.receive_nothing(0.2))
+
+        upstream = RTCPeerConnection()
+        await upstream.setRemoteDescription(RTCSessionDescription(**offer['offer']))
+        upstream.addTrack(VideoStreamTrack())
+        await upstream.setLocalDescription(await upstream.createAnswer())
+        await student.send_json_to({
+            'type': 'monitor_answer', 'student_id': self.student.id,
+            'answer': {'sdp': upstream.localDescription.sdp, 'type': upstream.localDescription.type},
+        })
+        await self._receive(watching, 'monitor_answer')
+        self.assertEqual(media_relay.stats()[self.student.id]['viewers'], 1)
+
+        await watching.disconnect()
+        await self._receive(student, 'monitor_stop')
+        self.assertEqual(media_relay.stats(), {})
+
+        for pc in viewers + [upstream]:
+            await pc.close()
+        await leaving.disconnect()
+        await student.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class PrewarmSignalingTests(TransactionTestCase):
+    def setUp(self):
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        self.student = Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=self.batch)
+        faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        other = User.objects.create_user("F002", "f002@example.com", "pw", name="Faculty 2")
+        self.student_token = str(AccessToken.for_user(user))
+        self.faculty_token = str(AccessToken.for_user(faculty))
+        self.other_token = str(AccessToken.for_user(other))
+
+    async def _receive(self, communicator, kind):
+        while True:
+            message = await communicator.receive_json_from()
+            if message['type'] == kind:
+                return message
+
+    async def test_prewarm_pause_and_stop_leave_another_viewers_stream_alone(self):
+        from config.asgi import application
+
+        watching = WebsocketCommunicator(application, f'/ws/monitor/{self.batch.id}/?token={self.faculty_token}')
+        hovering = WebsocketCommunicator(application, f'/ws/monitor/{self.batch.id}/?token={self.other_token}')
+        student = WebsocketCommunicator(application, f'/ws/student/?token={self.student_token}')
+        for communicator in (watching, hovering, student):
+            self.assertTrue((await communicator.connect())[0])
+
+        await watching.send_json_to({'type': 'monitor_offer', 'student_id': self.student.id,
+                                     'offer': {'sdp': 'v=0', 'type': 'offer'}})
+        self.assertFalse((await self._receive(student, 'monitor_offer'))['prewarm'])
+
+        await hovering.send_json_to({'type': 'monitor_offer', 'student_id': self.student.id, 'prewarm': True,
+                                     'offer': {'sdp': 'v=0', 'type': 'offer'}})
+        for kind in ('monitor_pause', 'monitor_stop'):
+            await hovering.send_json_to({'type': kind, 'student_id': self.student.id})
+        self.assertTrue(await student.receive_nothing(0.2))
+
+        # Once the viewer pauses, the student is free to be pre-warmed by someone else
+        await watching.send_json_to({'type': 'monitor_pause', 'student_id': self.student.id})
+        await self._receive(student, 'monitor_pause')
+        await hovering.send_json_to({'type': 'monitor_offer', 'student_id': self.student.id, 'prewarm': True,
+                                     'offer': {'sdp': 'v=0', 'type': 'offer'}})
+        self.assertTrue((await self._receive(student, 'monitor_offer'))['prewarm'])
+
+        for communicator in (student, watching, hovering):
+            await communicator.disconnect()
+
+    async def test_prewarm_offer_batched_ice_and_resume_reach_the_student(self):
+        from config.asgi import application
+
+        monitor = WebsocketCommunicator(application, f'/ws/monitor/{self.batch.id}/?token={self.faculty_token}')
+        student = WebsocketCommunicator(application, f'/ws/student/?token={self.student_token}')
+        self.assertTrue((await monitor.connect())[0])
+        self.assertTrue((await student.connect())[0])
+
+        await monitor.send_json_to({'type': 'monitor_offer', 'student_id': self.student.id, 'prewarm': True,
+                                    'offer': {'sdp': 'v=0', 'type': 'offer'}})
+        offer = await self._receive(student, 'monitor_offer')
+        self.assertTrue(offer['prewarm'])
+
+        candidates = [{'candidate': f'candidate:{i}', 'sdpMid': '0', 'sdpMLineIndex': 0} for i in range(3)]
+        await student.send_json_to({'type': 'monitor_ice', 'student_id': self.student.id, 'candidates': candidates})
+        ice = await self._receive(monitor, 'monitor_ice')
+        self.assertEqual(ice['candidates'], candidates)
+
+        await monitor.send_json_to({'type': 'monitor_resume', 'student_id': self.student.id})
+        await self._receive(student, 'monitor_resume')
+
+        await student.disconnect()
+        await monitor.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                   SCREEN_ACTIVITY_CHANGE_BITS=12)
+class ScreenActivityTests(TransactionTestCase):
+    def setUp(self):
+        from apps.evaluation.models import ExamSession, StudentExam
+
+        semester = Semester.objects.create(name="Sem 3", number=3)
+        self.batch = Batch.objects.create(semester=semester, name="Batch 1", year=2)
+        user = User.objects.create_user("CS001", "cs001@example.com", "pw", name="Student 1")
+        self.student = Student.objects.create(user=user, student_id="CS001", name="Student 1", batch=self.batch)
+        self.faculty = User.objects.create_user("F001", "f001@example.com", "pw", name="Faculty")
+        self.session = ExamSession.objects.create(batch=self.batch, faculty=self.faculty, status='active')
+        StudentExam.objects.create(session=self.session, student=self.student)
+        self.student_token = str(AccessToken.for_user(user))
+
+    async def _report(self, reports):
+        from config.asgi import application
+
+        student = WebsocketCommunicator(application, f'/ws/student/?token={self.student_token}')
+        self.assertTrue((await student.connect())[0])
+        for report in reports:
+            await student.send_json_to(report)
+        await student.receive_nothing(0.3)
+        await student.disconnect()
+
+    def test_reports_are_stored_and_build_a_timeline(self):
+        from rest_framework.test import APIClient
+        from apps.evaluation.models import ScreenActivity
+
+        start = 1_700_000_000.0
+        async_to_sync(self._report)([
+            {'type': 'screen_activity', 'session_id': self.session.id, 'from': start, 'until': start + 30,
+             'samples': [[start, 'ff00ff00ff00ff00', 0], [start + 12.5, 'ff00ff00ff0000ff', 4],
+                         [start + 20, '00ff00ff00ff00ff', 32]]},
+            # Not this student's exam: ignored
+            {'type': 'screen_activity', 'session_id': self.session.id + 1, 'from': start, 'until': start + 30,
+             'samples': []},
+        ])
+
+        activity = ScreenActivity.objects.get()
+        self.assertEqual((len(bytes(activity.samples)), activity.changes), (3 * 13, 1))
+
+        client = APIClient()
+        client.force_authenticate(self.faculty)
+        response = client.get('/api/exam-activity/', {'session_id': self.session.id, 'student_id': self.student.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['covered_seconds'], 30)
+        self.assertEqual([(c['bits'], c['hash']) for c in response.data['changes']], [(32, '00ff00ff00ff00ff')])
+        self.assertEqual(sum(m['samples'] for m in response.data['minutes']), 3)
+
+        summary = client.get('/api/exam-activity/', {'session_id': self.session.id}).data
+        self.assertEqual([(s['student_id'], s['reports'], s['changes'], s['covered_seconds']) for s in summary],
+                         [(self.student.id, 1, 1, 30)])
@@ -0,0 +1,143 @@
+"""
+Low-rate screen thumbnails for the faculty live monitor grid.
+
+While a faculty client shows the wall it sends ``thumbnails_start`` for the
+batch (and repeats it as a keepalive); students of that batch are told to
+send a small JPEG every ``interval`` seconds, as a binary frame over their
+existing WebSocket, until the lease runs out. Thumbnails are relayed to
+``monitor_batch_{id}`` and collapse to the latest one per student in each
+faculty socket's send queue.
+
+Each batch has a byte budget (``THUMBNAIL_BATCH_BYTES_PER_SEC``). Frames over
+budget are dropped, and the sender gets a ``thumbnail_throttle`` with its
+fair-share interval. Lease renewals carry the batch's current fair share too,
+so a keepalive does not undo the slow-down.
+"""
+import base64
+import threading
+import time
+
+from django.conf import settings
+
+
+def thumbnail_bytes(data):
+    """Thumbnail payload as bytes (JSON clients send base64 text)."""
+    if isinstance(data, str):
+        return base64.b64decode(data)
+    return data
+
+
+class ThumbnailWall:
+    # Senders seen within this many seconds share the batch budget
+    ACTIVE_WINDOW = 5.0
+
+    def __init__(self, rate=None, max_bytes=None, interval=None, lease=None):
+        self._rate = rate
+        self._max_bytes = max_bytes
+        self._interval = interval
+        self._lease = lease
+        self._batches = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        if self._rate is not None:
+            return self._rate
+        return getattr(settings, 'THUMBNAIL_BATCH_BYTES_PER_SEC', 750_000)
+
+    @property
+    def max_bytes(self):
+        if self._max_bytes is not None:
+            return self._max_bytes
+        return getattr(settings, 'THUMBNAIL_MAX_BYTES', 48_000)
+
+    @property
+    def interval(self):
+        if self._interval is not None:
+            return self._interval
+        return getattr(settings, 'THUMBNAIL_INTERVAL', 1.0)
+
+    @property
+    def lease(self):
+        if self._lease is not None:
+            return self._lease
+        return getattr(settings, 'THUMBNAIL_LEASE', 30)
+
+    def _state(self, batch_id, now):
+        state = self._batches.get(batch_id)
+        if state is None:
+            state = self._batches[batch_id] = {
+                'tokens': float(self.rate), 'updated': now, 'senders': {},
+                'avg_size': 0.0, 'sent': 0, 'dropped': 0,
+            }
+        return state
+
+    def control(self, enabled=True, batch_id=None):
+        """``thumbnail_control`` message for students of a batch."""
+        return {
+            'type': 'thumbnail_control',
+            'enabled': enabled,
+            'interval': self.batch_interval(batch_id),
+            'ttl': self.lease,
+        }
+
+    @staticmethod
+    def throttle(interval):
+        """Slow-down for one sender; unlike ``control`` it leaves the lease alone."""
+        return {'type': 'thumbnail_throttle', 'interval': interval}
+
+    def batch_interval(self, batch_id):
+        """Send interval that keeps a batch's current senders within its budget."""
+        with self._lock:
+            state = self._batches.get(batch_id)
+            return self.interval if state is None else self.fair_interval(state)
+
+    def fair_interval(self, state):
+        active = max(1, len(state['senders']))
+        return max(self.interval, active * state['avg_size'] / self.rate)
+
+    def admit(self, batch_id, student_id, size):
+        """
+        Account a thumbnail against the batch budget. Returns None if it may be
+        relayed, otherwise the interval the sender should slow down to.
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(batch_id, now)
+            state['tokens'] = min(self.rate, state['tokens'] + (now - state['updated']) * self.rate)
+            state['updated'] = now
+            senders = state['senders']
+            senders[student_id] = now
+            for sender, seen in list(senders.items()):
+                if now - seen > self.ACTIVE_WINDOW:
+                    del senders[sender]
+            state['avg_size'] = size if not state['avg_size'] else 0.8 * state['avg_size'] + 0.2 * size
+
+            if size > self.max_bytes or size > state['tokens']:
+                state['dropped'] += 1
+                return self.fair_interval(state)
+            state['tokens'] -= size
+            state['sent'] += 1
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                batch_id: {
+                    'senders': len(state['senders']),
+                    'avg_size': round(state['avg_size']),
+                    'sent': state['sent'],
+                    'dropped': state['dropped'],
+                }
+                for batch_id, state in self._batches.items()
+            }
+
+
+thumbnail_wall = ThumbnailWall()
+
+
+def encode_for(payload, msgpack_client):
+    """Relay payload for a faculty socket: raw bytes over msgpack, base64 over JSON."""
+    if msgpack_client:
+        return payload
+    return {**payload, 'data': base64.b64encode(payload['data']).decode('ascii')}
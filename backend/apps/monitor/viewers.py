@@ -0,0 +1,39 @@
+"""
+Which faculty socket each student is streaming to, without the media relay.
+
+A student holds one peer connection: every offer replaces it, and
+``monitor_pause`` / ``monitor_stop`` act on whatever it is sending. So while
+one faculty socket is watching a student, another socket's pre-warm offer,
+pause or stop would cut that view off; those are not passed on. A real
+(non pre-warm) offer always goes through and makes its sender the viewer.
+
+Kept per process, like the rest of the live monitor state (see ipc_layer.py).
+"""
+
+
+class LiveViewers:
+    def __init__(self):
+        self._viewers = {}
+
+    def watching(self, student_id):
+        """Channel name of the socket watching a student, or None."""
+        return self._viewers.get(str(student_id))
+
+    def allows(self, student_id, channel):
+        """Whether ``channel`` may pre-warm, pause or stop this student's stream."""
+        return self.watching(student_id) in (None, channel)
+
+    def start(self, student_id, channel):
+        self._viewers[str(student_id)] = channel
+
+    def stop(self, student_id, channel):
+        if self.watching(student_id) == channel:
+            del self._viewers[str(student_id)]
+
+    def drop_viewer(self, channel):
+        """Forget every student watched by a faculty socket that went away."""
+        for student_id in [s for s, viewer in self._viewers.items() if viewer == channel]:
+            del self._viewers[student_id]
+
+
+live_viewers = LiveViewers()
@@ -3,11 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 import json
 
+from .events import broadcast
 from .models import ControlCommand, ControlState
+from .media_relay import media_relay
+from .sendqueue import send_queue_stats
+from .thumbnails import thumbnail_wall
 from .serializers import ControlCommandSerializer, ControlStateSerializer
 from apps.core.models import Batch
 
@@ -57,9 +59,8 @@ class ControlViewSet(viewsets.ViewSet):
         
         state.save()
 
-        # Broadcast via WebSocket to students in the batch
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        # Broadcast via WebSocket to students in the batch (replayable on reconnect)
+        broadcast(
             f'batch_{batch_id}',
             {
                 'type': 'control_command',
@@ -85,6 +86,21 @@ class ControlViewSet(viewsets.ViewSet):
         state, created = ControlState.objects.get_or_create(batch_id=batch_id)
         return Response(ControlStateSerializer(state).data)
 
+    @action(detail=False, methods=['get'], url_path='ws-stats')
+    def ws_stats(self, request):
+        """
+        Outbound WebSocket queue, thumbnail and media relay counters for this server process.
+        GET /api/control/ws-stats/
+        """
+        # Lists connection channel names: faculty and admins only
+        if getattr(request.user, 'student_profile', None) is not None and not request.user.is_staff:
+            return Response({'error': 'Faculty only'}, status=status.HTTP_403_FORBIDDEN)
+        return Response({
+            **send_queue_stats.snapshot(),
+            'thumbnails': thumbnail_wall.stats(),
+            'media_relay': media_relay.stats(),
+        })
+
     @action(detail=False, methods=['post'], url_path='ack')
     def acknowledge_command(self, request):
         """
@@ -110,9 +126,8 @@ class ControlViewSet(viewsets.ViewSet):
             student_id = None
             student_name = "Unknown"
 
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'monitor_batch_{command.batch.id}',
+        broadcast(
+            f'monitor_batch_{command.batch_id}',
             {
                 'type': 'control_ack',
                 'command_id': command.id,
@@ -0,0 +1,18 @@
+"""
+Live student presence kept outside the database.
+
+Another app may hold status changes that are not written to the ``students``
+rows yet (apps.monitor's write-behind store). ``STUDENT_LIVE_PRESENCE`` names
+that store by dotted path, so this app reads it without depending on the app
+that provides it. The store needs ``get(student_id)``, returning a dict with
+``status``, ``current_mode`` and ``last_seen`` or None, and ``statuses()``,
+returning the live status per student id.
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def live_presence():
+    """The configured live presence store, or None."""
+    path = getattr(settings, 'STUDENT_LIVE_PRESENCE', None)
+    return import_string(path) if path else None
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Student, Attendance
+from .presence import live_presence
 
 
 class StudentSerializer(serializers.ModelSerializer):
@@ -16,6 +17,19 @@ class StudentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'pc_id', 'created_at', 'updated_at']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+
+        # Overlay the live presence view, which may be ahead of the last flush.
+        store = live_presence()
+        live = store.get(instance.id) if store else None
+        if live and 'status' in live:
+            data['status'] = live['status']
+            data['current_mode'] = live.get('current_mode', data['current_mode'])
+            last_seen = live.get('last_seen')
+            data['last_seen'] = self.fields['last_seen'].to_representation(last_seen) if last_seen else None
+        return data
+
 
 class AttendanceSerializer(serializers.ModelSerializer):
     """Serializer for Attendance records"""
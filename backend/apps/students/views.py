@@ -4,10 +4,12 @@ from rest_framework.decorators import authentication_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from .models import Student, Attendance
+from .presence import live_presence
 from .serializers import StudentSerializer, AttendanceSerializer
 from rest_framework.views import APIView
 from django.contrib.auth import authenticate
 from django.conf import settings
+from django.db.models import Q
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import api_view, permission_classes
 from .services.etlab_sync import (
@@ -53,7 +55,13 @@ class StudentViewSet(viewsets.ModelViewSet):
         if batch_id:
             queryset = queryset.filter(batch_id=batch_id)
         if status_filter:
-            queryset = queryset.filter(status=status_filter)
+            # The rows may lag the live presence view: students it has
+            # a status for are matched on that status instead
+            live = live_presence()
+            statuses = live.statuses() if live else {}
+            matching = [i for i, s in statuses.items() if s == status_filter]
+            other = [i for i, s in statuses.items() if s != status_filter]
+            queryset = queryset.filter((Q(status=status_filter) & ~Q(id__in=other)) | Q(id__in=matching))
         
         return queryset
     
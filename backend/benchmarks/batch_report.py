@@ -0,0 +1,173 @@
+"""
+Batch performance report PDF: statistics queries and table rendering.
+
+Creates a throwaway SQLite database with one batch of students, each with a
+submission for every task, attendance for every lab session and a completed
+viva per viva session (500 students x 40 tasks by default). Reports, for the
+previous per-student queries and for the grouped aggregates, the time and
+query count of computing every student's statistics; then the time to build
+the report table with a Paragraph in every cell and with plain strings for
+the numeric cells; then the whole ``batch_submission_report_pdf`` request, once
+rendering and once served from the report cache.
+
+Usage (from backend/):
+    python -m benchmarks.batch_report [--students 500] [--tasks 40] [--sessions 30] [--vivas 3]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import create_lab, setup
+
+
+def create_records(batch, students, tasks, sessions, vivas):
+    from django.utils import timezone
+
+    from apps.accounts.models import User
+    from apps.evaluation.models import Task, TaskSubmission, VivaRecord, VivaSession
+    from apps.lab_sessions.models import LabSession
+    from apps.students.models import Attendance
+
+    rng = random.Random(0)
+    faculty = User.objects.get(faculty_id='FAC001')
+    task_rows = Task.objects.bulk_create([
+        Task(batch=batch, faculty=faculty, title=f'Task {i + 1}', description='-') for i in range(tasks)
+    ])
+    TaskSubmission.objects.bulk_create([
+        TaskSubmission(
+            task=task, student_id=student_id,
+            status=rng.choice(['pending', 'submitted', 'evaluated']),
+            marks=rng.randint(0, 10) if rng.random() < 0.7 else None,
+        )
+        for student_id in students for task in task_rows
+    ], batch_size=2000)
+
+    session_rows = LabSession.objects.bulk_create([
+        LabSession(batch=batch, faculty=faculty, subject_name='Lab', status='completed') for _ in range(sessions)
+    ])
+    Attendance.objects.bulk_create([
+        Attendance(student_id=student_id, session=session, status=rng.choice(['present', 'present', 'absent']))
+        for student_id in students for session in session_rows
+    ], batch_size=2000)
+
+    viva_rows = VivaSession.objects.bulk_create([
+        VivaSession(batch=batch, faculty=faculty, subject=f'Viva {i + 1}') for i in range(vivas)
+    ])
+    VivaRecord.objects.bulk_create([
+        VivaRecord(student_id=student_id, viva_session=viva, faculty=faculty, status='completed',
+                   marks=rng.randint(40, 100), conducted_at=timezone.now())
+        for student_id in students for viva in viva_rows
+    ], batch_size=2000)
+
+
+def previous_stats(batch_id, students):
+    """The report's previous data path: seven queries per student."""
+    from django.db.models import Avg, Q
+
+    from apps.evaluation.models import TaskSubmission, VivaRecord
+    from apps.students.models import Attendance
+
+    stats = {}
+    for student_id in students:
+        subs = TaskSubmission.objects.filter(student_id=student_id, task__batch_id=batch_id)
+        evaluated = subs.filter(marks__isnull=False)
+        attendance = Attendance.objects.filter(student_id=student_id, session__batch_id=batch_id)
+        vivas = VivaRecord.objects.filter(student_id=student_id, status='completed', viva_session__batch_id=batch_id)
+        stats[student_id] = (
+            subs.count(),
+            subs.filter(Q(status__in=['submitted', 'evaluated']) | Q(submission_file__isnull=False)).count(),
+            evaluated.count(),
+            evaluated.aggregate(avg=Avg('marks'))['avg'],
+            attendance.count(),
+            attendance.filter(status='present').count(),
+            vivas.count(),
+            vivas.aggregate(avg=Avg('marks'))['avg'],
+        )
+    return stats
+
+
+def timed(fn, *args):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, len(queries)
+
+
+def render(rows, paragraphs):
+    """Build the report table as a PDF, with every cell a Paragraph or the numeric cells as strings."""
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph
+
+    from apps.evaluation.views import _build_pdf_response, _make_styles, _styled_table
+
+    styles = _make_styles()
+    table = [[Paragraph(h, styles['header']) for h in ('ID', 'Name', 'Tasks', 'Sub', 'Eval', 'Avg', 'Att', 'Viva', 'Avg')]]
+    for row in rows:
+        cells = [str(v) for v in row]
+        if paragraphs:
+            table.append([Paragraph(cell, styles['cell']) for cell in cells])
+        else:
+            table.append([Paragraph(cell, styles['cell']) for cell in cells[:2]] + cells[2:])
+    widths = [0.95 * inch, 1.9 * inch] + [0.8 * inch] * 7
+    return _build_pdf_response('bench.pdf', [_styled_table(table, widths, align_center_from_col=2)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--tasks', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=30)
+    parser.add_argument('--vivas', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(os.path.join(tmp, 'bench.sqlite3'))
+        from django.conf import settings
+        settings.DEBUG = False
+        settings.REPORT_CACHE_DIR = os.path.join(tmp, 'report_cache')
+
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from apps.accounts.models import User
+        from apps.evaluation.report_stats import batch_student_stats
+        from apps.evaluation.views import batch_submission_report_pdf
+
+        batches, _, students = create_lab(args.students)
+        batch = batches[0]
+        student_ids = [student_id for _, student_id, _ in students]
+        create_records(batch, student_ids, args.tasks, args.sessions, args.vivas)
+        print(f"{args.students} students x {args.tasks} tasks, {args.sessions} lab sessions, {args.vivas} vivas")
+
+        _, elapsed, queries = timed(previous_stats, batch.id, student_ids)
+        print(f"{'stats, per-student queries':<34}{elapsed * 1000:>9.0f} ms{queries:>7} queries")
+        stats, elapsed, queries = timed(batch_student_stats, batch.id)
+        print(f"{'stats, grouped aggregates':<34}{elapsed * 1000:>9.0f} ms{queries:>7} queries")
+
+        rows = [
+            (f'STU{i:04d}', f'Student {i}', s['tasks'], s['submitted'], s['evaluated'],
+             s['task_avg'], s['attendance_pct'], s['viva_count'], s['viva_avg'])
+            for i, s in enumerate(stats.values())
+        ]
+        for paragraphs in (True, False):
+            _, elapsed, _ = timed(render, rows, paragraphs)
+            label = 'table, Paragraph per cell' if paragraphs else 'table, plain numeric cells'
+            print(f"{label:<34}{elapsed * 1000:>9.0f} ms")
+
+        faculty = User.objects.get(faculty_id='FAC001')
+        for label in ('batch report request', 'batch report request, cached'):
+            request = APIRequestFactory().get(f'/api/reports/submissions/batch/{batch.id}/pdf/')
+            force_authenticate(request, user=faculty)
+            response, elapsed, queries = timed(batch_submission_report_pdf, request, batch.id)
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            response.close()
+            print(f"{label:<34}{elapsed * 1000:>9.0f} ms{queries:>7} queries{size / 1024:>8.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
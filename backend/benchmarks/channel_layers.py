@@ -0,0 +1,151 @@
+"""
+Channel layer comparison on one host.
+
+Measures the layers' fan-out, not a supported deployment (the application
+keeps live state per process and runs as one ASGI worker). Starts
+``--workers`` processes, each running the real ASGI application with its
+share of StudentConsumer sockets (students of every batch are spread across
+processes). The parent process then publishes
+``session_status`` to every ``batch_{id}`` group and measures:
+
+- group_send: time the publisher spends in ``group_send``
+- delivery: publish until the frame reaches each student socket
+
+for the IPC layer (``apps.monitor.ipc_layer``) and, given ``--redis``,
+``RedisChannelLayer`` and ``RedisPubSubChannelLayer``.
+
+Usage (from backend/):
+    python -m benchmarks.channel_layers [--workers 4] [--students 240] [--batches 4] [--rounds 20]
+        [--redis redis://127.0.0.1:6379]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.common import create_lab, percentile, setup
+
+
+def layer_config(name, redis_url, ipc_path):
+    if name == 'ipc':
+        return {'default': {'BACKEND': 'apps.monitor.ipc_layer.IPCChannelLayer', 'CONFIG': {'path': ipc_path}}}
+    backend = {
+        'redis': 'channels_redis.core.RedisChannelLayer',
+        'redis-pubsub': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+    }[name]
+    return {'default': {'BACKEND': backend, 'CONFIG': {'hosts': [redis_url]}}}
+
+
+def worker(db_path, layers, students, rounds, results):
+    setup(db_path, channel_layers=layers, migrate=False)
+
+    async def run():
+        from apps.monitor.outbox import outbox_dispatcher
+        from benchmarks.ws_load import open_socket, receive_type
+        from config.asgi import application
+
+        outbox_dispatcher.bind()
+        sockets = []
+        for _, _, token in students:
+            communicator, _ = await open_socket(application, f'/ws/student/?token={token}', 'resumed')
+            sockets.append(communicator)
+        results.put(('ready', len(sockets)))
+
+        async def listen(communicator):
+            latencies = []
+            for _ in range(rounds):
+                message, _ = await receive_type(communicator, 'session_status', timeout=30)
+                latencies.append(time.time() - message['sent_at'])
+            return latencies
+
+        per_socket = await asyncio.gather(*(listen(c) for c in sockets))
+        results.put(('done', [latency for latencies in per_socket for latency in latencies]))
+        await asyncio.gather(*(c.disconnect() for c in sockets))
+
+    asyncio.run(run())
+
+
+async def publish(batches, rounds, interval):
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    send_times = []
+    for round_no in range(rounds):
+        for batch in batches:
+            start = time.perf_counter()
+            await layer.group_send(f'batch_{batch.id}', {
+                'type': 'session_status', 'status': 'session_started',
+                'round': round_no, 'sent_at': time.time(),
+            })
+            send_times.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return send_times
+
+
+def run_layer(name, args, db_path, batches, students, tmp):
+    layers = layer_config(name, args.redis, os.path.join(tmp, f'{name}.sock'))
+    setup(db_path, channel_layers=layers, migrate=False)
+    from channels import layers as channel_layers
+    channel_layers.channel_layers.backends.clear()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    loop = asyncio.new_event_loop()
+    # The publisher connects first, so with IPC it hosts the broker for the run.
+    loop.run_until_complete(channel_layers.get_channel_layer().new_channel())
+
+    processes = [
+        context.Process(target=worker, args=(db_path, layers, students[i::args.workers], args.rounds, results))
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    connected = sum(results.get(timeout=300)[1] for _ in processes)
+    # Let connect-time status fan-out settle before timing.
+    loop.run_until_complete(asyncio.sleep(0.5))
+
+    started = time.perf_counter()
+    send_times = loop.run_until_complete(publish(batches, args.rounds, args.interval))
+    delivery = []
+    for _ in processes:
+        delivery += results.get(timeout=300)[1]
+    elapsed = time.perf_counter() - started
+
+    for process in processes:
+        process.join(30)
+    loop.close()
+    return connected, send_times, delivery, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--students', type=int, default=240)
+    parser.add_argument('--batches', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.05, help='seconds between publish rounds')
+    parser.add_argument('--redis', help='redis://host:port; adds the two channels_redis layers')
+    args = parser.parse_args()
+
+    names = ['ipc'] + (['redis', 'redis-pubsub'] if args.redis else [])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'layers.sqlite3')
+        setup(db_path)
+        batches, _, students = create_lab(args.students, args.batches)
+
+        print(f"workers={args.workers}  students={args.students}  batches={args.batches}  rounds={args.rounds}")
+        print(f"{'layer':<14}{'sockets':>8}{'send p50':>10}{'send p95':>10}"
+              f"{'dlv p50':>10}{'dlv p95':>10}{'dlv p99':>10}{'msg/s':>9}   (ms)")
+        for name in names:
+            connected, send_times, delivery, elapsed = run_layer(name, args, db_path, batches, students, tmp)
+            print(f"{name:<14}{connected:>8}"
+                  f"{percentile(send_times, 50) * 1000:>10.2f}{percentile(send_times, 95) * 1000:>10.2f}"
+                  f"{percentile(delivery, 50) * 1000:>10.2f}{percentile(delivery, 95) * 1000:>10.2f}"
+                  f"{percentile(delivery, 99) * 1000:>10.2f}{len(delivery) / elapsed:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
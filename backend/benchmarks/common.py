@@ -0,0 +1,69 @@
+"""Shared setup for the WebSocket benchmarks: throwaway database, channel layer, lab fixtures."""
+import os
+import sys
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+from django.conf import settings
+
+
+def setup(db_path, redis_url=None, channel_layers=None, migrate=True):
+    """
+    Point Django at a fresh SQLite file and the in-memory (or given Redis)
+    channel layer; ``channel_layers`` overrides ``CHANNEL_LAYERS`` outright.
+    """
+    django.setup()
+    settings.DATABASES['default']['NAME'] = db_path
+    # Several benchmark processes may share the file.
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+    if channel_layers:
+        settings.CHANNEL_LAYERS = channel_layers
+    elif redis_url:
+        settings.CHANNEL_LAYERS = {
+            'default': {'BACKEND': 'channels_redis.core.RedisChannelLayer', 'CONFIG': {'hosts': [redis_url]}},
+        }
+    else:
+        settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def create_lab(students, batches=1):
+    """
+    Create ``batches`` batches with ``students`` students spread across them.
+    Returns ``(batches, faculty_token, students)`` where students is a list of
+    ``(batch_id, student_id, token)``.
+    """
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from apps.accounts.models import User
+    from apps.core.models import Batch, Semester
+    from apps.students.models import Student
+
+    semester = Semester.objects.create(name='Sem 1', number=1)
+    batch_rows = [Batch.objects.create(semester=semester, name=f'Batch {i + 1}', year=1) for i in range(batches)]
+    faculty = User.objects.create_user('FAC001', 'fac001@example.edu', 'pw', name='Faculty')
+
+    users = User.objects.bulk_create([
+        User(faculty_id=f'STU{i:04d}', email=f'stu{i:04d}@example.edu', name=f'Student {i}', password='!')
+        for i in range(students)
+    ])
+    Student.objects.bulk_create([
+        Student(user=user, student_id=user.faculty_id, name=user.name, batch=batch_rows[i % batches])
+        for i, user in enumerate(users)
+    ])
+    profiles = Student.objects.order_by('id').values_list('batch_id', 'id', 'user_id')
+    tokens = {user.id: str(AccessToken.for_user(user)) for user in users}
+    return batch_rows, str(AccessToken.for_user(faculty)), [(b, s, tokens[u]) for b, s, u in profiles]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
@@ -0,0 +1,133 @@
+"""
+JSON vs msgpack WebSocket framing for a monitored batch.
+
+Replays a status-churn workload for a 60-student batch (initial_load,
+one-student status_batch updates, control commands and SDP/ICE signalling) through both
+codecs and reports bytes on the wire (payload + WebSocket frame header) and
+encode/decode CPU time.
+
+Usage (from backend/):
+    python -m benchmarks.ws_codec [--students 60] [--updates 2000]
+"""
+import argparse
+import random
+import time
+
+from apps.monitor.codec import JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL, decode, encode
+
+
+def frame_header_size(length, masked):
+    size = 2
+    if length > 65535:
+        size += 8
+    elif length > 125:
+        size += 2
+    return size + (4 if masked else 0)
+
+
+def build_workload(students, updates, seed=7):
+    rng = random.Random(seed)
+    rows = [
+        {
+            'id': i,
+            'student_id': f'STU{i:04d}',
+            'name': f'Student {i}',
+            'email': f'student{i}@example.edu',
+            'batch': 1,
+            'batch_name': 'CSE-A',
+            'semester_name': 'Semester 5',
+            'status': rng.choice(['online', 'offline']),
+            'current_mode': rng.choice(['normal', 'exam', 'viva']),
+            'last_seen': '2024-01-15T10:%02d:00Z' % (i % 60),
+            'pc_id': f'PC-{i:02d}',
+        }
+        for i in range(1, students + 1)
+    ]
+    frames = [{'type': 'initial_load', 'version': 1, 'students': rows}]
+
+    sdp = 'v=0\r\n' + ''.join(
+        f'a=candidate:{n} 1 udp 2122260223 192.168.1.{n} {50000 + n} typ host\r\n' for n in range(12)
+    ) + 'a=rtpmap:96 VP8/90000\r\n' * 4
+    for n in range(updates):
+        row = rng.choice(rows)
+        kind = rng.random()
+        if kind < 0.85:
+            frames.append({
+                'type': 'status_batch',
+                'batch_id': 1,
+                'version': 2 + n,
+                'students': [{
+                    'student_id': row['id'],
+                    'student_name': row['name'],
+                    'pc_id': row['pc_id'],
+                    'status': rng.choice(['online', 'offline']),
+                    'mode': row['current_mode'],
+                    'last_seen': '2024-01-15T10:30:%02d.%06dZ' % (n % 60, n),
+                }],
+            })
+        elif kind < 0.95:
+            frames.append({'type': 'control_command', 'command': 'lock_screen', 'seq': 10_000 + n})
+        elif kind < 0.98:
+            frames.append({
+                'type': 'monitor_answer',
+                'batch_id': 1,
+                'answer': {'sdp': sdp, 'type': 'answer'},
+                'student_id': row['id'],
+            })
+        else:
+            frames.append({
+                'type': 'monitor_ice',
+                'batch_id': 1,
+                'candidate': {'candidate': f'candidate:1 1 udp 2122260223 10.0.0.{n % 250} 5{n % 9999:04d} typ host',
+                              'sdpMid': '0', 'sdpMLineIndex': 0},
+                'candidates': None,
+                'student_id': row['id'],
+            })
+    return frames
+
+
+def run(subprotocol, frames):
+    wire = 0
+    encoded = []
+    start = time.perf_counter()
+    for frame in frames:
+        text_data, bytes_data = encode(frame, subprotocol)
+        encoded.append((text_data, bytes_data))
+    encode_time = time.perf_counter() - start
+
+    for text_data, bytes_data in encoded:
+        length = len(bytes_data) if bytes_data is not None else len(text_data.encode('utf-8'))
+        # Server-to-client frames are unmasked.
+        wire += length + frame_header_size(length, masked=False)
+
+    start = time.perf_counter()
+    for text_data, bytes_data in encoded:
+        decode(text_data, bytes_data)
+    decode_time = time.perf_counter() - start
+    return wire, encode_time, decode_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--students', type=int, default=60)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    frames = build_workload(args.students, args.updates)
+    print(f"{len(frames)} frames, {args.students} students, best of {args.rounds}")
+    print(f"{'codec':<18}{'wire bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    results = {}
+    for subprotocol in (JSON_SUBPROTOCOL, MSGPACK_SUBPROTOCOL):
+        best = min((run(subprotocol, frames) for _ in range(args.rounds)), key=lambda r: r[1] + r[2])
+        results[subprotocol] = best
+        wire, enc, dec = best
+        print(f"{subprotocol:<18}{wire:>12}{enc * 1000:>12.2f}{dec * 1000:>12.2f}")
+
+    json_wire = results[JSON_SUBPROTOCOL][0]
+    pack_wire = results[MSGPACK_SUBPROTOCOL][0]
+    print(f"msgpack wire size: {pack_wire / json_wire:.1%} of JSON")
+
+
+if __name__ == '__main__':
+    main()
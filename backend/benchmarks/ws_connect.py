@@ -0,0 +1,172 @@
+"""
+Student WebSocket connect/disconnect throughput.
+
+Creates a throwaway SQLite database with one batch of simulated students,
+attaches a faculty monitor, then connects and disconnects every student
+through the real ASGI application (in-memory channel layer) and reports
+cycles per second.
+
+``--sync-orm`` swaps the consumer data layer back to the previous
+``database_sync_to_async`` queries, without the principal, presence and
+snapshot stores, for a before/after comparison. The timed
+pass reconnects every student after an untimed first pass; ``--cold`` clears
+the principal and presence caches in between so every connect goes to the
+database.
+
+Usage (from backend/):
+    python -m benchmarks.ws_connect [--students 500] [--concurrency 100] [--cold] [--sync-orm]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.common import create_lab, setup
+
+
+class _NoPresenceStore:
+    """The previous data layer kept no presence store: every entry reads as seeded, so nothing is loaded."""
+
+    def get(self, student_id):
+        return {}
+
+
+def use_sync_orm():
+    """
+    Previous data layer, query for query: through database_sync_to_async and
+    with no principal, presence or snapshot store. Each connect looks up the
+    user, the student profile and its batch and saves the status row; each
+    disconnect saves it again; the monitor's initial load serializes the batch.
+    """
+    from channels.db import database_sync_to_async
+    from django.db.models.signals import post_delete, post_save
+    from django.utils import timezone
+
+    from apps.accounts import authentication
+    from apps.accounts.models import User
+    from apps.monitor import consumers
+    from apps.monitor.signals import student_changed
+    from apps.monitor.snapshots import batch_snapshots
+    from apps.students.models import Student
+    from apps.students.serializers import StudentSerializer
+
+    @database_sync_to_async
+    def resolve(user_id):
+        try:
+            user = User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            return None
+        try:
+            student = user.student_profile
+        except Student.DoesNotExist:
+            return authentication.Principal(user)
+        return authentication.Principal(user, student.id, student.batch.id)
+
+    @database_sync_to_async
+    def update_student_status(student_id, status):
+        student = Student.objects.get(id=student_id)
+        student.status = status
+        student.last_seen = timezone.now()
+        student.save(update_fields=['status', 'last_seen'])
+        return student
+
+    async def broadcast_status(self, status):
+        student = await update_student_status(self.student_id, status)
+        await self.channel_layer.group_send(f'monitor_batch_{self.batch_id}', {
+            'type': 'status_batch',
+            'batch_id': self.batch_id,
+            'students': [{
+                'student_id': student.id,
+                'status': status,
+                'name': student.name,
+                'last_seen': student.last_seen.isoformat() if student.last_seen else None,
+            }],
+        })
+
+    @database_sync_to_async
+    def load_batch(batch_id):
+        return None, StudentSerializer(Student.objects.filter(batch_id=batch_id), many=True).data
+
+    authentication.principal_cache.aresolve = resolve
+    consumers.presence_store = _NoPresenceStore()
+    consumers.StudentConsumer.broadcast_status = broadcast_status
+    batch_snapshots.aload = load_batch
+    # Snapshot invalidation and presence sync on save did not exist either
+    post_save.disconnect(student_changed, sender=Student)
+    post_delete.disconnect(student_changed, sender=Student)
+
+
+def clear_caches():
+    from apps.accounts.authentication import principal_cache
+    from apps.monitor.presence import presence_store
+
+    principal_cache.invalidate()
+    with presence_store._lock:
+        presence_store._entries.clear()
+        presence_store._dirty.clear()
+
+
+async def cycle(application, token):
+    from channels.testing import WebsocketCommunicator
+
+    communicator = WebsocketCommunicator(application, f'/ws/student/?token={token}')
+    connected, _ = await communicator.connect()
+    if connected:
+        await communicator.receive_from()  # resumed / resync_required
+    await communicator.disconnect()
+    return connected
+
+
+async def run(batch, faculty_token, tokens, concurrency, cold):
+    from channels.testing import WebsocketCommunicator
+    from config.asgi import application
+
+    monitor = WebsocketCommunicator(application, f'/ws/monitor/{batch.id}/?token={faculty_token}')
+    await monitor.connect()
+    await monitor.receive_from()
+
+    async def all_students():
+        connected = 0
+        for offset in range(0, len(tokens), concurrency):
+            wave = tokens[offset:offset + concurrency]
+            connected += sum(await asyncio.gather(*(cycle(application, token) for token in wave)))
+        return connected
+
+    # Untimed first pass; the timed pass then measures reconnects unless --cold.
+    await all_students()
+    if cold:
+        clear_caches()
+
+    start = time.perf_counter()
+    connected = await all_students()
+    elapsed = time.perf_counter() - start
+
+    await monitor.disconnect()
+    return connected, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--cold', action='store_true', help='clear principal/presence caches before the run')
+    parser.add_argument('--sync-orm', action='store_true', help='use the previous database_sync_to_async data layer')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(os.path.join(tmp, 'bench.sqlite3'))
+        batches, faculty_token, students = create_lab(args.students)
+        batch, tokens = batches[0], [token for _, _, token in students]
+        if args.sync_orm:
+            use_sync_orm()
+
+        connected, elapsed = asyncio.run(run(batch, faculty_token, tokens, args.concurrency, args.cold))
+
+    mode = 'sync_to_async' if args.sync_orm else 'async ORM'
+    print(f"{mode}{' (cold caches)' if args.cold else ''}: {connected}/{len(tokens)} students, "
+          f"{elapsed:.2f}s, {connected / elapsed:.0f} connect+disconnect/s")
+
+
+if __name__ == '__main__':
+    main()
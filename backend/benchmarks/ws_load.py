@@ -0,0 +1,201 @@
+"""
+WebSocket load test: N StudentConsumer and M MonitorConsumer connections.
+
+Runs against the real ASGI application with channels' WebsocketCommunicator
+on a throwaway SQLite database, using the in-memory channel layer (or Redis
+with ``--redis``). Measures:
+
+- connect latency (connect until the first frame: ``resumed`` / ``initial_load``)
+- fan-out latency for ``session_status`` and ``control_command`` published
+  through the outbox (``broadcast``) until every student in the batch has it
+- signaling round trip: monitor_offer -> student -> monitor_answer -> monitor
+
+Prints a fixed-format report; ``--json PATH`` also writes the numbers so runs
+can be diffed between commits.
+
+Usage (from backend/):
+    python -m benchmarks.ws_load [--students 200] [--monitors 4] [--batches 4] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from benchmarks.common import create_lab, percentile, setup
+
+
+TIMEOUT = 10
+
+
+async def receive_type(communicator, kind, timeout=TIMEOUT):
+    """Read frames until one of type ``kind`` arrives; returns (frame, arrival time)."""
+    from apps.monitor.codec import decode
+
+    deadline = time.perf_counter() + timeout
+    while True:
+        frame = await communicator.receive_output(max(0.001, deadline - time.perf_counter()))
+        if frame['type'] == 'websocket.close':
+            raise RuntimeError(f'socket closed while waiting for {kind}')
+        message = decode(frame.get('text'), frame.get('bytes'))
+        if message.get('type') == kind:
+            return message, time.perf_counter()
+
+
+async def open_socket(application, path, first_frame):
+    from channels.testing import WebsocketCommunicator
+
+    communicator = WebsocketCommunicator(application, path)
+    start = time.perf_counter()
+    connected, _ = await communicator.connect(TIMEOUT)
+    if not connected:
+        raise RuntimeError(f'connect rejected: {path}')
+    _, arrived = await receive_type(communicator, first_frame)
+    return communicator, arrived - start
+
+
+async def connect_all(application, batches, faculty_token, students, monitors, concurrency):
+    monitor_sockets, monitor_latency = [], []
+    for i in range(monitors):
+        batch = batches[i % len(batches)]
+        communicator, latency = await open_socket(
+            application, f'/ws/monitor/{batch.id}/?token={faculty_token}', 'initial_load')
+        monitor_sockets.append((batch.id, communicator))
+        monitor_latency.append(latency)
+
+    student_sockets, student_latency = [], []
+    for offset in range(0, len(students), concurrency):
+        wave = students[offset:offset + concurrency]
+        opened = await asyncio.gather(*(
+            open_socket(application, f'/ws/student/?token={token}', 'resumed') for _, _, token in wave
+        ))
+        for (batch_id, student_id, _), (communicator, latency) in zip(wave, opened):
+            student_sockets.append((batch_id, student_id, communicator))
+            student_latency.append(latency)
+    return monitor_sockets, monitor_latency, student_sockets, student_latency
+
+
+async def fan_out(kind, batch_id, student_sockets, event):
+    """Publish through the outbox and time delivery to every student in the batch."""
+    from channels.db import database_sync_to_async
+
+    from apps.monitor.events import broadcast
+
+    targets = [c for b, _, c in student_sockets if b == batch_id]
+    waiters = [asyncio.ensure_future(receive_type(c, kind)) for c in targets]
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await database_sync_to_async(broadcast)(f'batch_{batch_id}', event)
+    arrivals = await asyncio.gather(*waiters)
+    return [arrived - start for _, arrived in arrivals]
+
+
+async def signaling_round_trip(monitor, student):
+    start = time.perf_counter()
+    await monitor.send_json_to({'type': 'monitor_offer', 'student_id': student[1],
+                                'offer': {'sdp': 'v=0', 'type': 'offer'}})
+    await receive_type(student[2], 'monitor_offer')
+    await student[2].send_json_to({'type': 'monitor_answer', 'student_id': student[1],
+                                   'answer': {'sdp': 'v=0', 'type': 'answer'}})
+    await receive_type(monitor, 'monitor_answer')
+    return time.perf_counter() - start
+
+
+async def run(args, batches, faculty_token, students):
+    from apps.monitor.outbox import outbox_dispatcher
+    from config.asgi import application
+
+    outbox_dispatcher.bind()
+    monitors, monitor_latency, student_sockets, student_latency = await connect_all(
+        application, batches, faculty_token, students, args.monitors, args.concurrency)
+    # Let the connect storm's status_batch frames settle before timing events.
+    await asyncio.sleep(0.3)
+
+    session, control, rtt = [], [], []
+    for round_no in range(args.rounds):
+        for batch in batches:
+            session += await fan_out('session_status', batch.id, student_sockets, {
+                'type': 'session_status', 'status': 'session_started', 'session_id': round_no})
+            control += await fan_out('control_command', batch.id, student_sockets, {
+                'type': 'control_command', 'command_type': 'lock_pc', 'payload': {}, 'batch_id': batch.id})
+
+        for batch_id, monitor in monitors:
+            student = next(s for s in student_sockets if s[0] == batch_id)
+            rtt.append(await signaling_round_trip(monitor, student))
+
+    for _, communicator in monitors:
+        await communicator.disconnect()
+    await asyncio.gather(*(c.disconnect() for _, _, c in student_sockets))
+
+    return {
+        'student_connect': student_latency,
+        'monitor_connect': monitor_latency,
+        'session_status_fanout': session,
+        'control_command_fanout': control,
+        'signaling_rtt': rtt,
+    }
+
+
+def summarize(samples):
+    return {
+        'n': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max(samples, default=0) * 1000,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--monitors', type=int, default=4)
+    parser.add_argument('--batches', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=50, help='students connecting at once')
+    parser.add_argument('--redis', help='redis://host:port to use channels_redis instead of the in-memory layer')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(os.path.join(tmp, 'load.sqlite3'), args.redis)
+        batches, faculty_token, students = create_lab(args.students, args.batches)
+        started = time.perf_counter()
+        samples = asyncio.run(run(args, batches, faculty_token, students))
+        elapsed = time.perf_counter() - started
+
+    report = {
+        'revision': git_revision(),
+        'layer': 'redis' if args.redis else 'memory',
+        'students': args.students,
+        'monitors': args.monitors,
+        'batches': args.batches,
+        'rounds': args.rounds,
+        'elapsed_s': elapsed,
+        'metrics': {name: summarize(values) for name, values in samples.items()},
+    }
+
+    print(f"rev {report['revision']}  layer={report['layer']}  students={args.students}  "
+          f"monitors={args.monitors}  batches={args.batches}  rounds={args.rounds}  {elapsed:.1f}s")
+    print(f"{'metric':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in report['metrics'].items():
+        print(f"{name:<24}{stats['n']:>6}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,15 +7,16 @@ django.setup()
 
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+from apps.accounts.authentication import JWTAuthMiddleware
+from apps.monitor.outbox import OutboxDispatcherMiddleware
 from apps.monitor.routing import websocket_urlpatterns
 
 
-application = ProtocolTypeRouter({
+application = OutboxDispatcherMiddleware(ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "websocket": JWTAuthMiddleware(
         URLRouter(
             websocket_urlpatterns
         )
     ),
-})
+}))
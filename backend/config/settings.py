@@ -118,7 +118,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -140,6 +140,10 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Resolved JWT principals (user, student id, batch id) shared by REST and WebSocket auth
+AUTH_PRINCIPAL_CACHE_TTL = 60  # seconds
+AUTH_PRINCIPAL_CACHE_SIZE = 2048
+
 # CORS Headers
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 CORS_ALLOW_CREDENTIALS = True
@@ -154,8 +158,63 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Run a single ASGI worker: the event replay log, batch snapshots, presence,
+# thumbnail budgets, the media relay and report jobs are kept per process.
+# Single-host deployments without Redis can use the IPC layer instead, which
+# also reaches management commands and other local processes (Unix socket,
+# or loopback TCP on Windows); see apps/monitor/ipc_layer.py:
+# CHANNEL_LAYERS = {
+#     "default": {
+#         "BACKEND": "apps.monitor.ipc_layer.IPCChannelLayer",
+#     },
+# }
+
+# Live presence: seconds between coalesced writes of student status to the DB
+PRESENCE_FLUSH_INTERVAL = 1.0
+# Store the students API overlays on status/current_mode/last_seen (see apps/students/presence.py)
+STUDENT_LIVE_PRESENCE = 'apps.monitor.presence.presence_store'
+
+# Batch/student events kept per group for replay to reconnecting students
+EVENT_LOG_CAPACITY = 200
+
+# Window (seconds) for coalescing student status changes into one status_batch frame
+MONITOR_STATUS_BATCH_WINDOW = 0.1
+
+# Max outbox rows sent per drain (events are written in the request transaction, sent after commit)
+OUTBOX_BATCH_SIZE = 500
+
+# Per-connection outbound WebSocket queue: max queued non-critical events,
+# and max queued critical messages before the connection is closed
+WS_SEND_QUEUE_CAPACITY = 256
+WS_SEND_CRITICAL_CAPACITY = 1024
+# Max messages sent but not yet acked by a client that sends acks; keep it
+# above the clients' ack interval (16 messages)
+WS_SEND_WINDOW = 64
+
+# Live monitor thumbnail wall: per-batch relay budget, max frame size,
+# default send interval (seconds) and how long a start request lasts
+THUMBNAIL_BATCH_BYTES_PER_SEC = 750_000
+THUMBNAIL_MAX_BYTES = 48_000
+THUMBNAIL_INTERVAL = 1.0
+THUMBNAIL_LEASE = 30
+
+# Live screen viewing through a server-side relay: the student streams once to
+# the backend and every faculty viewer is fed from that stream (media_relay.py).
+# Seconds a viewer waits for the student's video before giving up.
+MONITOR_MEDIA_RELAY = False
+MONITOR_RELAY_TRACK_TIMEOUT = 15
+
+# Exam screen activity reported by student apps (64-bit screen hashes): a sample
+# whose hash moved at least this many bits counts as a change of screen
+SCREEN_ACTIVITY_CHANGE_BITS = 12
+
 # Media files (uploads)
 import os
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# PDF reports (evaluation/report_jobs.py): renders run in this many worker
+# processes (0 renders inline in the request); finished PDFs are cached here,
+# keyed by the version of the data they were rendered from
+REPORT_JOB_WORKERS = 2
+REPORT_CACHE_DIR = os.path.join(MEDIA_ROOT, 'report_cache')
@@ -457,6 +457,28 @@ class APIClient:
             save_path
         )
 
+    def request_report(self, kind: str, object_id: int) -> Dict[str, Any]:
+        """Queue a PDF report render ('student' or 'batch'); the job may already be done if cached."""
+        try:
+            response = self.post("reports/jobs/", {"kind": kind, "id": object_id})
+            if response.status_code in [200, 202]:
+                return {"success": True, "data": response.json(), "error": None}
+            return {"success": False, "data": None, "error": response.json().get("error", "Failed to queue report")}
+        except Exception as e:
+            return {"success": False, "data": None, "error": str(e)}
+
+    def get_report_job(self, job_id: str) -> Dict[str, Any]:
+        try:
+            response = self.get(f"reports/jobs/{job_id}/")
+            if response.status_code == 200:
+                return {"success": True, "data": response.json(), "error": None}
+            return {"success": False, "data": None, "error": response.json().get("error", "Failed to fetch report job")}
+        except Exception as e:
+            return {"success": False, "data": None, "error": str(e)}
+
+    def download_report_job_pdf_to_path(self, job_id: str, save_path: str) -> Dict[str, Any]:
+        return self.download_pdf_to_path(f"reports/jobs/{job_id}/pdf/", save_path)
+
     def open_file(self, file_path: str) -> Dict[str, Any]:
         try:
             if os.name == "nt":
@@ -0,0 +1,354 @@
+"""
+Screen monitoring, capture to paint, on one machine without a network.
+
+Each stream is a loopback WebRTC connection. The student end answers the way
+the student client does: a ScreenVideoTrack reading a synthetic screen, with
+encoder-profile adaptation. The faculty end is FacultyWebRTCManager itself
+(mailbox, renderer thread, display-rate paint timer), signalling through an
+in-process stand-in for the monitor socket. Qt runs on the offscreen platform.
+
+Scenarios: scrolling text, a static IDE with a blinking cursor, and a video
+playing in part of the screen. For each one it reports, over the measured
+window:
+  capture    ms per frame in ScreenVideoTrack (grab and FramePipeline), p50/p95
+  encode     ms per frame in the sender's encoder, p50/p95
+  latency    capture to hand-off for painting, p50/p95/p99 (frames replaced
+             by a newer one before they were painted are not counted)
+  cpu        process CPU time (both ends) as % of one core, per stream
+  kbps       RTP bytes sent per second, per stream
+  fps        frames painted per second, per stream
+
+Usage (from lab/):
+    python -m benchmarks.monitor_pipeline [--seconds 10] [--streams 1] [--profile text] [--scenario text ...]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+LAB = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, LAB)
+# After lab/, so lab's config wins; only screen_track and encoder_profiles are used
+sys.path.append(os.path.join(os.path.dirname(LAB), 'student'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import cv2
+import numpy as np
+from aiortc import RTCIceCandidate, RTCPeerConnection, RTCSessionDescription
+import aiortc.rtcrtpsender
+from PyQt6.QtCore import QEventLoop, QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QGuiApplication, QPixmap
+
+from monitor import webrtc_manager
+from monitor.frame_mailbox import FrameMailbox
+from monitor.webrtc_manager import FacultyWebRTCManager, ice_candidates, rtc_configuration
+
+from encoder_profiles import QualityController, adapt, get_profile
+from screen_track import ScreenVideoTrack
+
+
+SCREEN = (1920, 1080)
+SCENARIOS = ('text', 'ide', 'video')
+WORDS = ('def', 'return', 'self', 'frame', 'student_id', 'await', 'if', 'None', 'for', 'in',
+         'print(', 'width', 'height', '=', '+', 'import', 'class', 'pipeline', '0', '1')
+
+
+def code_lines(rng, count, width):
+    """Text screen: dark code-like lines on a light background, ``count`` lines tall."""
+    image = np.full((count * 20, width, 4), 250, dtype=np.uint8)
+    for line in range(count):
+        indent = int(rng.integers(0, 4)) * 32
+        text = ' '.join(rng.choice(WORDS, int(rng.integers(2, 12))))
+        cv2.putText(image, text, (60 + indent, line * 20 + 15), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5, (40, 40, 40, 255), 1, cv2.LINE_AA)
+    return image
+
+
+class SyntheticScreen:
+    """A fresh BGRA buffer per grab, like mss, showing ``scenario``."""
+
+    def __init__(self, scenario, seed=0):
+        rng = np.random.default_rng(seed)
+        width, height = SCREEN
+        self.scenario = scenario
+        self.start = time.monotonic()
+        if scenario == 'text':
+            # Four screens of text, scrolled continuously and wrapped
+            self.page = code_lines(rng, height * 4 // 20, width)
+            self.page = np.concatenate((self.page, self.page[:height]))
+        else:
+            self.screen = code_lines(rng, height // 20, width)
+        if scenario == 'video':
+            # Smooth low-frequency texture panning under a moving disc
+            noise = rng.integers(0, 256, (36, 64, 3), dtype=np.uint8)
+            self.texture = cv2.resize(noise, (1920, 1080), interpolation=cv2.INTER_CUBIC)
+
+    def grab(self):
+        elapsed = time.monotonic() - self.start
+        width, height = SCREEN
+        if self.scenario == 'text':
+            offset = int(elapsed * 120) % (self.page.shape[0] - height)
+            return self.page[offset:offset + height].copy()
+
+        screen = self.screen.copy()
+        if self.scenario == 'ide' and int(elapsed * 2) % 2:
+            screen[405:421, 700:709, :3] = 40
+        elif self.scenario == 'video':
+            x, y = int(elapsed * 90) % 960, int(elapsed * 50) % 540
+            region = self.texture[y:y + 540, x:x + 960].copy()
+            cv2.circle(region, (480 + int(300 * np.sin(elapsed * 2)), 270), 80, (0, 0, 220), -1)
+            screen[200:740, 480:1440, :3] = region
+        return screen
+
+
+class Recorder:
+    """Per-run measurements, appended from any thread."""
+
+    def __init__(self):
+        self.captured = {}
+        self.clear()
+
+    def clear(self):
+        self.capture_ms = []
+        self.encode_ms = []
+        self.painted = []
+
+
+class TimedTrack(ScreenVideoTrack):
+    """ScreenVideoTrack that records each frame's capture start and duration."""
+
+    def __init__(self, student_id, recorder, **kwargs):
+        super().__init__(**kwargs)
+        self.student_id = student_id
+        self.recorder = recorder
+
+    async def next_timestamp(self):
+        pts, time_base = await super().next_timestamp()
+        self._capture_start = time.perf_counter()
+        self.recorder.captured[self.student_id, pts] = self._capture_start
+        return pts, time_base
+
+    async def recv(self):
+        frame = await super().recv()
+        self.recorder.capture_ms.append((time.perf_counter() - self._capture_start) * 1000)
+        return frame
+
+
+def timed_mailbox(recorder):
+    class TimedMailbox(FrameMailbox):
+        """Follows each frame's pts through the renderer to the paint hand-off."""
+
+        def __init__(self):
+            super().__init__()
+            self._rendering = {}
+            self._image_pts = {}
+
+        def next_frame(self, timeout=None):
+            with self._lock:
+                item = super().next_frame(timeout)
+                if item is not None:
+                    self._rendering[item[0]] = item[1].pts
+                return item
+
+        def publish(self, student_id, image):
+            with self._lock:
+                self._image_pts[student_id] = self._rendering.pop(student_id, None)
+                super().publish(student_id, image)
+
+        def take_images(self):
+            with self._lock:
+                images = super().take_images()
+                now = time.perf_counter()
+                for student_id in images:
+                    recorder.painted.append((student_id, self._image_pts.pop(student_id, None), now))
+                return images
+
+    return TimedMailbox
+
+
+def timed_encoders(recorder, get_encoder):
+    """``get_encoder`` whose encoders time each encode call."""
+    def timed_get_encoder(codec):
+        encoder = get_encoder(codec)
+        encode = encoder.encode
+
+        def timed_encode(*args, **kwargs):
+            start = time.perf_counter()
+            result = encode(*args, **kwargs)
+            recorder.encode_ms.append((time.perf_counter() - start) * 1000)
+            return result
+
+        encoder.encode = timed_encode
+        return encoder
+
+    return timed_get_encoder
+
+
+class LoopbackSocket(QObject):
+    """Stands in for the faculty monitor socket: messages go straight to the student peers."""
+
+    monitor_signal = pyqtSignal(dict)
+
+    def __init__(self):
+        super().__init__()
+        self.connected = True
+        self.students = None
+
+    def send_json(self, data):
+        self.students.receive(data)
+
+
+class StudentPeers:
+    """Answers monitor offers on its own event loop, like a student client per stream."""
+
+    def __init__(self, socket, scenario, recorder):
+        self.socket = socket
+        self.scenario = scenario
+        self.recorder = recorder
+        self.connections = {}
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def receive(self, data):
+        handler = {
+            'monitor_offer': self._answer,
+            'monitor_ice': self._add_ice,
+            'monitor_stop': self._stop,
+        }.get(data.get('type'))
+        if handler is not None:
+            asyncio.run_coroutine_threadsafe(handler(data), self.loop)
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _answer(self, data):
+        student_id = data['student_id']
+        pc = RTCPeerConnection(rtc_configuration())
+        await pc.setRemoteDescription(RTCSessionDescription(**data['offer']))
+        profile = get_profile(data.get('profile'))
+        track = TimedTrack(student_id, self.recorder, source=SyntheticScreen(self.scenario, seed=student_id),
+                           profile=profile, paused=bool(data.get('prewarm')))
+        sender = pc.addTrack(track)
+        adapting = asyncio.ensure_future(adapt(sender, track, QualityController(profile)))
+        self.connections[student_id] = (pc, sender, adapting)
+        await pc.setLocalDescription(await pc.createAnswer())
+        self.socket.monitor_signal.emit({
+            'type': 'monitor_answer',
+            'student_id': student_id,
+            'answer': {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type},
+        })
+
+    async def _add_ice(self, data):
+        pc, _, _ = self.connections.get(data['student_id'], (None, None, None))
+        for candidate in ice_candidates(data) if pc else []:
+            await pc.addIceCandidate(RTCIceCandidate(
+                sdpMid=candidate['sdpMid'],
+                sdpMLineIndex=candidate['sdpMLineIndex'],
+                candidate=candidate['candidate'],
+            ))
+
+    async def _stop(self, data):
+        pc, _, adapting = self.connections.pop(data['student_id'], (None, None, None))
+        if pc is not None:
+            adapting.cancel()
+            await pc.close()
+
+    async def bytes_sent(self):
+        total = 0
+        for _, sender, _ in self.connections.values():
+            for stats in (await sender.getStats()).values():
+                if stats.type == 'outbound-rtp':
+                    total += stats.bytesSent
+        return total
+
+
+def pump(seconds):
+    """Run the Qt event loop for ``seconds``."""
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def run(scenario, streams, seconds, profile, warmup=2.0):
+    recorder = Recorder()
+    get_encoder = aiortc.rtcrtpsender.get_encoder
+    aiortc.rtcrtpsender.get_encoder = timed_encoders(recorder, get_encoder)
+    webrtc_manager.FrameMailbox = timed_mailbox(recorder)
+
+    socket = LoopbackSocket()
+    students = socket.students = StudentPeers(socket, scenario, recorder)
+    painted = set()
+    manager = FacultyWebRTCManager(socket, lambda student_id, image: (painted.add(student_id), QPixmap.fromImage(image)))
+
+    ids = range(1, streams + 1)
+    for student_id in ids:
+        # Tile in the single-student view on a 1080p display
+        manager.set_target_size(student_id, 1280, 720)
+        manager.start_monitoring(student_id, profile)
+
+    deadline = time.monotonic() + 20
+    while len(painted) < streams and time.monotonic() < deadline:
+        pump(0.1)
+    if len(painted) < streams:
+        raise RuntimeError(f"only {len(painted)} of {streams} streams delivered video")
+    pump(warmup)
+
+    recorder.clear()
+    bytes_start = students.call(students.bytes_sent())
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    pump(seconds)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    sent = students.call(students.bytes_sent()) - bytes_start
+    frames = list(recorder.painted)
+
+    for student_id in ids:
+        manager.stop_monitoring(student_id)
+    pump(0.5)
+    manager.renderer.stop()
+    webrtc_manager.FrameMailbox = FrameMailbox
+    aiortc.rtcrtpsender.get_encoder = get_encoder
+    students.loop.call_soon_threadsafe(students.loop.stop)
+
+    latency = [(at - recorder.captured[student_id, pts]) * 1000
+               for student_id, pts, at in frames if (student_id, pts) in recorder.captured]
+    return {
+        'capture': (percentile(recorder.capture_ms, 50), percentile(recorder.capture_ms, 95)),
+        'encode': (percentile(recorder.encode_ms, 50), percentile(recorder.encode_ms, 95)),
+        'latency': tuple(percentile(latency, q) for q in (50, 95, 99)),
+        'cpu': cpu / wall * 100 / streams,
+        'kbps': sent * 8 / wall / 1000 / streams,
+        'fps': len(frames) / wall / streams,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--streams', type=int, default=1)
+    parser.add_argument('--profile', default='text', choices=('text', 'smooth'))
+    parser.add_argument('--scenario', nargs='*', default=list(SCENARIOS), choices=SCENARIOS)
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv[:1])
+    print(f"{args.streams} stream(s), profile {args.profile}, {args.seconds:g} s per scenario")
+    print(f"{'scenario':<10}{'capture p50/95':>16}{'encode p50/95':>16}{'latency p50/95/99':>22}"
+          f"{'cpu %':>8}{'kbps':>8}{'fps':>6}")
+    for scenario in args.scenario:
+        result = run(scenario, args.streams, args.seconds, args.profile)
+        capture = '/'.join(f"{v:.1f}" for v in result['capture'])
+        encode = '/'.join(f"{v:.1f}" for v in result['encode'])
+        latency = '/'.join(f"{v:.0f}" for v in result['latency'])
+        print(f"{scenario:<10}{capture:>16}{encode:>16}{latency:>22}"
+              f"{result['cpu']:>8.1f}{result['kbps']:>8.0f}{result['fps']:>6.1f}")
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,3 +6,10 @@ PORT = os.getenv("SMARTLAB_SERVER_PORT", "8000")
 
 BASE_HTTP = f"http://{SERVER_IP}:{PORT}"
 BASE_WS = f"ws://{SERVER_IP}:{PORT}"
+
+# Encoder profile requested for live screen views: "text" (sharp, low fps) or "smooth"
+MONITOR_PROFILE = os.getenv("SMARTLAB_MONITOR_PROFILE", "text")
+
+# STUN server for live screen views across networks (e.g. "stun:stun.l.google.com:19302").
+# Empty on the lab LAN, so connecting never waits on an unreachable server.
+STUN_URL = os.getenv("SMARTLAB_STUN_URL", "")
@@ -16,7 +16,7 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QIcon, QFont, QColor
 
-from ui.common.websocket_client import FacultyWebSocketClient
+from ui.common.websocket_client import stop_shared_monitor_client
 from ui.theme import app_stylesheet, Theme
 from ui.screens import (
     LoginScreen,
@@ -235,6 +235,7 @@ class MainWindow(QMainWindow):
     def _on_logout(self):
         """Handle logout"""
         self.current_faculty_id = ""
+        stop_shared_monitor_client()
         if hasattr(self, 'profile_label'):
             self.profile_label.setText("Guest \u2022 Faculty")
         self._show_login()
@@ -0,0 +1,126 @@
+"""
+Latest-frame-wins delivery of decoded WebRTC video to the GUI.
+
+``FrameMailbox`` keeps at most one pending decoded frame and one rendered
+image per student; a newer frame replaces an older one that was not used
+yet, and is counted as dropped. A ``FrameRenderer`` thread scales and
+converts frames (one swscale pass, straight to the viewer's size) into
+QImages, and the GUI thread only turns the latest image into a pixmap when
+its display-rate timer fires.
+"""
+import threading
+
+from PyQt6.QtGui import QImage
+
+
+class FrameMailbox:
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._frames = {}
+        self._images = {}
+        self._targets = {}
+        self._stats = {}
+        self._closed = False
+
+    def _counters(self, student_id):
+        counters = self._stats.get(student_id)
+        if counters is None:
+            counters = self._stats[student_id] = {'decoded': 0, 'dropped': 0, 'painted': 0}
+        return counters
+
+    def put(self, student_id, frame):
+        """Decoded frame from the network thread; replaces any frame not yet rendered."""
+        with self._lock:
+            counters = self._counters(student_id)
+            counters['decoded'] += 1
+            if student_id in self._frames:
+                counters['dropped'] += 1
+            self._frames[student_id] = frame
+            self._lock.notify()
+
+    def set_target(self, student_id, width, height):
+        """Size of the widget showing this student; frames are scaled to fit it."""
+        with self._lock:
+            self._targets[student_id] = (max(2, width), max(2, height))
+
+    def next_frame(self, timeout=None):
+        """Block until some student has a pending frame; returns (student_id, frame, target) or None."""
+        with self._lock:
+            if not self._frames and not self._closed:
+                self._lock.wait(timeout)
+            if not self._frames:
+                return None
+            student_id = next(iter(self._frames))
+            frame = self._frames.pop(student_id)
+            return student_id, frame, self._targets.get(student_id)
+
+    def publish(self, student_id, image):
+        """Rendered image from the renderer; replaces any image not yet painted."""
+        with self._lock:
+            if student_id in self._images:
+                self._counters(student_id)['dropped'] += 1
+            self._images[student_id] = image
+
+    def take_images(self):
+        """All images ready to paint, for the GUI thread."""
+        with self._lock:
+            images, self._images = self._images, {}
+            for student_id in images:
+                self._counters(student_id)['painted'] += 1
+            return images
+
+    def forget(self, student_id):
+        with self._lock:
+            self._frames.pop(student_id, None)
+            self._images.pop(student_id, None)
+            self._targets.pop(student_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {student_id: dict(counters) for student_id, counters in self._stats.items()}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+
+
+def fit_size(width, height, target):
+    """Largest even size with the frame's aspect ratio that fits ``target``."""
+    if target is None:
+        return width, height
+    scale = min(target[0] / width, target[1] / height)
+    return max(2, int(width * scale) & ~1), max(2, int(height * scale) & ~1)
+
+
+class FrameRenderer(threading.Thread):
+    """Worker that turns pending decoded frames into display-sized QImages."""
+
+    def __init__(self, mailbox):
+        super().__init__(name='frame-renderer', daemon=True)
+        self.mailbox = mailbox
+        self.running = True
+
+    def run(self):
+        while self.running:
+            item = self.mailbox.next_frame(timeout=0.5)
+            if item is None:
+                continue
+            student_id, frame, target = item
+            try:
+                self.mailbox.publish(student_id, render(frame, target))
+            except Exception as e:
+                print(f"[Student {student_id}] Frame render failed: {e}")
+
+    def stop(self):
+        self.running = False
+        self.mailbox.close()
+
+
+def render(frame, target):
+    """Scale and convert an av.VideoFrame to an RGB QImage in one reformat."""
+    width, height = fit_size(frame.width, frame.height, target)
+    rgb = frame.reformat(width=width, height=height, format='rgb24', interpolation='BILINEAR')
+    pixels = rgb.to_ndarray()
+    # QImage does not own the numpy buffer; copy() detaches it
+    return QImage(pixels.data, width, height, pixels.strides[0], QImage.Format.Format_RGB888).copy()
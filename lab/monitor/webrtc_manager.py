@@ -1,12 +1,38 @@
 import asyncio
 import threading
-import cv2
-import numpy as np
-from aiortc import RTCPeerConnection, RTCSessionDescription, RTCIceCandidate
-from PyQt6.QtCore import pyqtSignal, QObject
+import time
+from collections import OrderedDict
+from aiortc import RTCConfiguration, RTCIceServer, RTCPeerConnection, RTCSessionDescription, RTCIceCandidate
+from PyQt6.QtCore import pyqtSignal, QObject, QTimer
+from PyQt6.QtGui import QGuiApplication
+
+from config import MONITOR_PROFILE, STUN_URL
+from monitor.frame_mailbox import FrameMailbox, FrameRenderer
+
+
+# Upper bound for the repaint timer when the screen reports a higher rate
+MAX_PAINT_RATE = 60
+
+# Idle pre-negotiated connections kept for students likely to be opened next
+MAX_WARM = 4
+
+# Trickled ICE candidates found within this many seconds go out in one message
+ICE_BATCH_DELAY = 0.02
+
+
+def rtc_configuration():
+    """Host candidates only on the lab LAN; a STUN server only if configured."""
+    return RTCConfiguration(iceServers=[RTCIceServer(STUN_URL)] if STUN_URL else [])
+
+
+def ice_candidates(data):
+    """Candidates of a monitor_ice message, batched (``candidates``) or single."""
+    candidates = data.get("candidates") or [data.get("candidate")]
+    return [c for c in candidates if c and c.get("candidate")]
 
 
 class FacultyWebRTCManager(QObject):
+    # (student_id, QImage already scaled to the size set with set_target_size)
     frame_signal = pyqtSignal(int, object)
 
     def __init__(self, ws_client, frame_callback):
@@ -16,6 +42,25 @@ class FacultyWebRTCManager(QObject):
         self.frame_signal.connect(frame_callback)
         self.connections = {}
 
+        # Connections negotiated ahead of a click, student's track paused,
+        # least recently used first. Only touched on the GUI thread.
+        self.warm = OrderedDict()
+        self.viewing = set()
+        # Answered by the server's media relay: no paused track to keep warm
+        self.relayed = set()
+        self.opened_at = {}
+        self.first_frame_ms = {}
+        self.pending_ice = {}
+
+        # Decoded frames go through the mailbox; only the latest one per
+        # student is rendered, and the GUI paints at the display rate.
+        self.mailbox = FrameMailbox()
+        self.renderer = FrameRenderer(self.mailbox)
+        self.renderer.start()
+        self.paint_timer = QTimer(self)
+        self.paint_timer.setInterval(self._paint_interval())
+        self.paint_timer.timeout.connect(self._paint)
+
         self.ws_client.monitor_signal.connect(self._handle_signal_async)
 
         self.loop = asyncio.new_event_loop()
@@ -24,22 +69,96 @@ class FacultyWebRTCManager(QObject):
             daemon=True
         ).start()
 
+    @staticmethod
+    def _paint_interval():
+        screen = QGuiApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 0
+        if not rate or rate <= 0:
+            rate = MAX_PAINT_RATE
+        return max(1, round(1000 / min(rate, MAX_PAINT_RATE)))
+
+    def _paint(self):
+        for student_id, image in self.mailbox.take_images().items():
+            self.frame_signal.emit(student_id, image)
+
+    def set_target_size(self, student_id, width, height):
+        """Size of the widget showing this student's screen; frames are scaled to fit it."""
+        self.mailbox.set_target(student_id, width, height)
+
+    def frame_stats(self):
+        """Decoded, dropped and painted frame counts, and time to first frame (ms), per student."""
+        stats = self.mailbox.stats()
+        for student_id, ms in self.first_frame_ms.items():
+            stats.setdefault(student_id, {})["first_frame_ms"] = ms
+        return stats
+
     def _run_loop(self):
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
-    def start_monitoring(self, student_id):
-        if student_id in self.connections:
+    def prewarm(self, student_id, profile=MONITOR_PROFILE):
+        """
+        Negotiate a connection to a student before it is opened. The student
+        answers with its screen track paused, so an idle warm connection costs
+        no capture or encoding; ``start_monitoring`` then only has to resume it.
+        """
+        if student_id in self.viewing:
+            return
+        if student_id in self.warm:
+            self.warm.move_to_end(student_id)
+            return
+        while len(self.warm) >= MAX_WARM:
+            self.stop_monitoring(next(iter(self.warm)))
+        self.warm[student_id] = profile
+        asyncio.run_coroutine_threadsafe(
+            self._offer_async(student_id, profile, prewarm=True),
+            self.loop
+        )
+
+    def start_monitoring(self, student_id, profile=MONITOR_PROFILE):
+        if student_id in self.viewing:
             print(f"Already monitoring student {student_id}")
             return
 
+        self.viewing.add(student_id)
+        self.opened_at[student_id] = time.perf_counter()
+        if not self.paint_timer.isActive():
+            self.paint_timer.start()
+
+        warm = self.warm.pop(student_id, None) == profile
         asyncio.run_coroutine_threadsafe(
-            self._offer_async(student_id),
+            self._open_async(student_id, profile, warm),
             self.loop
         )
 
-    async def _offer_async(self, student_id):
-        pc = RTCPeerConnection()
+    def park(self, student_id):
+        """Stop showing a student but keep the connection warm (track paused) for a quick reopen."""
+        if student_id not in self.viewing:
+            return
+        if student_id in self.relayed:
+            self.stop_monitoring(student_id)
+            return
+        self.viewing.discard(student_id)
+        self.opened_at.pop(student_id, None)
+        while len(self.warm) >= MAX_WARM:
+            self.stop_monitoring(next(iter(self.warm)))
+        self.warm[student_id] = MONITOR_PROFILE
+        self.ws_client.send_json({"type": "monitor_pause", "student_id": student_id})
+        self._release(student_id)
+
+    async def _open_async(self, student_id, profile, warm):
+        pc = self.connections.get(student_id)
+        if pc is not None:
+            if warm and pc.signalingState == "stable" and pc.connectionState not in ("failed", "closed"):
+                self.ws_client.send_json({"type": "monitor_resume", "student_id": student_id})
+                return
+            # Never answered (or a different profile): negotiate from scratch
+            self.connections.pop(student_id, None)
+            await pc.close()
+        await self._offer_async(student_id, profile)
+
+    async def _offer_async(self, student_id, profile, prewarm=False):
+        pc = RTCPeerConnection(rtc_configuration())
         pc.addTransceiver("video", direction="recvonly")
         self.connections[student_id] = pc
 
@@ -62,14 +181,10 @@ class FacultyWebRTCManager(QObject):
         @pc.on("icecandidate")
         async def on_icecandidate(candidate):
             if candidate:
-                self.ws_client.send_json({
-                    "type": "monitor_ice",
-                    "student_id": student_id,
-                    "candidate": {
-                        "candidate": candidate.to_sdp(),
-                        "sdpMid": candidate.sdpMid,
-                        "sdpMLineIndex": candidate.sdpMLineIndex,
-                    }
+                self._queue_ice(student_id, {
+                    "candidate": candidate.to_sdp(),
+                    "sdpMid": candidate.sdpMid,
+                    "sdpMLineIndex": candidate.sdpMLineIndex,
                 })
 
         offer = await pc.createOffer()
@@ -78,12 +193,30 @@ class FacultyWebRTCManager(QObject):
         self.ws_client.send_json({
             "type": "monitor_offer",
             "student_id": student_id,
+            "profile": profile,
+            "prewarm": prewarm,
             "offer": {
                 "sdp": pc.localDescription.sdp,
                 "type": pc.localDescription.type
             }
         })
 
+    def _queue_ice(self, student_id, candidate):
+        """Collect trickled candidates and send them as one monitor_ice message."""
+        pending = self.pending_ice.setdefault(student_id, [])
+        pending.append(candidate)
+        if len(pending) == 1:
+            self.loop.call_later(ICE_BATCH_DELAY, self._flush_ice, student_id)
+
+    def _flush_ice(self, student_id):
+        candidates = self.pending_ice.pop(student_id, None)
+        if candidates:
+            self.ws_client.send_json({
+                "type": "monitor_ice",
+                "student_id": student_id,
+                "candidates": candidates
+            })
+
     def _handle_signal_async(self, data):
         asyncio.run_coroutine_threadsafe(
             self.__handle_signal(data),
@@ -111,58 +244,73 @@ class FacultyWebRTCManager(QObject):
                     type=answer["type"]
                 )
             )
+            if data.get("relay"):
+                self.relayed.add(student_id)
             print(f"[Student {student_id}] Remote description set (answer)")
 
         elif msg_type == "monitor_ice":
-            candidate = data.get("candidate")
-            if not candidate or not candidate.get("candidate"):
-                return  # ignore empty end-of-candidates signal
-            try:
-                await pc.addIceCandidate(
-                    RTCIceCandidate(
-                        sdpMid=candidate["sdpMid"],
-                        sdpMLineIndex=candidate["sdpMLineIndex"],
-                        candidate=candidate["candidate"]
+            for candidate in ice_candidates(data):
+                try:
+                    await pc.addIceCandidate(
+                        RTCIceCandidate(
+                            sdpMid=candidate["sdpMid"],
+                            sdpMLineIndex=candidate["sdpMLineIndex"],
+                            candidate=candidate["candidate"]
+                        )
                     )
-                )
-            except Exception as e:
-                print(f"[ICE] Failed to add candidate: {e}")
+                except Exception as e:
+                    print(f"[ICE] Failed to add candidate: {e}")
 
     async def _consume_video(self, track, student_id):
         print(f"[Student {student_id}] Starting video consumption loop")
         while True:
             try:
                 frame = await track.recv()
-                img = frame.to_ndarray(format="bgr24")
-                self.frame_signal.emit(student_id, img)
             except Exception as e:
                 print(f"[Student {student_id}] Video stream ended: {e}")
                 break
+            opened = self.opened_at.pop(student_id, None)
+            if opened is not None:
+                self.first_frame_ms[student_id] = round((time.perf_counter() - opened) * 1000)
+                print(f"[Student {student_id}] First frame after {self.first_frame_ms[student_id]} ms")
+            self.mailbox.put(student_id, frame)
+        print(f"[Student {student_id}] Frames: {self.mailbox.stats().get(student_id)}")
 
     def stop_monitoring(self, student_id):
-        pc = self.connections.get(student_id)
-        if not pc:
-            return
-
-        self.ws_client.send_json({
-            "type": "monitor_stop",
-            "student_id": student_id
-        })
-
+        self.warm.pop(student_id, None)
+        self.viewing.discard(student_id)
+        self.opened_at.pop(student_id, None)
         asyncio.run_coroutine_threadsafe(
-            pc.close(),
+            self._close_async(student_id, notify=True),
             self.loop
         )
-
-        del self.connections[student_id]
+        self._release(student_id)
         print(f"Stopped monitoring student {student_id}")
 
     def cleanup_connection(self, student_id):
-        pc = self.connections.get(student_id)
-        if pc:
-            asyncio.run_coroutine_threadsafe(
-                pc.close(),
-                self.loop
-            )
-            del self.connections[student_id]
-            print(f"Cleaned up connection for student {student_id}")
\ No newline at end of file
+        self.warm.pop(student_id, None)
+        self.viewing.discard(student_id)
+        self.opened_at.pop(student_id, None)
+        asyncio.run_coroutine_threadsafe(
+            self._close_async(student_id, notify=False),
+            self.loop
+        )
+        self._release(student_id)
+        print(f"Cleaned up connection for student {student_id}")
+
+    async def _close_async(self, student_id, notify):
+        self.relayed.discard(student_id)
+        pc = self.connections.pop(student_id, None)
+        if pc is None:
+            return
+        if notify:
+            self.ws_client.send_json({
+                "type": "monitor_stop",
+                "student_id": student_id
+            })
+        await pc.close()
+
+    def _release(self, student_id):
+        self.mailbox.forget(student_id)
+        if not self.viewing:
+            self.paint_timer.stop()
@@ -0,0 +1,123 @@
+"""
+Monitor socket client: subprotocol fallback against an older backend,
+shared batch subscriptions and the cached batch view.
+
+Run from lab/: ``python -m unittest``
+"""
+import base64
+import hashlib
+import socket
+import threading
+import unittest
+
+from ui.common.websocket_client import FacultyWebSocketClient
+
+
+def serve_handshakes(responses):
+    """
+    Answer one WebSocket handshake per item of ``responses`` and close it:
+    ``'legacy'`` accepts without choosing a subprotocol (a backend that
+    predates negotiation), ``'forbidden'`` refuses with 403. Returns (url,
+    offers): the Sec-WebSocket-Protocol header of each request, or None when
+    the client offered none.
+    """
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    offers = []
+
+    def run():
+        for response in responses:
+            conn, _ = listener.accept()
+            with conn:
+                request = b''
+                while b'\r\n\r\n' not in request:
+                    request += conn.recv(4096)
+                headers = dict(
+                    line.split(': ', 1) for line in request.decode().split('\r\n')[1:] if ': ' in line
+                )
+                offers.append(headers.get('Sec-WebSocket-Protocol'))
+                if response == 'forbidden':
+                    conn.sendall(b'HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n')
+                    continue
+                accept = base64.b64encode(hashlib.sha1(
+                    (headers['Sec-WebSocket-Key'] + '258EAFA5-E914-47DA-95CA-C5AB0DC85B11').encode()
+                ).digest()).decode()
+                conn.sendall((
+                    'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                    f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+                ).encode() + b'\x88\x00')
+        listener.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    return f'ws://127.0.0.1:{listener.getsockname()[1]}/ws/monitor/', offers
+
+
+class SubprotocolFallbackTests(unittest.TestCase):
+    def test_falls_back_to_json_after_a_rejected_offer(self):
+        url, offers = serve_handshakes(['legacy', 'legacy'])
+        client = FacultyWebSocketClient(None, 'token')
+
+        client._connect(url)
+        self.assertFalse(client.opened)
+        self.assertFalse(client.use_subprotocols)
+
+        client._connect(url)
+        self.assertTrue(client.opened)
+        self.assertIsNotNone(offers[0])
+        self.assertIsNone(offers[1])
+
+    def test_refused_handshake_keeps_the_offer(self):
+        url, offers = serve_handshakes(['forbidden', 'forbidden'])
+        client = FacultyWebSocketClient(None, 'token')
+
+        client._connect(url)
+        client._connect(url)
+        self.assertTrue(client.use_subprotocols)
+        self.assertEqual(len(offers), 2)
+        self.assertIsNotNone(offers[1])
+
+
+class SubscriptionTests(unittest.TestCase):
+    def test_batch_is_followed_until_its_last_screen_leaves(self):
+        client = FacultyWebSocketClient(None, 'token')
+        client.connected = True
+        sent = []
+        client.send_json = sent.append
+
+        client.subscribe(1)  # dashboard
+        client.subscribe(1)  # viva screen, same batch
+        client.subscribe(2)  # live monitor
+        client.unsubscribe(1)
+        self.assertEqual(client.subscriptions, {1: 1, 2: 1})
+
+        client.unsubscribe(1)
+        client.unsubscribe(1)
+        self.assertEqual(sent, [
+            {'type': 'subscribe', 'batch_id': 1},
+            {'type': 'subscribe', 'batch_id': 2},
+            {'type': 'unsubscribe', 'batch_id': 1},
+        ])
+
+
+class BatchViewTests(unittest.TestCase):
+    def test_status_batch_is_folded_into_the_cached_snapshot(self):
+        client = FacultyWebSocketClient(None, 'token')
+        snapshots = []
+        client.snapshot_signal.connect(snapshots.append)
+
+        client.on_message(None, '{"type": "initial_load", "batch_id": 1, "version": 3, "students": ['
+                                '{"id": 7, "status": "offline", "current_mode": null, "last_seen": null}]}')
+        client.on_message(None, '{"type": "status_batch", "batch_id": 1, "version": 4, "students": ['
+                                '{"student_id": 7, "status": "online", "mode": "exam", "last_seen": "t"}, '
+                                '{"student_id": 8, "status": "online"}]}')
+
+        self.assertEqual([s['full'] for s in snapshots], [True, False])
+        self.assertEqual(snapshots[-1]['version'], 4)
+        self.assertEqual(snapshots[-1]['students'], [
+            {'id': 7, 'status': 'online', 'current_mode': 'exam', 'last_seen': 't'},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
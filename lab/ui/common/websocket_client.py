@@ -1,27 +1,72 @@
 import websocket
+import base64
 import json
 import threading
 import time
 from PyQt6.QtCore import QThread, pyqtSignal
 from config import BASE_WS
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 # WS_URL should match your backend routing
 WS_URL = f"{BASE_WS}/ws/monitor/"
+
+# Binary msgpack frames when available; the server falls back to JSON otherwise
+MSGPACK_SUBPROTOCOL = "smartlab.msgpack"
+JSON_SUBPROTOCOL = "smartlab.json"
+
+# Every this many messages the client tells the server how many it has handled;
+# the server's send window (WS_SEND_WINDOW) must be larger
+ACK_EVERY = 16
+
+
+def rejected_subprotocol(error):
+    """
+    Whether a failed handshake is the server's 101 response failing
+    websocket-client's checks, which is how a backend that ignores the
+    subprotocol offer shows up. A 403 or timeout raises a subclass, and
+    network errors are not WebSocketException at all.
+    """
+    return type(error) is websocket.WebSocketException and str(error) == "Invalid WebSocket Header"
+
+
 # Generic signal for all events
 
 class FacultyWebSocketClient(QThread):
-    student_status_signal = pyqtSignal(dict)  # Signal for student online/offline
+    """
+    One multiplexed monitor socket (``ws/monitor/``) for every batch the
+    faculty is looking at. Screens call ``subscribe``/``unsubscribe`` in pairs;
+    a batch is followed while any screen is subscribed to it. Events and
+    snapshots carry ``batch_id``.
+    """
     monitor_signal = pyqtSignal(dict)  # Signal for all monitor events
+    snapshot_signal = pyqtSignal(dict)  # Full batch view after initial_load / batch_delta / status_batch
+    status_batch_signal = pyqtSignal(dict)  # Coalesced status changes, applied in one UI update
+    thumbnail_signal = pyqtSignal(dict)  # Latest screen thumbnail of a student (JPEG bytes in 'data')
+    report_job_signal = pyqtSignal(dict)  # Progress / completion of a PDF report this faculty queued
 
     def __init__(self, batch_id, token):
         super().__init__()
-        self.batch_id = batch_id
         self.token = token
         self.ws = None
         self.is_running = True
         self.reconnect_delay = 5
 
         self.connected = False
+        self.use_subprotocols = True  # Cleared if the server predates subprotocol negotiation
+        self.subprotocol = None
+        self.opened = False  # Whether the current connection attempt got past the handshake
+        self.received = 0  # Messages on the current connection, acked every ACK_EVERY
+
+        # Subscriber count per batch, and the last snapshot seen per batch;
+        # the version is sent back on (re)subscribe to get only deltas
+        self.subscriptions = {}
+        self.batches = {}
+        if batch_id is not None:
+            self.subscriptions[batch_id] = 1
 
     def run(self):
         """Main thread loop"""
@@ -31,34 +76,95 @@ class FacultyWebSocketClient(QThread):
                     print("No token provided for WebSocket")
                     break
                     
-                url = f"{WS_URL}{self.batch_id}/?token={self.token}"
-                
-                self.ws = websocket.WebSocketApp(
-                    url,
-                    on_open=self.on_open,
-                    on_message=self.on_message,
-                    on_error=self.on_error,
-                    on_close=self.on_close
-                )
+                url = f"{WS_URL}?token={self.token}"
                 
-                # Run forever (blocks until close)
-                self.ws.run_forever()
+                self._connect(url)
                 
             except Exception as e:
                 print(f"WebSocket Error: {e}")
             
+            self.connected = False
             # Reconnect delay
             if self.is_running:
                 time.sleep(self.reconnect_delay)
 
+    def _connect(self, url):
+        """One connection attempt; blocks until the socket closes."""
+        self.opened = False
+        self.ws = websocket.WebSocketApp(
+            url,
+            on_open=self.on_open,
+            on_message=self.on_message,
+            on_error=self.on_error,
+            on_close=self.on_close,
+            subprotocols=self._offered_subprotocols()
+        )
+        self.ws.run_forever()
+
+    def _offered_subprotocols(self):
+        if not self.use_subprotocols:
+            return None
+        if msgpack is not None:
+            return [MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL]
+        return [JSON_SUBPROTOCOL]
+
     def on_open(self, ws):
-        print(f"WebSocket Connected to batch {self.batch_id}")
+        self.opened = True
+        self.received = 0
+        self.subprotocol = ws.sock.getsubprotocol() if ws.sock else None
+        print(f"WebSocket Connected ({self.subprotocol or 'json'})")
         self.connected = True
+        for batch_id in list(self.subscriptions):
+            self._send_subscribe(batch_id)
+
+    def subscribe(self, batch_id):
+        """Follow a batch on this socket; a cached view is shown right away."""
+        cached = self.batches.get(batch_id)
+        if cached is not None:
+            self._emit_snapshot(batch_id, full=True)
+        count = self.subscriptions.get(batch_id, 0)
+        self.subscriptions[batch_id] = count + 1
+        if count == 0 and self.connected:
+            self._send_subscribe(batch_id)
+
+    def unsubscribe(self, batch_id):
+        """Drop one subscriber; the last one stops the batch's events. Its last snapshot stays cached."""
+        count = self.subscriptions.get(batch_id, 0)
+        if count > 1:
+            self.subscriptions[batch_id] = count - 1
+            return
+        if count == 0:
+            return
+        del self.subscriptions[batch_id]
+        if self.connected:
+            self.send_json({'type': 'unsubscribe', 'batch_id': batch_id})
+
+    def start_thumbnails(self, batch_id):
+        """Ask a batch's students for thumbnails; repeat while the wall is open to keep the lease."""
+        self.send_json({'type': 'thumbnails_start', 'batch_id': batch_id})
+
+    def stop_thumbnails(self, batch_id):
+        self.send_json({'type': 'thumbnails_stop', 'batch_id': batch_id})
+
+    def _send_subscribe(self, batch_id):
+        message = {'type': 'subscribe', 'batch_id': batch_id}
+        cached = self.batches.get(batch_id)
+        if cached is not None and cached['version'] is not None:
+            message['since'] = cached['version']
+        self.send_json(message)
+
+    def decode(self, message):
+        if isinstance(message, bytes):
+            return msgpack.unpackb(message, raw=False)
+        return json.loads(message)
 
     def send_json(self, data):
         if self.ws and self.connected:
             try:
-                self.ws.send(json.dumps(data))
+                if self.subprotocol == MSGPACK_SUBPROTOCOL:
+                    self.ws.send(msgpack.packb(data, use_bin_type=True), opcode=websocket.ABNF.OPCODE_BINARY)
+                else:
+                    self.ws.send(json.dumps(data))
             except Exception as e:
                 print(f"Error sending message: {e}")
         else:
@@ -66,32 +172,116 @@ class FacultyWebSocketClient(QThread):
 
     def on_message(self, ws, message):
         """Handle incoming messages"""
+        self.received += 1
+        if self.received % ACK_EVERY == 0:
+            self.send_json({'type': 'ack', 'received': self.received})
         try:
-            data = json.loads(message)
+            data = self.decode(message)
             event_type = data.get('type')
             
+            if event_type == 'thumbnail':
+                if isinstance(data.get('data'), str):
+                    data['data'] = base64.b64decode(data['data'])
+                self.thumbnail_signal.emit(data)
+                return
+
+            if event_type == 'report_job':
+                self.report_job_signal.emit(data)
+                return
+
             print("Faculty received message:", data)
 
-            if event_type == 'student_status':
-                self.student_status_signal.emit(data)
-            elif event_type == 'status_broadcast':
-                # Handle generic status broadcast if used
-                self.student_status_signal.emit(data)
+            batch_id = data.get('batch_id')
+            if event_type in ['initial_load', 'batch_delta']:
+                self._apply_snapshot(batch_id, data)
+                return
+
+            if data.get('version') is not None and batch_id in self.batches:
+                self.batches[batch_id]['version'] = data['version']
+
+            if event_type == 'status_batch':
+                self._apply_status_batch(batch_id, data)
             elif event_type in ['monitor_answer', 'monitor_ice']:
                 self.monitor_signal.emit(data)
-        except json.JSONDecodeError:
+        except ValueError:
             pass
 
+    def _apply_snapshot(self, batch_id, data):
+        """Merge a full snapshot or delta into the local view of a batch."""
+        cached = self.batches.setdefault(batch_id, {'version': None, 'students': {}})
+        if data.get('type') == 'initial_load':
+            cached['students'] = {}
+        for student in data.get('students', []):
+            cached['students'][student['id']] = student
+
+        cached['version'] = data.get('version')
+        self._emit_snapshot(batch_id, full=data.get('type') == 'initial_load')
+
+    def _apply_status_batch(self, batch_id, data):
+        """Fold a status_batch (latest state per changed student) into the batch view."""
+        cached = self.batches.get(batch_id)
+        students = cached['students'] if cached else {}
+        for change in data.get('students', []):
+            row = students.get(change.get('student_id'))
+            if row is None:
+                continue
+            row['status'] = change.get('status', row.get('status'))
+            row['current_mode'] = change.get('mode') or row.get('current_mode')
+            row['last_seen'] = change.get('last_seen') or row.get('last_seen')
+
+        self.status_batch_signal.emit(data)
+        if students:
+            self._emit_snapshot(batch_id, full=False)
+
+    def _emit_snapshot(self, batch_id, full):
+        cached = self.batches[batch_id]
+        self.snapshot_signal.emit({
+            'batch_id': batch_id,
+            'version': cached['version'],
+            'full': full,
+            'students': list(cached['students'].values()),
+        })
+
     def on_error(self, ws, error):
         print(f"WebSocket Error: {error}")
+        if self.use_subprotocols and not self.opened and rejected_subprotocol(error):
+            # An older backend accepts without choosing a subprotocol: retry
+            # with plain JSON and no offer
+            self.use_subprotocols = False
 
     def on_close(self, ws, close_status_code, close_msg):
         print("WebSocket Closed")
 
     def stop(self):
         """Stop the client"""
+        global _shared_client
         self.is_running = False
         if self.ws:
             self.ws.close()
         self.quit()
         self.wait()
+        if _shared_client is self:
+            _shared_client = None
+
+
+_shared_client = None
+
+
+def shared_monitor_client(token):
+    """
+    The app-wide monitor socket, started on first use. Screens share it and
+    only subscribe to the batches they show.
+    """
+    global _shared_client
+    if _shared_client is not None and _shared_client.token != token:
+        _shared_client.stop()
+    if _shared_client is None:
+        _shared_client = FacultyWebSocketClient(None, token)
+        _shared_client.start()
+    return _shared_client
+
+
+
+def stop_shared_monitor_client():
+    if _shared_client is not None:
+        _shared_client.stop()
@@ -174,7 +174,8 @@ class BatchDashboardScreen(QWidget):
         self.current_session_id = None
         self.session_active = False
         self.ws_client = None
-        
+        self.subscribed_batch = None  # Batch this screen holds a subscription to
+
         self.main_layout = QVBoxLayout(self)
         self.main_layout.setContentsMargins(24, 24, 24, 24)
         self.main_layout.setSpacing(20)
@@ -371,10 +372,6 @@ class BatchDashboardScreen(QWidget):
                 self.parent_window.current_batch_id is None:
             return
 
-        if self.ws_client:
-            self.ws_client.stop()
-            self.ws_client = None
-
         batch_id = self.parent_window.current_batch_id
         token    = api_client.access_token
 
@@ -382,29 +379,34 @@ class BatchDashboardScreen(QWidget):
             print("Cannot start WebSocket: No access token")
             return
 
-        from ui.common.websocket_client import FacultyWebSocketClient
-        self.ws_client = FacultyWebSocketClient(batch_id, token)
-        self.ws_client.student_status_signal.connect(self.handle_student_status)
-        self.ws_client.start()
-
-    def handle_student_status(self, data):
-        print(f"Live Update: {data}")
-        status = data.get('status')
-        try:
-            online  = int(self.online_card.value_label.text())
-            offline = int(self.offline_card.value_label.text())
-
-            if status == 'online':
-                online  += 1
-                offline  = max(0, offline - 1)
-            elif status == 'offline':
-                online   = max(0, online - 1)
-                offline += 1
+        # One shared socket: switching batches is a subscribe, not a reconnect
+        from ui.common.websocket_client import shared_monitor_client
+        client = shared_monitor_client(token)
+        if client is not self.ws_client:
+            self.ws_client = client
+            self.ws_client.snapshot_signal.connect(self.handle_snapshot)
+            self.subscribed_batch = None
+
+        if self.subscribed_batch != batch_id:
+            if self.subscribed_batch is not None:
+                self.ws_client.unsubscribe(self.subscribed_batch)
+            self.ws_client.subscribe(batch_id)
+            self.subscribed_batch = batch_id
+
+    def _is_current_batch(self, data):
+        batch_id = data.get('batch_id')
+        return batch_id is None or batch_id == getattr(self.parent_window, 'current_batch_id', None)
+
+    def handle_snapshot(self, data):
+        """Recount online/offline from the socket's batch snapshot."""
+        if not self._is_current_batch(data):
+            return
+        students = data.get('students', [])
+        online   = sum(1 for s in students if s.get('status') == 'online')
 
-            self.online_card.update_value(str(online))
-            self.offline_card.update_value(str(offline))
-        except ValueError:
-            pass
+        self.total_pcs_card.update_value(str(len(students)))
+        self.online_card.update_value(str(online))
+        self.offline_card.update_value(str(len(students) - online))
 
     # ── Stats ─────────────────────────────────────────────────
 
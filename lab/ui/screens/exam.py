@@ -5,7 +5,7 @@ from PyQt6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QLineEdit,
     QTextEdit, QComboBox, QSpinBox, QFrame,
     QSplitter, QScrollArea, QDialog, QDialogButtonBox,
-    QFormLayout, QStackedWidget, QAbstractItemView
+    QFormLayout, QStackedWidget, QAbstractItemView, QCheckBox
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QColor, QBrush, QDesktopServices
@@ -80,8 +80,10 @@ class CreateExamDialog(QDialog):
         self.duration_spin.setRange(10, 480)
         self.duration_spin.setValue(120)
         self.duration_spin.setSuffix(" min")
+        self.record_check = QCheckBox("Keep a rolling recording of student screens")
         form.addRow("Title:", self.title_input)
         form.addRow("Duration:", self.duration_spin)
+        form.addRow("Recording:", self.record_check)
         layout.addLayout(form)
 
         # ✅ Styled footer buttons
@@ -125,6 +127,7 @@ class CreateExamDialog(QDialog):
         return {
             "title": self.title_input.text().strip(),
             "duration_minutes": self.duration_spin.value(),
+            "record_screens": self.record_check.isChecked(),
         }
 
 
@@ -1,16 +1,21 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QGridLayout, QFrame, QHBoxLayout, QPushButton, QComboBox, QScrollArea
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont,QImage, QPixmap
+from PyQt6.QtCore import Qt, QTimer, QEvent
+from PyQt6.QtGui import QFont, QPixmap
 
 from ui.theme import heading_font, Theme, body_font
 from ui.common.cards import CardFrame
 from ui.common.badges import StatusDot, ModeBadge
 from api.global_client import api_client
 from monitor.webrtc_manager import FacultyWebRTCManager
+from ui.common.websocket_client import shared_monitor_client
 class LiveMonitorScreen(QWidget):
     COLUMNS = 3
     VISIBLE_ROWS = 2
     TILE_HEIGHT = 300
+    # Thumbnail requests are leases; renew well before the server's 30s
+    THUMBNAIL_KEEPALIVE_MS = 10000
+    # Hovering a tile this long pre-negotiates its stream so View opens at once
+    PREWARM_HOVER_MS = 150
 
     def __init__(self):
         super().__init__()
@@ -20,6 +25,14 @@ class LiveMonitorScreen(QWidget):
 
         self.video_labels = {}
         self.webrtc_manager = None
+        self.ws_client = None
+        self.thumbnail_batch_id = None
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.timeout.connect(self._renew_thumbnails)
+        self.hovered_student_id = None
+        self.prewarm_timer = QTimer(self)
+        self.prewarm_timer.setSingleShot(True)
+        self.prewarm_timer.timeout.connect(self._prewarm_hovered)
 
         # Header with view selector
         header = QHBoxLayout()
@@ -77,23 +90,60 @@ class LiveMonitorScreen(QWidget):
         root.addWidget(grid_card)
         root.addStretch(1)
 
-    def update_video_frame(self, student_id, frame):
+    def update_video_frame(self, student_id, image):
+        """Paint a frame the WebRTC manager already scaled to the tile size."""
         if student_id not in self.video_labels:
             return
 
-        height, width, channel = frame.shape
-        bytes_per_line = channel * width
-        qt_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
-        pixmap = QPixmap.fromImage(qt_img)
+        self.video_labels[student_id].setPixmap(QPixmap.fromImage(image))
 
-        self.video_labels[student_id].setPixmap(
+    def update_thumbnail(self, data):
+        """Show a student's latest screen thumbnail in their grid tile."""
+        label = self.video_labels.get(data.get('student_id'))
+        if label is None or data.get('batch_id') not in (None, self.thumbnail_batch_id):
+            return
+
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(data.get('data') or b''):
+            return
+        label.setPixmap(
             pixmap.scaled(
-                self.video_labels[student_id].size(),
+                label.size(),
                 Qt.AspectRatioMode.KeepAspectRatio,
                 Qt.TransformationMode.SmoothTransformation
             )
         )
 
+    def start_thumbnails(self, batch_id):
+        token = api_client.access_token
+        if not token:
+            return
+        if self.ws_client is None:
+            self.ws_client = shared_monitor_client(token)
+            self.ws_client.thumbnail_signal.connect(self.update_thumbnail)
+        if self.thumbnail_batch_id != batch_id:
+            if self.thumbnail_batch_id is not None:
+                self.ws_client.unsubscribe(self.thumbnail_batch_id)
+            self.ws_client.subscribe(batch_id)
+            self.thumbnail_batch_id = batch_id
+        self._renew_thumbnails()
+        self.thumbnail_timer.start(self.THUMBNAIL_KEEPALIVE_MS)
+
+    def _renew_thumbnails(self):
+        if self.ws_client and self.ws_client.connected and self.thumbnail_batch_id is not None:
+            self.ws_client.start_thumbnails(self.thumbnail_batch_id)
+
+    def stop_thumbnails(self):
+        self.thumbnail_timer.stop()
+        if self.ws_client:
+            if self.thumbnail_batch_id is not None:
+                if self.ws_client.connected:
+                    self.ws_client.stop_thumbnails(self.thumbnail_batch_id)
+                self.ws_client.unsubscribe(self.thumbnail_batch_id)
+            self.ws_client.thumbnail_signal.disconnect(self.update_thumbnail)
+            self.ws_client = None
+        self.thumbnail_batch_id = None
+
     def _tile(self, student: dict):
         student_db_id = student.get("id")
         name = student.get("name", "Unknown")
@@ -118,6 +168,8 @@ class LiveMonitorScreen(QWidget):
         )
         frame.setCursor(Qt.CursorShape.PointingHandCursor)
         frame.setFixedHeight(self.TILE_HEIGHT)
+        frame.setProperty("student_db_id", student_db_id)
+        frame.installEventFilter(self)
         
         layout = QVBoxLayout(frame)
         layout.setContentsMargins(16, 16, 16, 16)
@@ -197,23 +249,44 @@ class LiveMonitorScreen(QWidget):
     def set_websocket_client(self, ws_client):
         self.websocket_client = ws_client
     
-    def start_monitor(self, student: dict):
-        """Open single-student view. Accepts the full student dict."""
-        student_id = student.get("id")
-
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Enter and obj.property("student_db_id") is not None:
+            self.hovered_student_id = obj.property("student_db_id")
+            self.prewarm_timer.start(self.PREWARM_HOVER_MS)
+        elif event.type() == QEvent.Type.Leave and obj.property("student_db_id") == self.hovered_student_id:
+            self.hovered_student_id = None
+            self.prewarm_timer.stop()
+        return super().eventFilter(obj, event)
+
+    def _prewarm_hovered(self):
+        manager = self._webrtc_manager()
+        if manager is not None and self.hovered_student_id is not None:
+            manager.prewarm(self.hovered_student_id)
+
+    def _webrtc_manager(self):
+        """The main window's WebRTC manager, created on first use; None without a monitor socket."""
         main_window = self.window()
 
         ws_client = main_window.dashboard_screen.ws_client
 
         if not ws_client or not ws_client.connected:
             print("WebSocket client not available")
-            return
+            return None
 
         if not hasattr(main_window, "webrtc_manager"):
             main_window.webrtc_manager = FacultyWebRTCManager(
                 ws_client,
                 main_window.single_student_screen.update_video_frame
             )
+        return main_window.webrtc_manager
+
+    def start_monitor(self, student: dict):
+        """Open single-student view. Accepts the full student dict."""
+        student_id = student.get("id")
+
+        main_window = self.window()
+        if self._webrtc_manager() is None:
+            return
 
         # Populate the single-student screen with real data BEFORE switching
         single_screen = main_window.single_student_screen
@@ -228,6 +301,10 @@ class LiveMonitorScreen(QWidget):
         super().showEvent(event)
         self.load_students()
 
+    def hideEvent(self, event):
+        self.stop_thumbnails()
+        super().hideEvent(event)
+
 
     def load_students(self):
     # Get batch_id from parent main window
@@ -246,11 +323,13 @@ class LiveMonitorScreen(QWidget):
 
         self.students_data = result["data"]
         self._rebuild_grid()
+        self.start_thumbnails(batch_id)
 
         print("Batch ID:", main_window.current_batch_id)
     
     def _rebuild_grid(self):
     # Clear old tiles
+        self.video_labels = {}
         while self.grid_layout.count():
             item = self.grid_layout.takeAt(0)
             if item.widget():
@@ -3,7 +3,7 @@ from PyQt6.QtWidgets import (
     QHBoxLayout, QPushButton, QFileDialog, QFrame, QMessageBox,
     QComboBox, QGridLayout
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont, QColor
 from PyQt6.QtWidgets import QHeaderView
 
@@ -20,6 +20,13 @@ class ReportsScreen(QWidget):
         self.parent_window = parent
         self.attendance_data = []
         self.semester_map = {}
+        # PDF report jobs waiting to finish: job id -> (save path, message when ready)
+        self.pending_reports = {}
+        self.report_ws = None
+        # Fallback for report_job events missed while the monitor socket is down
+        self.report_poll = QTimer(self)
+        self.report_poll.setInterval(5000)
+        self.report_poll.timeout.connect(self._poll_reports)
         root = QVBoxLayout(self)
         root.setContentsMargins(24, 24, 24, 24)
         root.setSpacing(20)
@@ -587,6 +594,10 @@ class ReportsScreen(QWidget):
         desc.setWordWrap(True)
         top_row.addWidget(desc, 1)
 
+        self.report_status_label = QLabel("")
+        self.report_status_label.setStyleSheet(f"color: {Theme.text_muted}; font-size: 12px;")
+        top_row.addWidget(self.report_status_label)
+
         self.batch_report_btn = QPushButton("📄 Generate Full Batch Report")
         self.batch_report_btn.setStyleSheet(self._btn(Theme.primary, "#1565C0"))
         self.batch_report_btn.setFixedHeight(40)
@@ -696,31 +707,7 @@ class ReportsScreen(QWidget):
         if not save_path.lower().endswith(".pdf"):
             save_path += ".pdf"
 
-        result = api_client.download_student_submission_report_pdf_to_path(student_id, save_path)
-
-        if not result["success"]:
-            error(
-                self,
-                "Download Failed",
-                f"Could not generate student PDF report:\n{result['error']}"
-            )
-            return
-
-        open_result = api_client.open_pdf_in_browser(result["path"])
-        if not open_result["success"]:
-            warning(
-                self,
-                "PDF Saved",
-                f"PDF was saved here:\n{result['path']}\n\n"
-                f"But it could not be opened in the browser:\n{open_result['error']}"
-            )
-        else:
-            info(
-                self,
-                "Report Ready",
-                f"Student report for {student_name} opened in browser.\n\n"
-                f"Saved to:\n{result['path']}"
-            )
+        self._queue_report("student", student_id, save_path, f"Student report for {student_name}")
 
     def generate_full_batch_report(self):
         if not hasattr(self.parent_window, 'current_batch_id') or self.parent_window.current_batch_id is None:
@@ -743,17 +730,61 @@ class ReportsScreen(QWidget):
         if not save_path.lower().endswith(".pdf"):
             save_path += ".pdf"
 
-        result = api_client.download_batch_submission_report_pdf_to_path(
-            self.parent_window.current_batch_id,
-            save_path
-        )
+        self._queue_report("batch", self.parent_window.current_batch_id, save_path, "Full batch report")
 
+    def _queue_report(self, kind, object_id, save_path, title):
+        """Ask the backend for a report; it is downloaded when its report_job says done."""
+        result = api_client.request_report(kind, object_id)
         if not result["success"]:
-            error(
-                self,
-                "Download Failed",
-                f"Could not generate full batch PDF report:\n{result['error']}"
-            )
+            error(self, "Report Failed", f"Could not generate PDF report:\n{result['error']}")
+            return
+
+        job = result["data"]
+        self.pending_reports[job["id"]] = (save_path, title)
+        self._listen_for_reports()
+        self.handle_report_job(job)
+
+    def _listen_for_reports(self):
+        token = api_client.access_token
+        if token:
+            from ui.common.websocket_client import shared_monitor_client
+            client = shared_monitor_client(token)
+            if client is not self.report_ws:
+                self.report_ws = client
+                self.report_ws.report_job_signal.connect(self.handle_report_job)
+        if not self.report_poll.isActive():
+            self.report_poll.start()
+
+    def _poll_reports(self):
+        for job_id in list(self.pending_reports):
+            result = api_client.get_report_job(job_id)
+            if result["success"]:
+                self.handle_report_job(result["data"])
+
+    def handle_report_job(self, job):
+        job_id = job.get("id")
+        if job_id not in self.pending_reports:
+            return
+
+        status = job.get("status")
+        if status in ("queued", "running"):
+            pages = job.get("pages")
+            text = f"Generating report… {int((job.get('progress') or 0) * 100)}%"
+            self.report_status_label.setText(f"{text} ({pages} pages)" if pages else text)
+            return
+
+        save_path, title = self.pending_reports.pop(job_id)
+        if not self.pending_reports:
+            self.report_poll.stop()
+            self.report_status_label.setText("")
+
+        if status == "failed":
+            error(self, "Report Failed", f"Could not generate PDF report:\n{job.get('error')}")
+            return
+
+        result = api_client.download_report_job_pdf_to_path(job_id, save_path)
+        if not result["success"]:
+            error(self, "Download Failed", f"Could not download PDF report:\n{result['error']}")
             return
 
         open_result = api_client.open_pdf_in_browser(result["path"])
@@ -768,7 +799,7 @@ class ReportsScreen(QWidget):
             info(
                 self,
                 "Report Ready",
-                f"Full batch report opened in browser.\n\n"
+                f"{title} opened in browser.\n\n"
                 f"Saved to:\n{result['path']}"
             )
 
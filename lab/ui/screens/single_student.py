@@ -1,6 +1,6 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QHBoxLayout, QPushButton, QTextEdit
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont, QImage, QPixmap
+from PyQt6.QtGui import QFont, QPixmap
 
 from ui.common.cards import CardFrame
 from ui.common.badges import StatusDot
@@ -213,6 +213,16 @@ class SingleStudentScreen(QWidget):
 
     def set_webrtc_manager(self, manager):
         self.webrtc_manager = manager
+        self._update_target_size()
+
+    def _update_target_size(self):
+        if self.webrtc_manager and self.student_id is not None:
+            size = self.viewer_label.contentsRect().size()
+            self.webrtc_manager.set_target_size(self.student_id, size.width(), size.height())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_target_size()
 
     def load_student_data(self, student: dict):
         """
@@ -235,33 +245,19 @@ class SingleStudentScreen(QWidget):
 
         self.val_mode.setText(str(mode))
 
-    def update_video_frame(self, student_id, frame):
-        """Receive a BGR numpy frame and paint it into the viewer label."""
-        height, width, channel = frame.shape
-        bytes_per_line = channel * width
-
-        qt_img = QImage(
-            frame.data,
-            width,
-            height,
-            bytes_per_line,
-            QImage.Format.Format_BGR888
-        ).copy()
-
-        pixmap = QPixmap.fromImage(qt_img)
-        self.viewer_label.setPixmap(
-            pixmap.scaled(
-                self.viewer_label.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-        )
+    def update_video_frame(self, student_id, image):
+        """Paint a frame the WebRTC manager already scaled to the viewer size."""
+        if student_id != self.student_id:
+            return
+        self.viewer_label.setPixmap(QPixmap.fromImage(image))
 
     # ── Private helpers ──────────────────────────────────────────────────────
 
     def _stop_streaming(self):
         if self.webrtc_manager and self.student_id is not None:
-            self.webrtc_manager.stop_monitoring(self.student_id)
+            # Keeps a direct connection warm (student's track paused) for a quick
+            # reopen; a relayed one is stopped so the relay can close the upstream
+            self.webrtc_manager.park(self.student_id)
 
         # Reset viewer back to placeholder
         self.viewer_label.setPixmap(QPixmap())
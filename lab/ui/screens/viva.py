@@ -13,7 +13,7 @@ from ui.common.cards import CardFrame
 from ui.common.styled_dialogs import info, success, warning, error, confirm  # ← replaces QMessageBox
 from ui.theme import heading_font, Theme, body_font
 from api.global_client import api_client
-from ui.common.websocket_client import FacultyWebSocketClient
+from ui.common.websocket_client import shared_monitor_client
 
 
 class VivaScreen(QWidget):
@@ -25,6 +25,7 @@ class VivaScreen(QWidget):
         self.current_record         = None
         self.current_viva_session_id= None
         self.ws_client              = None
+        self.subscribed_batch       = None   # Batch this screen holds a subscription to
         self.student_items          = {}   # student_id → QListWidgetItem
 
         # ── Scrollable root ───────────────────────────────────
@@ -228,9 +229,13 @@ class VivaScreen(QWidget):
         self.sync_offline_session()
 
     def hideEvent(self, event):
+        # The socket is shared with the dashboard; only detach this screen
         if self.ws_client:
-            self.ws_client.stop()
+            self.ws_client.status_batch_signal.disconnect(self.handle_status_batch)
+            if self.subscribed_batch is not None:
+                self.ws_client.unsubscribe(self.subscribed_batch)
             self.ws_client = None
+        self.subscribed_batch = None
         super().hideEvent(event)
 
     # ── Session sync ──────────────────────────────────────────
@@ -246,9 +251,13 @@ class VivaScreen(QWidget):
         if not self.ws_client:
             token = api_client.access_token
             if token:
-                self.ws_client = FacultyWebSocketClient(batch_id, token)
-                self.ws_client.student_status_signal.connect(self.handle_status_update)
-                self.ws_client.start()
+                self.ws_client = shared_monitor_client(token)
+                self.ws_client.status_batch_signal.connect(self.handle_status_batch)
+        if self.ws_client and self.subscribed_batch != batch_id:
+            if self.subscribed_batch is not None:
+                self.ws_client.unsubscribe(self.subscribed_batch)
+            self.ws_client.subscribe(batch_id)
+            self.subscribed_batch = batch_id
 
         try:
             res = api_client.get(
@@ -270,6 +279,8 @@ class VivaScreen(QWidget):
             print(f"Error syncing offline session: {e}")
 
     def handle_status_update(self, data):
+        if data.get('batch_id') not in (None, self.parent_window.current_batch_id):
+            return
         student_id = data.get('student_id')
         status     = data.get('status')
         if student_id in self.student_items:
@@ -280,6 +291,12 @@ class VivaScreen(QWidget):
                 color = "#10B981" if status == 'online' else "#D1D5DB"
                 dot.setStyleSheet(f"background: {color}; border-radius: 5px;")
 
+    def handle_status_batch(self, data):
+        if data.get('batch_id') not in (None, self.parent_window.current_batch_id):
+            return
+        for change in data.get('students', []):
+            self.handle_status_update(change)
+
     # ── Data loading ──────────────────────────────────────────
 
     def load_records(self):
@@ -0,0 +1,103 @@
+"""
+Screen frame path: allocations and CPU time per frame.
+
+Feeds synthetic BGRA captures (720p and 1080p, fresh buffer per grab like
+mss) through the previous ScreenVideoTrack path (np.array copy, cvtColor,
+resize, VideoFrame.from_ndarray) and through FramePipeline, for an idle
+screen, a small edit per frame (typing) and a full-screen change (scrolling
+or video). Reports CPU ms per frame and bytes allocated per frame as seen by
+tracemalloc (numpy/OpenCV arrays; PyAV's own buffers are not traced, so
+the previous path's from_ndarray copy is not in its byte count).
+
+Usage (from student/):
+    python -m benchmarks.frame_path [--frames 60]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from av import VideoFrame
+
+from screen_track import FramePipeline
+
+
+CAPTURES = {'720p': (1280, 720), '1080p': (1920, 1080)}
+
+
+class SyntheticSource:
+    """Returns a new BGRA buffer per grab, changed according to ``scenario``."""
+
+    def __init__(self, width, height, scenario):
+        rng = np.random.default_rng(0)
+        self.screen = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+        self.scenario = scenario
+        self.count = 0
+
+    def grab(self):
+        self.count += 1
+        if self.scenario == 'typing':
+            row = 200 + (self.count % 20) * 20
+            self.screen[row:row + 16, 100:100 + 8 * (self.count % 60 + 1)] = self.count % 256
+        elif self.scenario == 'scrolling':
+            self.screen = np.roll(self.screen, 8, axis=0)
+        # mss copies the screen into a new buffer on every grab
+        return np.frombuffer(bytearray(self.screen.tobytes()), dtype=np.uint8).reshape(self.screen.shape)
+
+
+def legacy_frame(capture):
+    frame = np.array(capture)
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    frame = cv2.resize(frame, (1280, 720))
+    return VideoFrame.from_ndarray(frame, format="bgr24")
+
+
+def measure(step, source, frames):
+    """CPU ms and traced bytes allocated per frame for ``step(capture)``; grabs are not counted."""
+    for _ in range(4):
+        step(source.grab())  # first frame renders everything
+
+    cpu = 0.0
+    for _ in range(frames):
+        capture = source.grab()
+        start = time.process_time()
+        step(capture)
+        cpu += time.process_time() - start
+
+    allocated = 0
+    tracemalloc.start()
+    for _ in range(frames):
+        capture = source.grab()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        step(capture)
+        allocated += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return cpu / frames * 1000, allocated / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--frames', type=int, default=60)
+    args = parser.parse_args()
+
+    print(f"{'capture':<8}{'scenario':<11}{'path':<10}{'cpu ms/frame':>14}{'alloc KiB/frame':>17}")
+    for capture, (width, height) in CAPTURES.items():
+        for scenario in ('idle', 'typing', 'scrolling'):
+            source = SyntheticSource(width, height, scenario)
+            cpu, allocated = measure(legacy_frame, source, args.frames)
+            print(f"{capture:<8}{scenario:<11}{'previous':<10}{cpu:>14.2f}{allocated / 1024:>17.0f}")
+
+            source = SyntheticSource(width, height, scenario)
+            pipeline = FramePipeline(1280, 720)
+            cpu, allocated = measure(pipeline.process, source, args.frames)
+            print(f"{capture:<8}{scenario:<11}{'pipeline':<10}{cpu:>14.2f}{allocated / 1024:>17.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,16 @@
 # config.py
+import os
 
 SERVER_IP = "127.0.0.1"
 PORT = "8000"
 
 BASE_HTTP = f"http://{SERVER_IP}:{PORT}"
-BASE_WS = f"ws://{SERVER_IP}:{PORT}"
\ No newline at end of file
+BASE_WS = f"ws://{SERVER_IP}:{PORT}"
+
+# STUN server for live monitoring across networks (e.g. "stun:stun.l.google.com:19302").
+# Empty on the lab LAN: host candidates only, so connecting never waits on an unreachable server.
+STUN_URL = ""
+
+# Exam screen recordings (one rolling, size-capped directory per exam session)
+RECORDINGS_DIR = os.path.join(os.path.expanduser("~"), ".smartlab", "recordings")
+RECORDING_MAX_BYTES = 300 * 1024 * 1024
@@ -0,0 +1,148 @@
+"""
+Encoder profiles for screen monitoring, and adaptation to network feedback.
+
+Each profile is a ladder of (width, height, fps, bitrate) steps, best first.
+"text" keeps resolution and gives up frame rate first, so code and documents
+stay readable; "smooth" keeps motion and gives up resolution first.
+
+``adapt`` reads the RTCP receiver reports aiortc exposes through
+``RTCRtpSender.getStats()`` and moves the stream down a step as soon as loss
+or round-trip time says the network is saturated, and back up only after a
+run of clean reports. The run length is randomised per stream so a lab's
+streams do not all step up (and re-saturate the network) together.
+"""
+import asyncio
+import random
+
+
+class EncoderProfile:
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = steps
+
+
+PROFILES = {
+    "text": EncoderProfile("text", [
+        (1600, 900, 8, 1_500_000),
+        (1600, 900, 4, 1_000_000),
+        (1280, 720, 4, 700_000),
+        (1280, 720, 2, 450_000),
+        (960, 540, 2, 300_000),
+    ]),
+    "smooth": EncoderProfile("smooth", [
+        (1280, 720, 20, 1_500_000),
+        (960, 540, 20, 1_000_000),
+        (960, 540, 15, 700_000),
+        (640, 360, 15, 450_000),
+        (640, 360, 10, 300_000),
+    ]),
+}
+
+DEFAULT_PROFILE = "text"
+
+# Report thresholds: fraction of packets lost and round-trip time (seconds)
+CONGESTED_LOSS = 0.10
+CONGESTED_RTT = 0.4
+CLEAR_LOSS = 0.02
+CLEAR_RTT = 0.2
+
+
+def get_profile(name):
+    return PROFILES.get(name) or PROFILES[DEFAULT_PROFILE]
+
+
+class QualityController:
+    """Picks a profile step from receiver reports: down fast, up slowly."""
+
+    def __init__(self, profile, clear_reports=None):
+        self.profile = profile
+        self.step = 0
+        self.clear = 0
+        self.clear_needed = clear_reports or random.randint(4, 7)
+
+    @property
+    def settings(self):
+        return self.profile.steps[self.step]
+
+    def update(self, loss, rtt):
+        """Feed one report; returns True if the step changed."""
+        rtt = rtt or 0
+        if loss >= CONGESTED_LOSS or rtt >= CONGESTED_RTT:
+            self.clear = 0
+            if self.step < len(self.profile.steps) - 1:
+                self.step += 1
+                return True
+            return False
+
+        if loss <= CLEAR_LOSS and rtt <= CLEAR_RTT:
+            self.clear += 1
+            if self.clear >= self.clear_needed and self.step > 0:
+                self.step -= 1
+                self.clear = 0
+                self.clear_needed = random.randint(4, 7)
+                return True
+        else:
+            self.clear = 0
+        return False
+
+
+_capped_classes = {}
+
+
+def _capped(encoder):
+    """
+    Make ``encoder`` honour a ``bitrate_cap``. aiortc sets ``target_bitrate``
+    from every REMB the receiver sends; the cap keeps those estimates from
+    lifting the stream above its current step.
+    """
+    cls = type(encoder)
+    if hasattr(cls, "bitrate_cap"):
+        return encoder
+    capped = _capped_classes.get(cls)
+    if capped is None:
+        def set_target(self, bitrate):
+            cls.target_bitrate.fset(self, min(bitrate, self.bitrate_cap or bitrate))
+        capped = _capped_classes[cls] = type(cls.__name__, (cls,), {
+            "bitrate_cap": None,
+            "target_bitrate": property(cls.target_bitrate.fget, set_target),
+        })
+    encoder.__class__ = capped
+    return encoder
+
+
+def set_sender_bitrate(sender, bitrate):
+    """
+    Cap and set the encoder's target bitrate. aiortc only exposes the encoder
+    inside RTCRtpSender, and creates it with the first frame; returns False
+    until then.
+    """
+    encoder = getattr(sender, "_RTCRtpSender__encoder", None)
+    if encoder is None or not hasattr(encoder, "target_bitrate"):
+        return False
+    encoder = _capped(encoder)
+    encoder.bitrate_cap = bitrate
+    encoder.target_bitrate = min(encoder.target_bitrate, bitrate)
+    return True
+
+
+async def adapt(sender, track, controller, interval=2.0):
+    """Apply ``controller``'s step to ``track`` and ``sender`` until the track ends."""
+    bitrate_set = False
+    while track.readyState == "live":
+        await asyncio.sleep(interval)
+        report = None
+        for stats in (await sender.getStats()).values():
+            if stats.type == "remote-inbound-rtp":
+                report = stats
+
+        changed = False
+        if report is not None:
+            # RTCP carries the loss fraction as a multiple of 1/256
+            changed = controller.update(report.fractionLost / 256, report.roundTripTime)
+
+        width, height, fps, bitrate = controller.settings
+        if changed:
+            print(f"[Stream] {controller.profile.name} step {controller.step}: {width}x{height} @ {fps} fps, {bitrate // 1000} kbps")
+            track.configure(width, height, fps)
+        if changed or not bitrate_set:
+            bitrate_set = set_sender_bitrate(sender, bitrate)
@@ -0,0 +1,209 @@
+"""
+Rolling screen recording during exams, for invigilators to review later.
+
+``ExamRecorder`` captures the screen through the same ``FramePipeline`` as
+the live stream, at a low frame rate, and encodes it with x264 into short MP4
+segments. Unchanged captures are not encoded at all; the previous frame
+simply stays on screen until the next timestamp, so an idle screen costs one
+compare per capture. Each segment starts with a keyframe and the GOP is
+``fps * keyframe_seconds`` encoded frames, so keyframes are
+``keyframe_seconds`` apart only while the screen keeps changing.
+
+``SegmentRing`` keeps the segments in one directory within ``max_bytes``,
+deleting the oldest first. Given ``root`` (the folder holding every exam's
+directory), the budget covers all of it: recordings of earlier exams are
+deleted, oldest first, before this one's own segments. It and keeps ``manifest.json`` listing each
+segment's wall-clock start and end so ``locate(timestamp)`` finds the
+segment and offset to seek to without opening any video.
+"""
+import bisect
+import json
+import os
+import shutil
+import threading
+import time
+from fractions import Fraction
+
+import av
+
+from screen_track import FramePipeline, MssSource
+
+
+MANIFEST = "manifest.json"
+
+
+def _folder_bytes(path):
+    total = 0
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class SegmentRing:
+    def __init__(self, directory, max_bytes, root=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.root = root
+        os.makedirs(directory, exist_ok=True)
+        self.segments = self._load()
+        self.sequence = self.segments[-1]["sequence"] + 1 if self.segments else 0
+
+        # Segments cut short by a crash or restart were never added
+        listed = {segment["file"] for segment in self.segments}
+        for name in os.listdir(directory):
+            if name.endswith(".mp4") and name not in listed or name.endswith(".part"):
+                os.remove(os.path.join(directory, name))
+        self._trim()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                return json.load(f)["segments"]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def _save(self):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"segments": self.segments}, f)
+        os.replace(path + ".tmp", path)
+
+    def next_path(self):
+        """Path to write the next segment to (renamed by ``add`` when complete)."""
+        return os.path.join(self.directory, f"{self.sequence:06d}.part")
+
+    def add(self, part_path, start, end, frames):
+        name = f"{self.sequence:06d}.mp4"
+        os.replace(part_path, os.path.join(self.directory, name))
+        self.segments.append({
+            "sequence": self.sequence,
+            "file": name,
+            "start": start,
+            "end": end,
+            "frames": frames,
+            "bytes": os.path.getsize(os.path.join(self.directory, name)),
+        })
+        self.sequence += 1
+        self._trim()
+
+    def _earlier_recordings(self):
+        """(modified time, path, bytes) of the other recordings under ``root``, oldest first."""
+        if self.root is None:
+            return []
+        recordings = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and os.path.abspath(entry.path) != os.path.abspath(self.directory):
+                recordings.append((entry.stat().st_mtime, entry.path, _folder_bytes(entry.path)))
+        return sorted(recordings)
+
+    def _trim(self):
+        """Delete the oldest recordings until everything is within ``max_bytes``."""
+        earlier = self._earlier_recordings()
+        total = sum(segment["bytes"] for segment in self.segments) + sum(size for _, _, size in earlier)
+        for _, path, size in earlier:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+        while total > self.max_bytes and len(self.segments) > 1:
+            oldest = self.segments.pop(0)
+            total -= oldest["bytes"]
+            try:
+                os.remove(os.path.join(self.directory, oldest["file"]))
+            except FileNotFoundError:
+                pass
+        self._save()
+
+    def locate(self, timestamp):
+        """(segment path, seconds into it) for a wall-clock time, or None if not kept."""
+        starts = [segment["start"] for segment in self.segments]
+        index = bisect.bisect_right(starts, timestamp) - 1
+        if index < 0 or timestamp > self.segments[index]["end"]:
+            return None
+        segment = self.segments[index]
+        return os.path.join(self.directory, segment["file"]), timestamp - segment["start"]
+
+    def between(self, start, end):
+        """Segments overlapping [start, end], oldest first."""
+        return [segment for segment in self.segments if segment["end"] >= start and segment["start"] <= end]
+
+
+class ExamRecorder(threading.Thread):
+    """Background recorder; ``stop()`` closes the current segment."""
+
+    def __init__(self, directory, source=None, width=1280, height=720, fps=2,
+                 segment_seconds=30, keyframe_seconds=5, max_bytes=300 * 1024 * 1024, crf=30, root=None):
+        super().__init__(name="exam-recorder", daemon=True)
+        self.source = source
+        self.pipeline = FramePipeline(width, height)
+        self.ring = SegmentRing(directory, max_bytes, root)
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.keyframe_seconds = keyframe_seconds
+        self.crf = crf
+        self._stopped = threading.Event()
+
+        self.captures = 0
+        self.encoded = 0
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        if self.source is None:
+            # mss handles are per thread
+            self.source = MssSource()
+        try:
+            while not self._stopped.is_set():
+                self._record_segment()
+        except Exception as e:
+            print(f"Exam recorder stopped: {e}")
+
+    def _open(self, path):
+        container = av.open(path, "w", format="mp4")
+        stream = container.add_stream("libx264", rate=self.fps)
+        stream.width = self.pipeline.width
+        stream.height = self.pipeline.height
+        stream.pix_fmt = "yuv420p"
+        stream.codec_context.gop_size = self.fps * self.keyframe_seconds
+        # Millisecond timestamps: unchanged captures are skipped, so frames are irregular
+        stream.codec_context.time_base = Fraction(1, 1000)
+        stream.options = {
+            "preset": "ultrafast",
+            "tune": "stillimage",
+            "crf": str(self.crf),
+        }
+        return container, stream
+
+    def _record_segment(self):
+        path = self.ring.next_path()
+        container, stream = self._open(path)
+        start = time.time()
+        frames = 0
+        next_capture = time.monotonic()
+        while not self._stopped.is_set() and time.time() - start < self.segment_seconds:
+            now = time.time()
+            changed = self.pipeline.process(self.source.grab())
+            self.captures += 1
+            # Every segment opens with a frame so it plays on its own
+            if changed or frames == 0:
+                frame = self.pipeline.frame
+                frame.pts = int((now - start) * 1000)
+                frame.time_base = Fraction(1, 1000)
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+                frames += 1
+                self.encoded += 1
+
+            next_capture += 1 / self.fps
+            self._stopped.wait(max(0, next_capture - time.monotonic()))
+
+        for packet in stream.encode():
+            container.mux(packet)
+        container.close()
+        self.ring.add(path, start, time.time(), frames)
@@ -0,0 +1,69 @@
+"""
+Screen activity for exam proctoring: a perceptual hash of the screen once a
+second instead of video.
+
+``screen_hash`` is a 64-bit DCT hash of the screen shrunk to 32x32 grey. It
+ignores small changes such as a blinking cursor or a ticking clock, and moves
+by many bits when a window changes or the page scrolls. ``ActivitySampler``
+keeps only the samples whose hash moved since the last one kept, and the
+client sends them in batches as ``screen_activity`` messages. Each message
+covers its whole time span even when nothing moved, so the backend can tell
+an idle screen from an app that was not running.
+"""
+import time
+
+import cv2
+import numpy as np
+
+from screen_track import MssSource
+
+
+INTERVAL = 1.0  # Seconds between hashes
+FLUSH = 30.0  # Seconds between screen_activity messages
+MIN_BITS = 3  # Hash moves smaller than this are noise
+
+
+def screen_hash(bgra):
+    # Every 4th pixel is plenty for a 32x32 average and 6x cheaper to shrink
+    small = cv2.resize(bgra[::4, ::4], (32, 32), interpolation=cv2.INTER_AREA)
+    grey = cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY).astype(np.float32)
+    # Lowest 8x8 frequencies, each compared to their median (DC term left out)
+    low = cv2.dct(grey)[:8, :8].flatten()
+    return int(np.packbits(low > np.median(low[1:])).view(">u8")[0])
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ActivitySampler:
+    def __init__(self, session_id, source=None, min_bits=MIN_BITS):
+        self.session_id = session_id
+        self.source = source or MssSource()
+        self.min_bits = min_bits
+        self.last = None
+        self.samples = []
+        self.since = time.time()
+
+    def sample(self):
+        """Hash the screen; keep the sample if it moved (the first one is the baseline)."""
+        now = time.time()
+        value = screen_hash(self.source.grab())
+        bits = 0 if self.last is None else distance(value, self.last)
+        if self.last is None or bits >= self.min_bits:
+            self.samples.append([now, f"{value:016x}", bits])
+            self.last = value
+
+    def take(self):
+        """``screen_activity`` message for everything since the previous take."""
+        now = time.time()
+        message = {
+            "type": "screen_activity",
+            "session_id": self.session_id,
+            "from": self.since,
+            "until": now,
+            "samples": self.samples,
+        }
+        self.samples = []
+        self.since = now
+        return message
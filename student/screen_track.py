@@ -2,44 +2,232 @@ import cv2
 import numpy as np
 import mss
 from aiortc import VideoStreamTrack
+from aiortc.mediastreams import MediaStreamError, VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
 from av import VideoFrame
 import asyncio
+import time
+from fractions import Fraction
+
+from encoder_profiles import get_profile
+
+# Seconds an unchanged screen goes without a frame; one is still sent this
+# often so the encoder can answer keyframe requests from a new viewer.
+IDLE_REFRESH = 1.0
+
+
+class MssSource:
+    """Grabs the primary monitor as a BGRA ndarray."""
+
+    def __init__(self, monitor=1):
+        self.sct = mss.mss()
+        self.monitor = self.sct.monitors[monitor]
+
+    def grab(self):
+        # View over mss's buffer, no copy. mss allocates a fresh buffer per
+        # grab, so the previous capture stays valid for diffing.
+        return np.asarray(self.sct.grab(self.monitor))
+
+
+def _tile_edges(size, tile):
+    return np.append(np.arange(0, size, tile), size)
+
+
+def _plane_array(frame):
+    """Writable (height, width, 4) view of a packed BGRA VideoFrame's pixels."""
+    plane = frame.planes[0]
+    rows = np.frombuffer(plane, dtype=np.uint8).reshape(frame.height, plane.line_size)
+    return rows[:, :frame.width * 4].reshape(frame.height, frame.width, 4)
+
+
+class FramePipeline:
+    """
+    Scales BGRA captures into one recycled BGRA VideoFrame (``frame``),
+    redoing only the tiles that changed since the previous capture. Tiles are
+    resized into the frame's memory and colour conversion is left to the
+    encoder's single yuv420p pass, so nothing full-size is allocated per
+    frame. ``process`` returns whether anything changed; an idle screen costs
+    one compare.
+
+    Output is pixel-for-pixel what a whole-frame ``cv2.resize`` gives. That
+    holds tile by tile only when every tile edge lands on a source pixel, so
+    tiles are used when downscaling by a ratio whose denominator divides the
+    tile size (2560x1440 or 1920x1080 to 1280x720); any other ratio
+    (1366x768 to 1280x720) redoes the whole frame when something changed.
+
+    The frame is rewritten in place by the next ``process``; the consumer
+    (RTCRtpSender encodes each frame before asking for the next) must be
+    done with it by then.
+    """
+
+    def __init__(self, width=1280, height=720, tile=32):
+        self.width = width
+        self.height = height
+        self.tile = tile
+        self.frame = VideoFrame(width, height, "bgra")
+        self.output = _plane_array(self.frame)
+        self._previous = None
+        self.dirty_tiles = 0
+
+    def _layout(self, shape):
+        h, w = shape[:2]
+        # Tiles are laid out on the output grid. (scale_y, scale_x) source
+        # pixels per output pixel, as exact fractions.
+        self._dst_y = _tile_edges(self.height, self.tile)
+        self._dst_x = _tile_edges(self.width, self.tile)
+        self._scale = (Fraction(h, self.height), Fraction(w, self.width))
+        self._tiled = all(scale >= 1 and self.tile % scale.denominator == 0 for scale in self._scale)
+        self._src_y = np.rint(self._dst_y * (h / self.height)).astype(int)
+        self._src_x = np.rint(self._dst_x * (w / self.width)).astype(int)
+        self._changed = np.empty((h, w), dtype=bool)
+
+    def dirty(self, bgra):
+        """Boolean grid of output tiles whose source pixels changed since the previous capture."""
+        if self._previous is None or self._previous.shape != bgra.shape:
+            self._layout(bgra.shape)
+            return np.ones((len(self._dst_y) - 1, len(self._dst_x) - 1), dtype=bool)
+
+        grid = np.zeros((len(self._dst_y) - 1, len(self._dst_x) - 1), dtype=bool)
+        # One uint32 per BGRA pixel
+        h, w = bgra.shape[:2]
+        changed = np.not_equal(bgra.view(np.uint32).reshape(h, w),
+                               self._previous.view(np.uint32).reshape(h, w), out=self._changed)
+        rows = changed.any(axis=1)
+        if not rows.any():
+            return grid
+        for row in np.flatnonzero(np.logical_or.reduceat(rows, self._src_y[:-1])):
+            columns = changed[self._src_y[row]:self._src_y[row + 1]].any(axis=0)
+            grid[row] = np.logical_or.reduceat(columns, self._src_x[:-1])
+        return grid
+
+    def process(self, bgra):
+        dirty = self.dirty(bgra)
+        self._previous = bgra
+        self.dirty_tiles = int(dirty.sum())
+        if not self.dirty_tiles:
+            return False
+
+        if not self._tiled or self.dirty_tiles > dirty.size // 2:
+            # Mostly changed (scrolling, video): one call beats many strips
+            cv2.resize(bgra, (self.width, self.height), dst=self.output, interpolation=cv2.INTER_LINEAR)
+            return True
+
+        for row in np.flatnonzero(dirty.any(axis=1)):
+            # Runs of adjacent dirty tiles in this row are scaled in one call
+            flags = np.concatenate(([False], dirty[row], [False]))
+            edges = np.flatnonzero(flags[1:] != flags[:-1])
+            for start, stop in zip(edges[::2], edges[1::2]):
+                self._render(bgra, row, start, stop)
+        return True
+
+    def _render(self, bgra, row, start, stop):
+        y0, y1 = self._dst_y[row], self._dst_y[row + 1]
+        x0, x1 = self._dst_x[start], self._dst_x[stop]
+        if y1 <= y0 or x1 <= x0:
+            return
+        # Scale a margin of source pixels around the run as well, so its edge
+        # pixels interpolate from the same neighbours as in a whole-frame
+        # resize, then keep the run. The margin is the smallest whole number
+        # of output pixels that covers at least one source pixel.
+        scale_y, scale_x = self._scale
+        top, bottom = max(y0 - scale_y.denominator, 0), min(y1 + scale_y.denominator, self.height)
+        left, right = max(x0 - scale_x.denominator, 0), min(x1 + scale_x.denominator, self.width)
+        region = bgra[int(top * scale_y):int(bottom * scale_y), int(left * scale_x):int(right * scale_x)]
+        scaled = cv2.resize(region, (right - left, bottom - top), interpolation=cv2.INTER_LINEAR)
+        self.output[y0:y1, x0:x1] = scaled[y0 - top:y1 - top, x0 - left:x1 - left]
+
+
+class ThumbnailCapture:
+    """Small JPEG snapshots of the screen for the faculty thumbnail wall."""
+
+    def __init__(self, source=None, width=320, height=180, quality=60):
+        self.source = source or MssSource()
+        self.pipeline = FramePipeline(width, height, tile=16)
+        self.quality = quality
+
+    def capture(self, force=False):
+        """JPEG bytes of the screen, or None if it has not changed since the last capture."""
+        if not self.pipeline.process(self.source.grab()) and not force:
+            return None
+        image = cv2.cvtColor(self.pipeline.output, cv2.COLOR_BGRA2BGR)
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return jpeg.tobytes() if ok else None
 
 
 class ScreenVideoTrack(VideoStreamTrack):
     """
     Captures screen and sends frames over WebRTC.
+
+    Frames come from a FramePipeline. An unchanged capture is not returned
+    (so not encoded) until IDLE_REFRESH has passed since the last frame; an
+    idle screen costs one capture per tick and one frame per second. ``source`` is anything with a ``grab()`` returning
+    a BGRA ndarray. Size and frame rate start at ``profile``'s best step and
+    are changed with ``configure`` (see encoder_profiles.adapt).
+
+    A ``paused`` track produces nothing (no capture, no encoding) until
+    ``resume``; pre-warmed connections are negotiated with a paused track.
     """
 
-    def __init__(self):
+    def __init__(self, source=None, profile=None, paused=False):
         super().__init__()
-        self.sct = mss.mss()
-
         # Capture full primary monitor
-        self.monitor = self.sct.monitors[1]
-        self.fps=15
+        self.source = source or MssSource()
+        self.profile = profile or get_profile(None)
+        width, height, fps, _ = self.profile.steps[0]
+        self.pipeline = FramePipeline(width, height)
+        self.fps = fps
 
-    async def recv(self):
-        #print("Producing frame")
-        pts, time_base = await self.next_timestamp()
+        self.frames = 0
+        self.skipped = 0
+        self._sent = None
+        self._start = None
+        self._next = None
+        self._live = asyncio.Event()
+        if not paused:
+            self._live.set()
 
-        #img = np.array(self.sct.grab(self.monitor))
-        #frame = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-        #frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        #frame[:] = (0, 0, 255)  # red screen
-        #saved = cv2.imwrite("C:/Users/shadi/Desktop/test_capture.jpg", frame)  # Debugging
-        #print("saved:", saved)
+    def pause(self):
+        self._live.clear()
 
-        img = self.sct.grab(self.monitor)
-        frame = np.array(img)
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-        frame = cv2.resize(frame, (1280, 720))
+    def resume(self):
+        self._live.set()
 
-        video_frame = VideoFrame.from_ndarray(frame, format="bgr24")
+    def configure(self, width, height, fps):
+        """Switch output size and frame rate; the next frame is rendered in full."""
+        if (width, height) != (self.pipeline.width, self.pipeline.height):
+            self.pipeline = FramePipeline(width, height)
+        self.fps = fps
+
+    async def next_timestamp(self):
+        """Pace frames at ``fps``; pts follow the clock, so fps changes keep playback speed."""
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        now = time.time()
+        if self._start is None:
+            self._start = self._next = now
+        else:
+            self._next += 1 / self.fps
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+            else:
+                # Running late (slow capture): skip ahead instead of bursting
+                self._next = now
+        return int((self._next - self._start) * VIDEO_CLOCK_RATE), VIDEO_TIME_BASE
+
+    async def recv(self):
+        while True:
+            await self._live.wait()
+            pts, time_base = await self.next_timestamp()
+            changed = self.pipeline.process(self.source.grab())
+            if changed or self._sent is None or self._next - self._sent >= IDLE_REFRESH:
+                break
+            self.skipped += 1
+        self._sent = self._next
+        self.frames += 1
+
+        video_frame = self.pipeline.frame
         video_frame.pts = pts
         video_frame.time_base = time_base
-
-        await asyncio.sleep(1 / 20)  # 20 FPS
         return video_frame
 
 
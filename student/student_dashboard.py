@@ -45,6 +45,16 @@ class StudentDashboard(QWidget):
             self.handle_viva_event(data)
         elif event_type == 'control_command':
             self.handle_control_command(data)
+        elif event_type == 'resync_required':
+            self.resync_after_reconnect()
+
+    def resync_after_reconnect(self):
+        """Missed events were no longer replayable; reload state over REST."""
+        self.load_tasks()
+        self.load_exams()
+        self.load_viva_status()
+        self.load_results()
+        self.fetch_initial_control_state()
 
     def handle_viva_event(self, data):
         """Handle viva AND exam events (both use viva_event channel type)"""
@@ -94,7 +104,7 @@ class StudentDashboard(QWidget):
             self.load_exams()
 
         elif event == 'exam_evaluated':
-            title = data.get('session_title', 'Exam')
+            title = data.get('session_title') or 'Exam'
             marks = data.get('marks', 'N/A')
             self.session_status_label.setText(f"\u2705 EXAM RESULT: {title} \u2014 Marks: {marks}")
             self.session_status_label.setStyleSheet("background-color: #22c55e; color: white; padding: 5px 10px; border-radius: 4px; font-weight: bold;")
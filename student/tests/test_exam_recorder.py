@@ -0,0 +1,49 @@
+"""
+Exam recordings stay within one storage budget across exams.
+
+Run from student/: ``python -m unittest``
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from exam_recorder import ExamRecorder
+
+
+class NoiseSource:
+    """A screen that changes on every capture, so every frame is encoded."""
+
+    def __init__(self):
+        self.rng = np.random.default_rng(0)
+
+    def grab(self):
+        return self.rng.integers(0, 256, (180, 320, 4), dtype=np.uint8)
+
+
+def recorded_bytes(root):
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+
+
+class ExamRecorderTests(unittest.TestCase):
+    def record(self, root, session, max_bytes, segments=3):
+        recorder = ExamRecorder(os.path.join(root, f"exam_{session}"), source=NoiseSource(), width=320, height=180,
+                                fps=10, segment_seconds=0.3, max_bytes=max_bytes, root=root)
+        recorder.start()
+        while recorder.ring.sequence < segments:
+            recorder.join(0.05)
+        recorder.stop()
+        recorder.join(5)
+        return recorder
+
+    def test_budget_covers_every_exam(self):
+        root = tempfile.mkdtemp()
+        first = self.record(root, 1, max_bytes=10**9)
+        size = recorded_bytes(root)
+
+        # A second exam with room for about one exam's worth of video
+        second = self.record(root, 2, max_bytes=size + size // 2)
+        self.assertFalse(os.path.exists(first.ring.directory))
+        self.assertTrue(second.ring.segments)
+        self.assertLessEqual(recorded_bytes(root), size + size // 2)
@@ -0,0 +1,86 @@
+"""
+FramePipeline output against a whole-frame resize, and ScreenVideoTrack pacing.
+
+Run from student/: ``python -m unittest``
+"""
+import asyncio
+import unittest
+
+import cv2
+import numpy as np
+
+import screen_track
+from encoder_profiles import get_profile
+from screen_track import FramePipeline, ScreenVideoTrack
+
+
+class FramePipelineTests(unittest.TestCase):
+    SIZES = [
+        ((1920, 1080), (1280, 720)),
+        ((2560, 1440), (1280, 720)),
+        ((1366, 768), (1280, 720)),
+        ((1920, 1080), (1600, 900)),
+    ]
+
+    def test_partial_updates_match_a_whole_frame_resize(self):
+        rng = np.random.default_rng(0)
+        for (width, height), size in self.SIZES:
+            with self.subTest(screen=(width, height), output=size):
+                pipeline = FramePipeline(*size)
+                screen = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+                pipeline.process(screen)
+                for _ in range(10):
+                    screen = screen.copy()
+                    y, x = rng.integers(0, height - 64), rng.integers(0, width - 64)
+                    screen[y:y + rng.integers(1, 64), x:x + rng.integers(1, 64)] = rng.integers(0, 256, 4)
+                    self.assertTrue(pipeline.process(screen))
+                    expected = cv2.resize(screen, size, interpolation=cv2.INTER_LINEAR)
+                    np.testing.assert_array_equal(pipeline.output, expected)
+
+    def test_unchanged_capture_is_not_redone(self):
+        pipeline = FramePipeline(1280, 720)
+        screen = np.zeros((1080, 1920, 4), dtype=np.uint8)
+        self.assertTrue(pipeline.process(screen))
+        self.assertFalse(pipeline.process(screen.copy()))
+        self.assertEqual(pipeline.dirty_tiles, 0)
+
+
+class StillSource:
+    def __init__(self):
+        self.screen = np.zeros((720, 1280, 4), dtype=np.uint8)
+        self.grabs = 0
+
+    def grab(self):
+        self.grabs += 1
+        return self.screen
+
+
+class ScreenVideoTrackTests(unittest.TestCase):
+    def setUp(self):
+        previous = screen_track.IDLE_REFRESH
+        screen_track.IDLE_REFRESH = 0.2
+        self.addCleanup(setattr, screen_track, 'IDLE_REFRESH', previous)
+
+    def test_unchanged_screen_is_not_encoded_every_tick(self):
+        source = StillSource()
+        track = ScreenVideoTrack(source=source, profile=get_profile(None))
+        track.fps = 50
+
+        async def pts():
+            # Frames are recycled, so read pts before the next recv
+            return (await track.recv()).pts
+
+        async def run():
+            first = await pts()
+            source.screen = source.screen.copy()
+            source.screen[:10, :10] = 255
+            changed = await pts()
+            self.assertEqual((track.frames, track.skipped, source.grabs), (2, 0, 2))
+            return first, changed, await pts()
+
+        first, changed, idle = asyncio.run(asyncio.wait_for(run(), 2))
+        self.assertAlmostEqual(changed - first, 90000 // 50, delta=1)
+        # An idle screen is captured every tick but only sent after the refresh
+        self.assertEqual(track.frames, 3)
+        self.assertGreaterEqual(track.skipped, 5)
+        self.assertGreaterEqual(idle - changed, 0.2 * 90000 - 1)
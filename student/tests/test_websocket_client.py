@@ -0,0 +1,60 @@
+"""
+Student socket client: what disables the msgpack offer, and how events are
+de-duplicated and acknowledged across a resume.
+
+Run from student/: ``python -m unittest``
+"""
+import json
+import socket
+import unittest
+
+import websocket
+
+from websocket_client import ACK_EVERY, WebSocketClient
+
+
+class SubprotocolOfferTests(unittest.TestCase):
+    def test_only_a_rejected_offer_disables_msgpack(self):
+        client = WebSocketClient()
+
+        client.on_error(None, websocket.WebSocketBadStatusException("Handshake status %d", 403))
+        client.on_error(None, websocket.WebSocketTimeoutException("timed out"))
+        client.on_error(None, ConnectionResetError())
+        self.assertTrue(client.use_subprotocols)
+
+        client.on_error(None, websocket.WebSocketException("Invalid WebSocket Header"))
+        self.assertFalse(client.use_subprotocols)
+
+    def test_unreachable_server_keeps_the_offer(self):
+        with socket.socket() as unused:
+            unused.bind(('127.0.0.1', 0))
+            port = unused.getsockname()[1]
+        client = WebSocketClient()
+
+        client._connect(f'ws://127.0.0.1:{port}/ws/student/')
+        self.assertFalse(client.opened)
+        self.assertTrue(client.use_subprotocols)
+
+
+class ResumeTests(unittest.TestCase):
+    def test_replayed_events_are_dropped_and_messages_acked(self):
+        client = WebSocketClient()
+        client.last_seq = 5
+        sent = []
+        client.send_json = sent.append
+        events = []
+        client.message_signal.connect(events.append)
+
+        for seq in (4, 5, 6):
+            client.on_message(None, json.dumps({'type': 'session_status', 'seq': seq}))
+        client.on_message(None, json.dumps({'type': 'resumed', 'seq': 6, 'replayed': 1}))
+        for _ in range(ACK_EVERY - 4):
+            client.on_message(None, json.dumps({'type': 'thumbnail_throttle', 'interval': 2}))
+
+        self.assertEqual([e.get('seq') for e in events if e['type'] != 'thumbnail_throttle'], [6, 6])
+        self.assertEqual(client.last_seq, 6)
+        self.assertEqual(sent, [{'type': 'ack', 'received': ACK_EVERY}])
+
+
+if __name__ == '__main__':
+    unittest.main()
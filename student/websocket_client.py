@@ -3,15 +3,50 @@ import json
 import threading
 import time
 from PyQt6.QtCore import QThread, pyqtSignal
-from aiortc import RTCPeerConnection, RTCSessionDescription, RTCIceCandidate
+from aiortc import RTCConfiguration, RTCIceServer, RTCPeerConnection, RTCSessionDescription, RTCIceCandidate
 import asyncio
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-from screen_track import ScreenVideoTrack
-from config import BASE_WS
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from encoder_profiles import QualityController, adapt, get_profile
+from exam_recorder import ExamRecorder
+from screen_activity import FLUSH, INTERVAL, ActivitySampler
+from screen_track import ScreenVideoTrack, ThumbnailCapture
+from config import BASE_WS, RECORDING_MAX_BYTES, RECORDINGS_DIR, STUN_URL
 
 # WS_URL should match your backend routing
 WS_URL = f"{BASE_WS}/ws/student/"
 
+# Binary msgpack frames when available; the server falls back to JSON otherwise
+MSGPACK_SUBPROTOCOL = "smartlab.msgpack"
+JSON_SUBPROTOCOL = "smartlab.json"
+
+# Every this many messages the client tells the server how many it has handled;
+# the server's send window (WS_SEND_WINDOW) must be larger
+ACK_EVERY = 16
+
+# Trickled ICE candidates found within this many seconds go out in one message
+ICE_BATCH_DELAY = 0.02
+
+# Seconds to wait on exit for the exam recorder to close its segment
+RECORDER_STOP_TIMEOUT = 5
+
+
+def rejected_subprotocol(error):
+    """
+    Whether a failed handshake is the server's 101 response failing
+    websocket-client's checks, which is how a backend that ignores the
+    subprotocol offer shows up. A 403 or timeout raises a subclass, and
+    network errors are not WebSocketException at all.
+    """
+    return type(error) is websocket.WebSocketException and str(error) == "Invalid WebSocket Header"
+
 
 class WebSocketClient(QThread):
     message_signal = pyqtSignal(dict)  # Generic signal for all events
@@ -23,7 +58,28 @@ class WebSocketClient(QThread):
         self.reconnect_delay = 5
         self.pc = None
         self.screen_track = None  # FIX 5: Keep reference to prevent GC
+        self.adapt_task = None  # Follows network feedback for the current stream
+        self.pending_ice = []
+        self.recorder = None  # Rolling screen recording while a recorded exam runs
+        self.activity_session = None  # Exam whose screen activity is being reported
+        # Grabbing and hashing the screen runs off the event loop that serves WebRTC;
+        # one thread, as mss handles are per thread
+        self.activity_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screen-activity")
         self.loop = asyncio.new_event_loop()
+        self.last_seq = None  # Last event sequence number, used to resume after reconnect
+        self.use_subprotocols = True  # Cleared if the server predates subprotocol negotiation
+        self.subprotocol = None
+        self.opened = False  # Whether the current connection attempt got past the handshake
+        self.received = 0  # Messages on the current connection, acked every ACK_EVERY
+
+        # Thumbnail wall: send snapshots until the faculty's lease runs out
+        self.thumbnails = None
+        self.thumbnail_interval = 1.0
+        self.thumbnail_until = 0
+        self.thumbnail_task = None
+        self.thumbnail_force = False
+        # Capture and JPEG encoding stay off the event loop; one thread, as mss handles are per thread
+        self.thumbnail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
 
     def start_async_loop(self):
         asyncio.set_event_loop(self.loop)
@@ -42,16 +98,10 @@ class WebSocketClient(QThread):
                     continue
 
                 url = f"{WS_URL}?token={token}"
+                if self.last_seq is not None:
+                    url += f"&since={self.last_seq}"
 
-                self.ws = websocket.WebSocketApp(
-                    url,
-                    on_open=self.on_open,
-                    on_message=self.on_message,
-                    on_error=self.on_error,
-                    on_close=self.on_close
-                )
-
-                self.ws.run_forever()
+                self._connect(url)
 
             except Exception as e:
                 print(f"WebSocket Error: {e}")
@@ -59,14 +109,54 @@ class WebSocketClient(QThread):
             if self.is_running:
                 time.sleep(self.reconnect_delay)
 
+    def _connect(self, url):
+        """One connection attempt; blocks until the socket closes."""
+        self.opened = False
+        self.ws = websocket.WebSocketApp(
+            url,
+            on_open=self.on_open,
+            on_message=self.on_message,
+            on_error=self.on_error,
+            on_close=self.on_close,
+            subprotocols=self._offered_subprotocols()
+        )
+        self.ws.run_forever()
+
+    def _offered_subprotocols(self):
+        if not self.use_subprotocols:
+            return None
+        if msgpack is not None:
+            return [MSGPACK_SUBPROTOCOL, JSON_SUBPROTOCOL]
+        return [JSON_SUBPROTOCOL]
+
     def on_open(self, ws):
-        print("WebSocket Connected")
+        self.opened = True
+        self.received = 0
+        self.subprotocol = ws.sock.getsubprotocol() if ws.sock else None
+        print(f"WebSocket Connected ({self.subprotocol or 'json'})")
+
+    def decode(self, message):
+        if isinstance(message, bytes):
+            return msgpack.unpackb(message, raw=False)
+        return json.loads(message)
 
     def on_message(self, ws, message):
         """Handle incoming messages"""
+        self.received += 1
+        if self.received % ACK_EVERY == 0:
+            self.send_json({"type": "ack", "received": self.received})
         try:
-            data = json.loads(message)
+            data = self.decode(message)
             event_type = data.get("type")
+
+            # Replayed and live copies of the same event can overlap on reconnect
+            seq = data.get("seq")
+            if seq is not None:
+                if event_type not in ("resumed", "resync_required") and \
+                        self.last_seq is not None and seq <= self.last_seq:
+                    return
+                self.last_seq = seq
+
             self.message_signal.emit(data)
 
             if event_type == "monitor_offer":
@@ -84,15 +174,114 @@ class WebSocketClient(QThread):
                     self.loop
                 )
 
+            elif event_type in ("monitor_resume", "monitor_pause"):
+                # Pre-warmed connection: start or stop producing frames
+                if self.screen_track is not None:
+                    toggle = self.screen_track.resume if event_type == "monitor_resume" else self.screen_track.pause
+                    self.loop.call_soon_threadsafe(toggle)
+
             elif event_type == "monitor_stop":
                 asyncio.run_coroutine_threadsafe(
                     self._handle_stop_async(),
                     self.loop
                 )
 
-        except json.JSONDecodeError:
+            elif event_type == "thumbnail_control":
+                self._handle_thumbnail_control(data)
+
+            elif event_type == "thumbnail_throttle":
+                # Over the batch budget: slow down; the lease is unchanged
+                self.thumbnail_interval = data.get("interval") or self.thumbnail_interval
+
+            elif event_type == "viva_event" and data.get("event") in ("exam_started", "exam_ended"):
+                self._handle_exam_recording(data)
+                self._handle_exam_activity(data)
+
+        except ValueError:
             pass
 
+    def _handle_exam_recording(self, data):
+        if data.get("event") == "exam_started" and data.get("record_screens"):
+            if self.recorder is None or not self.recorder.is_alive():
+                directory = os.path.join(RECORDINGS_DIR, f"exam_{data.get('session_id')}")
+                # One budget for every exam's recording, not per exam
+                self.recorder = ExamRecorder(directory, max_bytes=RECORDING_MAX_BYTES, root=RECORDINGS_DIR)
+                self.recorder.start()
+                print(f"Recording screen to {directory}")
+        elif data.get("event") == "exam_ended":
+            self.stop_recording()
+
+    def stop_recording(self, timeout=None):
+        """Stop the exam recorder; with ``timeout``, wait that long for it to close its segment."""
+        if self.recorder is not None:
+            self.recorder.stop()
+            if timeout is not None:
+                self.recorder.join(timeout)
+            self.recorder = None
+
+    def _handle_exam_activity(self, data):
+        if data.get("event") == "exam_ended":
+            self.activity_session = None
+        elif self.activity_session != data.get("session_id"):
+            self.activity_session = data.get("session_id")
+            asyncio.run_coroutine_threadsafe(self._activity_loop(self.activity_session), self.loop)
+
+    async def _activity_loop(self, session_id):
+        """Hash the screen every INTERVAL while the exam runs; report every FLUSH seconds and at the end."""
+        loop = asyncio.get_running_loop()
+        sampler = await loop.run_in_executor(self.activity_executor, ActivitySampler, session_id)
+        while self.is_running and self.activity_session == session_id:
+            try:
+                await loop.run_in_executor(self.activity_executor, sampler.sample)
+            except Exception as e:
+                print(f"Screen activity sample failed: {e}")
+            if time.time() - sampler.since >= FLUSH:
+                self.send_json(sampler.take())
+            await asyncio.sleep(INTERVAL)
+        self.send_json(sampler.take())
+
+    def _handle_thumbnail_control(self, data):
+        if not data.get("enabled"):
+            self.thumbnail_until = 0
+            return
+
+        self.thumbnail_interval = data.get("interval") or self.thumbnail_interval
+        self.thumbnail_until = time.monotonic() + (data.get("ttl") or 30)
+        if self.thumbnail_task is None or self.thumbnail_task.done():
+            # A new viewer needs a picture even if the screen is idle
+            self.thumbnail_force = True
+            self.thumbnail_task = asyncio.run_coroutine_threadsafe(self._thumbnail_loop(), self.loop)
+
+    async def _thumbnail_loop(self):
+        """Send a thumbnail every interval while the lease lasts; idle screens send nothing."""
+        loop = asyncio.get_running_loop()
+        if self.thumbnails is None:
+            self.thumbnails = await loop.run_in_executor(self.thumbnail_executor, ThumbnailCapture)
+        last_sent = 0
+        while self.is_running and time.monotonic() < self.thumbnail_until:
+            # Refresh idle screens now and then so late viewers see them
+            force = self.thumbnail_force or time.monotonic() - last_sent > 10
+            self.thumbnail_force = False
+            try:
+                jpeg = await loop.run_in_executor(self.thumbnail_executor, self.thumbnails.capture, force)
+                if jpeg:
+                    self.send_thumbnail(jpeg)
+                    last_sent = time.monotonic()
+            except Exception as e:
+                print(f"Thumbnail capture failed: {e}")
+            await asyncio.sleep(self.thumbnail_interval)
+
+    def send_thumbnail(self, jpeg):
+        width, height = self.thumbnails.pipeline.width, self.thumbnails.pipeline.height
+        data = jpeg if self.subprotocol == MSGPACK_SUBPROTOCOL else base64.b64encode(jpeg).decode("ascii")
+        self.send_json({
+            "type": "thumbnail",
+            "data": data,
+            "width": width,
+            "height": height,
+            "taken_at": time.time(),
+        })
+
     async def _handle_offer_and_send(self, data):
         """Handle offer and send answer back — runs on self.loop"""
         try:
@@ -107,9 +296,12 @@ class WebSocketClient(QThread):
         offer = data.get("offer")
 
         if self.pc:
+            self._stop_adapting()
             await self.pc.close()
 
-        self.pc = RTCPeerConnection()
+        self.pc = RTCPeerConnection(
+            RTCConfiguration(iceServers=[RTCIceServer(STUN_URL)] if STUN_URL else [])
+        )
 
         @self.pc.on("connectionstatechange")
         async def on_connectionstatechange():
@@ -118,14 +310,10 @@ class WebSocketClient(QThread):
         @self.pc.on("icecandidate")
         async def on_icecandidate(candidate):
             if candidate:
-                self.send_json({
-                    "type": "monitor_ice",
-                    "student_id": data.get("student_id"),
-                    "candidate": {
-                        "candidate": candidate.to_sdp(),
-                        "sdpMid": candidate.sdpMid,
-                        "sdpMLineIndex": candidate.sdpMLineIndex,
-                    }
+                self._queue_ice(data.get("student_id"), {
+                    "candidate": candidate.to_sdp(),
+                    "sdpMid": candidate.sdpMid,
+                    "sdpMLineIndex": candidate.sdpMLineIndex,
                 })
 
         # Step 1: Set remote description (offer) first
@@ -138,8 +326,14 @@ class WebSocketClient(QThread):
 
         # Step 2: Create screen track and store reference to prevent GC
         # FIX 5: self.screen_track keeps it alive for the full session
-        self.screen_track = ScreenVideoTrack()
-        self.pc.addTrack(self.screen_track)
+        # The viewer picks the encoder profile ("text" or "smooth")
+        profile = get_profile(data.get("profile"))
+        # A pre-warm offer is answered with a paused track (resumed by monitor_resume)
+        self.screen_track = ScreenVideoTrack(profile=profile, paused=bool(data.get("prewarm")))
+        sender = self.pc.addTrack(self.screen_track)
+        self.adapt_task = asyncio.ensure_future(
+            adapt(sender, self.screen_track, QualityController(profile))
+        )
 
         # Step 3: Create and set answer
         answer = await self.pc.createAnswer()
@@ -163,23 +357,45 @@ class WebSocketClient(QThread):
             print("[ICE] No PC available, skipping candidate")
             return
 
-        candidate = data.get("candidate")
-        if not candidate or not candidate.get("candidate"):
-            return  # ignore empty end-of-candidates
-
-        try:
-            await self.pc.addIceCandidate(
-                RTCIceCandidate(
-                    sdpMid=candidate["sdpMid"],
-                    sdpMLineIndex=candidate["sdpMLineIndex"],
-                    candidate=candidate["candidate"]
+        # Batched (candidates) or single (candidate); empty end-of-candidates is ignored
+        candidates = data.get("candidates") or [data.get("candidate")]
+        for candidate in candidates:
+            if not candidate or not candidate.get("candidate"):
+                continue
+            try:
+                await self.pc.addIceCandidate(
+                    RTCIceCandidate(
+                        sdpMid=candidate["sdpMid"],
+                        sdpMLineIndex=candidate["sdpMLineIndex"],
+                        candidate=candidate["candidate"]
+                    )
                 )
-            )
-        except Exception as e:
-            print(f"[ICE] Failed to add candidate: {e}")
+            except Exception as e:
+                print(f"[ICE] Failed to add candidate: {e}")
+
+    def _queue_ice(self, student_id, candidate):
+        """Collect trickled candidates and send them as one monitor_ice message."""
+        self.pending_ice.append(candidate)
+        if len(self.pending_ice) == 1:
+            self.loop.call_later(ICE_BATCH_DELAY, self._flush_ice, student_id)
+
+    def _flush_ice(self, student_id):
+        candidates, self.pending_ice = self.pending_ice, []
+        if candidates:
+            self.send_json({
+                "type": "monitor_ice",
+                "student_id": student_id,
+                "candidates": candidates
+            })
+
+    def _stop_adapting(self):
+        if self.adapt_task is not None:
+            self.adapt_task.cancel()
+            self.adapt_task = None
 
     async def _handle_stop_async(self):
         if self.pc:
+            self._stop_adapting()
             await self.pc.close()
             self.pc = None
             self.screen_track = None  # Release track reference too
@@ -187,12 +403,19 @@ class WebSocketClient(QThread):
 
     def send_json(self, data):
         if self.ws and self.ws.sock and self.ws.sock.connected:
-            self.ws.send(json.dumps(data))
+            if self.subprotocol == MSGPACK_SUBPROTOCOL:
+                self.ws.send(msgpack.packb(data, use_bin_type=True), opcode=websocket.ABNF.OPCODE_BINARY)
+            else:
+                self.ws.send(json.dumps(data))
         else:
             print("WebSocket not connected. Cannot send message.")
 
     def on_error(self, ws, error):
         print(f"WebSocket Error: {error}")
+        if self.use_subprotocols and not self.opened and rejected_subprotocol(error):
+            # An older backend accepts without choosing a subprotocol: retry
+            # with plain JSON and no offer
+            self.use_subprotocols = False
 
     def on_close(self, ws, close_status_code, close_msg):
         print("WebSocket Closed")
@@ -200,6 +423,9 @@ class WebSocketClient(QThread):
     def stop(self):
         """Stop the client"""
         self.is_running = False
+        # The recorder is a daemon thread: let it finish the current segment
+        # before the process exits, or its MP4 is left without an index
+        self.stop_recording(timeout=RECORDER_STOP_TIMEOUT)
         if self.ws:
             self.ws.close()
         self.quit()